@@ -17,10 +17,14 @@ under the License.
 """
 
 import sys
+import json
 import getopt
+import sopare.batch as batch
 import sopare.config as config
 import sopare.util as util
 import sopare.recorder as recorder
+import sopare.runtime as runtime
+import sopare.server as server
 import sopare.log as log
 from sopare.version import __version__
 
@@ -35,6 +39,9 @@ def main(argv):
     wave = False
     error = False
     cfg_ini = None
+    batch_paths = []
+    server_address = None
+    remote_address = None
 
     recreate = False
 
@@ -42,10 +49,11 @@ def main(argv):
 
     if len(argv) > 0:
         try:
-            opts, args = getopt.getopt(argv, "ahelpv~cous:w:r:t:d:i:",
+            opts, args = getopt.getopt(argv, "ahelpv~cous:w:r:t:d:i:b:S:R:x:",
                                        ["analysis", "help", "error", "loop", "plot", "verbose",
                                         "wave", "create", "overview", "unit",
-                                        "show=", "write=", "read=", "train=", "delete=", "ini="
+                                        "show=", "write=", "read=", "train=", "delete=", "ini=",
+                                        "batch=", "server=", "remote=", "export="
                                         ])
         except getopt.GetoptError:
             usage()
@@ -88,8 +96,20 @@ def main(argv):
             if opt in ("-d", "--delete"):
                 delete_word(arg, debug)
                 sys.exit(0)
+            if opt in ("-x", "--export"):
+                export_dict(arg, debug)
+                sys.exit(0)
             if opt in ("-i", "--ini"):
                 cfg_ini = arg
+            if opt in ("-b", "--batch"):
+                batch_paths.append(arg)
+            if opt in ("-S", "--server"):
+                server_address = arg
+            if opt in ("-R", "--remote"):
+                remote_address = arg
+
+    if len(batch_paths) > 0:
+        batch_paths.extend(args)
 
     cfg = create_config(cfg_ini, endless_loop, debug, plot, wave, outfile, infile, dict, error)
 
@@ -97,6 +117,22 @@ def main(argv):
         recreate_dict(debug, cfg)
         sys.exit(0)
 
+    if len(batch_paths) > 0:
+        recognize_files(batch_paths, cfg)
+        sys.exit(0)
+
+    if server_address is not None:
+        serve(server_address, cfg)
+        sys.exit(0)
+
+    if remote_address is not None:
+        recognize_remote(remote_address, args)
+        sys.exit(0)
+
+    if cfg.getbool('misc', 'ASYNC_RUNTIME', fallback=False):
+        runtime.run(cfg)
+        sys.exit(0)
+
     recorder.Recorder(cfg)
 
 
@@ -115,13 +151,40 @@ def create_config(cfg_ini, endless_loop, debug, plot, wave, outfile, infile, dic
     cfg.setoption('cmdlopt', 'infile', infile)
     cfg.setoption('cmdlopt', 'dict', dict)
     cfg.addlogger(logger)
+    # fail at startup instead of in the first chunk or token
+    cfg.getsettings()
     return cfg
 
 
 def recreate_dict(debug, cfg):
     print("recreating dictionary from raw input files...")
     utilities = util.Util(debug, cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
-    utilities.recreate_dict_from_raw_files()
+    utilities.recreate_dict_from_raw_files(
+        cfg.getintoption('misc', 'COMPILE_WORKERS', fallback=1),
+        cfg.getbool('misc', 'INCREMENTAL_COMPILE', fallback=False))
+
+
+def recognize_files(paths, cfg):
+    engine = batch.Batch(cfg)
+    for result in engine.run(paths, cfg.getintoption('misc', 'BATCH_WORKERS', fallback=1)):
+        print((json.dumps(result)))
+        sys.stdout.flush()
+
+
+def serve(address, cfg):
+    recognizer = server.Server(cfg, cfg.getintoption('misc', 'SERVER_WORKERS', fallback=0))
+    print(('listening on ' + str(recognizer.listen(address))))
+    try:
+        recognizer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def recognize_remote(address, filenames):
+    client = server.Client(address)
+    for filename in filenames:
+        print((json.dumps({'file': filename, 'results': client.recognize_file(filename)})))
+        sys.stdout.flush()
 
 
 def delete_word(dict, debug):
@@ -133,6 +196,12 @@ def delete_word(dict, debug):
     utilities.delete_from_dict(dict)
 
 
+def export_dict(filename, debug):
+    print(("exporting dictionary to " + filename))
+    utilities = util.Util(debug, None)
+    utilities.export_dict(filename)
+
+
 def show_word_entries(dict, debug):
     print((dict + " entries in dictionary:"))
     print()
@@ -149,7 +218,7 @@ def show_dict_ids(debug):
 def show_dict_analysis(debug):
     print("dictionary analysis:")
     utilities = util.Util(debug, None)
-    analysis = utilities.compile_analysis(utilities.get_dict())
+    analysis = utilities.get_dict_matrix().analysis
     for _id in analysis:
         print(_id)
         for k, v in analysis[_id].items():
@@ -174,8 +243,16 @@ def usage():
     print(" -t --train  [word]  : add raw data to raw dictionary file")
     print(" -d --delete [word]  : delete [word] from dictionary and exits.")
     print("                       '*' deletes everything!")
+    print(" -x --export [file]  : export the dictionary as JSON to [file] and exits.")
     print(" -i --ini    [file]  : use alternative configuration file")
     print(" -a --analysis       : show dictionary analysis and exits.")
+    print(" -b --batch  [path]  : recognize the raw/wav file [path] or all wav files")
+    print("                       in the directory [path] (and all following paths)")
+    print("                       and print one JSON line per file")
+    print(" -S --server [addr]  : recognize 16 bit mono PCM streams from many")
+    print("                       clients on [host:port] or a Unix socket [path]")
+    print(" -R --remote [addr]  : send the following raw files to a server and")
+    print("                       print one JSON line per file")
 
 
 main(sys.argv[1:])
@@ -15,53 +15,112 @@ under the License.
 """
 
 from operator import itemgetter
+import sopare.candidateindex
 import sopare.characteristics
+import sopare.dictmatrix
+import sopare.search
 import sopare.stm
 import sopare.path
+import sopare.trace
 import sopare.util
 import logging
 import imp
 import os
+import numpy
 
 
 class Analyze:
-    def __init__(self, cfg):
+    def __init__(self, cfg, dict_matrix=None, plugins=None):
         self.cfg = cfg
         self.debug = self.cfg.getbool('cmdlopt', 'debug')
         self.util = sopare.util.Util(
             self.debug, self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
-        self.learned_dict = self.util.get_dict()
-        self.dict_analysis = self.util.compile_analysis(self.learned_dict)
+        if dict_matrix is None:
+            dict_matrix = self.util.get_dict_matrix()
+        self.dict_matrix = dict_matrix
+        self.dict_analysis = self.dict_matrix.analysis
         self.stm = sopare.stm.ShortTermMemory(self.cfg)
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
         self.plugins = []
-        self.load_plugins()
+        if plugins is None:
+            self.load_plugins()
+        else:
+            self.plugins.extend(plugins)
         self.last_results = None
         self.debug_info = None
+        self.search = None
+        self.candidates = None
+        self.create_search()
 
     def prepare_test_analysis(self, test_dict):
-        self.learned_dict = test_dict
-        self.dict_analysis = self.util.compile_analysis(self.learned_dict)
+        self.set_dict_matrix(sopare.dictmatrix.DictionaryMatrix(
+            test_dict, self.util.compile_analysis(test_dict)))
         return self.dict_analysis
 
+    def set_dict_matrix(self, dict_matrix):
+        # only between two words, the search state belongs to the old matrix
+        self.dict_matrix = dict_matrix
+        self.dict_analysis = dict_matrix.analysis
+        self.util.clear_cache()
+        self.create_search()
+
+    def create_search(self):
+        settings = self.cfg.getsettings()
+        self.search = None
+        if settings.incremental_search:
+            self.search = sopare.search.IncrementalSearch(self.dict_matrix, self.get_weights())
+        self.candidates = None
+        if settings.candidate_index:
+            self.candidates = sopare.candidateindex.CandidateIndex(
+                self.dict_matrix, settings.candidate_min_similarity)
+
+    def get_weights(self):
+        settings = self.cfg.getsettings()
+        return (settings.similarity_norm, settings.similarity_height,
+                settings.similarity_dominant_frequency)
+
+    def add_token(self, characteristic, start_scores):
+        # start_scores holds the fast similarity of every dictionary entry at
+        # its first token. framing drops start positions with a first value of
+        # 0, so the related hypotheses can be pruned right away.
+        if self.search is None:
+            return
+        start = self.tracer.start()
+        alive = None
+        if self.cfg.getsettings().marginal_value > 0:
+            alive = start_scores > 0
+        self.search.add(characteristic, alive)
+        self.tracer.stop('incremental search', start)
+
     def do_analysis(self, results, data, rawbuf):
+        start = self.tracer.start()
         framing = self.framing(results, len(data))
+        self.tracer.stop('framing', start)
         self.debug_info = '************************************************\n\n'
 
         if self.debug:
             self.debug_info += ''.join([str(data), '\n\n'])
             self.debug_info += ''.join([str(results), '\n\n'])
+        start = self.tracer.start()
         matches = self.deep_search(framing, data)
+        self.tracer.stop('deep_search', start)
+        start = self.tracer.start()
         readable_results = self.get_match(matches)
+        self.tracer.stop('get_match', start)
         readable_results, self.debug_info = self.stm.get_results(readable_results, self.debug_info)
         self.logger.debug(self.debug_info)
 
         if readable_results is not None:
             for p in self.plugins:
+                start = self.tracer.start()
                 p.run(readable_results, self.debug_info, rawbuf)
+                self.tracer.stop('plugin ' + getattr(p, '__name__', p.__class__.__name__),
+                                 start)
 
     def framing(self, results, data_length):
+        settings = self.cfg.getsettings()
         framing = {}
         arr = []
 
@@ -70,7 +129,7 @@ class Analyze:
             for i, row in enumerate(results[result_id]):
                 row = self.row_validation(row, result_id)
                 row_result = sum(row[0:len(row)]) / self.dict_analysis[result_id]['min_tokens']
-                if row_result >= self.cfg.getfloatoption('compare', 'MARGINAL_VALUE'):
+                if row_result >= settings.marginal_value:
                     arr.append([row_result, i, result_id])
                 else:
                     self.logger.debug(
@@ -78,7 +137,7 @@ class Analyze:
                             i) + ' bc MARGINAL_VALUE > ' + str(row_result))
 
         sorted_arr = sorted(arr, key=itemgetter(0), reverse=True)
-        max_word_start_results = self.cfg.getintoption('compare', 'MAX_WORD_START_RESULTS')
+        max_word_start_results = settings.max_word_start_results
         for el in sorted_arr:
             if el[1] not in framing[el[2]] and \
                     (max_word_start_results == 0 or len(framing[el[2]]) < max_word_start_results):
@@ -87,25 +146,23 @@ class Analyze:
         return framing
 
     def row_validation(self, row, id):
-        if row[0] == 0 or len(row) <= self.cfg.getintoption('compare', 'MIN_START_TOKENS'):
+        if row[0] == 0 or len(row) <= self.cfg.getsettings().min_start_tokens:
             return [0] * len(row)
         return row
 
     def deep_search(self, framing, data):
+        settings = self.cfg.getsettings()
         framing_match = []
         match_results = [''] * len(data)
-        min_cross_similarity = self.cfg.getfloatoption('compare', 'MIN_CROSS_SIMILARITY')
-        min_left_distance = self.cfg.getfloatoption('compare', 'MIN_LEFT_DISTANCE')
-        min_right_distance = self.cfg.getfloatoption('compare', 'MIN_RIGHT_DISTANCE')
-        num_best_matches = min(1, self.cfg.getintoption('compare', 'NUMBER_OF_BEST_MATCHES')) if \
-            self.cfg.hasoption('compare', 'NUMBER_OF_BEST_MATCHES') else 1
-        max_top_results = self.cfg.getintoption('compare', 'MAX_TOP_RESULTS')
-
-        for id in framing:
-            for startpos in framing[id]:
-                word_sim = self.deep_inspection(id, startpos, data)
-                if len(word_sim) > 0:
-                    framing_match.append(word_sim)
+        min_cross_similarity = settings.min_cross_similarity
+        min_left_distance = settings.min_left_distance
+        min_right_distance = settings.min_right_distance
+        num_best_matches = min(1, settings.number_of_best_matches)
+        max_top_results = settings.max_top_results
+
+        for word_sim in self.batch_inspection(framing, data):
+            if len(word_sim) > 0:
+                framing_match.append(word_sim)
         self.debug_info += str(framing_match).join(['framing_match: ', '\n\n'])
 
         best_match = []
@@ -131,64 +188,101 @@ class Analyze:
         return match_results
 
     def token_sim(self, characteristic, dcharacteristic):
+        settings = self.cfg.getsettings()
         sim_norm = self.util.similarity(characteristic['norm'], dcharacteristic['norm']) * \
-                   self.cfg.getfloatoption('compare', 'SIMILARITY_NORM')
+            settings.similarity_norm
         sim_token_peaks = self.util.similarity(
             characteristic['token_peaks'], dcharacteristic['token_peaks']) * \
-            self.cfg.getfloatoption('compare', 'SIMILARITY_HEIGHT')
+            settings.similarity_height
         sim_dom_freq = self.util.single_similarity(characteristic['df'], dcharacteristic['df']) * \
-            self.cfg.getfloatoption('compare', 'SIMILARITY_DOMINANT_FREQUENCY')
+            settings.similarity_dominant_frequency
         sim = sim_norm + sim_token_peaks + sim_dom_freq
         sl, sr = self.util.manhattan_distance(characteristic['norm'], dcharacteristic['norm'])
         return sim, sl, sr
 
-    def deep_inspection(self, id, startpos, data):
-        word_sim = []
-        for dict_entries in self.learned_dict['dict']:
-            if id == dict_entries['id']:
-                dict_characteristic = dict_entries['characteristic']
+    def batch_inspection(self, framing, data):
+        settings = self.cfg.getsettings()
+        pairs = []
+        entries = []
+        startpositions = []
+        for id in framing:
+            for startpos in framing[id]:
+                pair_entries = self.dict_matrix.get_entries(id)
+                pairs.append((id, startpos, len(pair_entries)))
+                entries.extend(pair_entries)
+                startpositions.extend([startpos] * len(pair_entries))
+        if self.candidates is not None:
+            entries, startpositions, pairs = self.select_candidates(entries, startpositions,
+                                                                    pairs, data)
+        inspection = None
+        if self.search is not None:
+            inspection = self.search.inspect(entries, startpositions, len(data))
+            self.logger.debug('incremental search scored ' + str(self.search.scored) +
+                              ' and pruned ' + str(self.search.pruned) + ' token pairs')
+        if inspection is None:
+            inspection = self.dict_matrix.inspect(
+                entries, startpositions, self.dict_matrix.utterance(data), self.get_weights())
+        sims, sls, srs, counts = inspection
+
+        word_sims = []
+        k = 0
+        for id, startpos, number_of_entries in pairs:
+            word_sim = []
+            for x in range(k, k + number_of_entries):
                 token_sim = [0, 0, 0, startpos, 0, id]
-                c = 0
-                for i, dcharacteristic in enumerate(dict_characteristic):
-                    if startpos + i < len(data):
-                        do = data[startpos + i]
-                        characteristic, _ = do
-                        sim, sl, sr = self.token_sim(characteristic, dcharacteristic)
-                        if 'shift' in characteristic:
-                            ssim, ssl, ssr = \
-                                self.token_sim(characteristic['shift'], dcharacteristic)
-                            if ssim > sim:
-                                # FIXME: unused assignment
-                                ssim = sim
-                            if ssr < sr:
-                                sr = ssr
-                            if ssl < sl:
-                                sl = ssl
-                        token_sim[0] += sim
-                        token_sim[1] += sl
-                        token_sim[2] += sr
-                        c += 1.0
-
+                c = int(counts[x])
                 if c > 0:
-                    token_sim[0] = token_sim[0] / c
+                    token_sim[0] = float(sims[x]) / c
                     if (token_sim[0] > 1.0 and
-                        c >= self.cfg.getintoption('compare', 'MIN_START_TOKENS') and
+                        c >= settings.min_start_tokens and
                             c >= self.dict_analysis[id]['min_tokens']):
                         self.logger.warning('Your calculation basis seems to be wrong '
                                             'as we get results > 1.0!')
-                    token_sim[1] = token_sim[1] / c
-                    token_sim[2] = token_sim[2] / c
-                    token_sim[4] = int(c)
-
-                if (self.cfg.getbool('compare', 'STRICT_LENGTH_CHECK') is False and
-                        c >= self.cfg.getintoption('compare', 'MIN_START_TOKENS')) \
-                    or (c >= self.dict_analysis[id]['min_tokens'] -
-                        self.cfg.getintoption('compare', 'STRICT_LENGTH_UNDERMINING')):
+                    token_sim[1] = float(sls[x]) / c
+                    token_sim[2] = float(srs[x]) / c
+                    token_sim[4] = c
+                if self.valid_length(id, c):
                     word_sim.append(token_sim)
-        return word_sim
+            k += number_of_entries
+            word_sims.append(word_sim)
+        return word_sims
+
+    def get_min_length(self, id):
+        # lowest number of compared tokens that passes valid_length
+        settings = self.cfg.getsettings()
+        min_length = self.dict_analysis[id]['min_tokens'] - settings.strict_length_undermining
+        if settings.strict_length_check is False:
+            min_length = min(min_length, settings.min_start_tokens)
+        return min_length
+
+    def select_candidates(self, entries, startpositions, pairs, data):
+        entries = numpy.asarray(entries, dtype=numpy.intp)
+        startpositions = numpy.asarray(startpositions, dtype=numpy.intp)
+        sizes = [number_of_entries for _, _, number_of_entries in pairs]
+        min_lengths = numpy.repeat([self.get_min_length(id) for id, _, _ in pairs], sizes)
+        self.candidates.set_utterance(data)
+        selected = self.candidates.get_candidates(entries, startpositions, min_lengths)
+        # number of selected entries per (id, start position) pair
+        ends = numpy.cumsum(sizes, dtype=numpy.intp)
+        selected_ends = numpy.concatenate(([0], numpy.cumsum(selected)))[ends]
+        counts = numpy.diff(selected_ends, prepend=0)
+        pairs = [(id, startpos, int(count)) for (id, startpos, _), count in zip(pairs, counts)]
+        self.logger.debug('candidate index skipped ' + str(self.candidates.skipped_length) +
+                          ' short and ' + str(self.candidates.skipped_coarse) +
+                          ' distant of ' + str(self.candidates.entries) + ' entries')
+        return entries[selected], startpositions[selected], pairs
+
+    def valid_length(self, id, c):
+        settings = self.cfg.getsettings()
+        return (settings.strict_length_check is False and c >= settings.min_start_tokens) \
+            or (c >= self.dict_analysis[id]['min_tokens'] - settings.strict_length_undermining)
+
+    def deep_inspection(self, id, startpos, data):
+        return self.batch_inspection({id: [startpos]}, data)[0]
 
     def get_match(self, framing):
-        fill_result_percentage = self.cfg.getfloatoption('compare', 'FILL_RESULT_PERCENTAGE')
+        settings = self.cfg.getsettings()
+        fill_result_percentage = settings.fill_result_percentage
         match_results = []
         s = 0
 
@@ -211,8 +305,9 @@ class Analyze:
         return match_results
 
     def validate_match_result(self, result, start, end, match_results):
-        strict_length_check = self.cfg.getbool('compare', 'STRICT_LENGTH_CHECK')
-        strict_length_undermining = self.cfg.getintoption('compare', 'STRICT_LENGTH_UNDERMINING')
+        settings = self.cfg.getsettings()
+        strict_length_check = settings.strict_length_check
+        strict_length_undermining = settings.strict_length_undermining
 
         if len(result) == 0 or result[0] == '':
             return match_results
@@ -244,3 +339,7 @@ class Analyze:
 
     def reset(self):
         self.last_results = None
+        if self.search is not None:
+            self.search.reset()
+        if self.candidates is not None:
+            self.candidates.reset()
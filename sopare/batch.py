@@ -0,0 +1,149 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+import wave
+import sopare.processing
+import sopare.trace
+import sopare.util
+import sopare.worker
+
+# found in directories, .raw files there are usually training records
+EXTENSIONS = ('.wav',)
+
+batch_engine = None
+
+
+class DirectQueue:
+    # stands in for the multiprocessing queue between Filtering and Worker
+    # and hands every object synchronously to the consumer
+    def __init__(self):
+        self.consumer = None
+
+    def put(self, obj):
+        self.consumer(obj)
+
+    def close(self):
+        pass
+
+    def join_thread(self):
+        pass
+
+
+class ResultCollector:
+    # registered as the only plugin of the batch worker
+    def __init__(self):
+        self.results = []
+
+    def run(self, readable_results, data, rawbuf):
+        # the tokenizer forced at the end of every word leaves an analysis
+        # without any word in it
+        if len(readable_results) > 0:
+            self.results.append(readable_results)
+
+
+class Batch:
+    def __init__(self, cfg, dict_matrix=None):
+        self.cfg = cfg.copy()
+        # a file is replayed as a stream of words: silence and MAX_TIME force
+        # the analysis of the current word instead of stopping the pipeline
+        self.cfg.setoption('cmdlopt', 'endless_loop', 'True')
+        # the result collector ignores the filtered wave
+        self.cfg.setoption('misc', 'PLUGIN_RAWBUF', 'False')
+        self.logger = self.cfg.getlogger().get_log()
+        self.logger = logging.getLogger(__name__)
+        if dict_matrix is None:
+            util = sopare.util.Util(self.cfg.getbool('cmdlopt', 'debug'),
+                                    self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+            dict_matrix = util.get_dict_matrix()
+        self.dict_matrix = dict_matrix
+        # one worker for all files, loading the plugins is not repeated
+        self.queue = DirectQueue()
+        self.worker = sopare.worker.Worker(self.cfg, self.queue, self.dict_matrix, False)
+        self.queue.consumer = self.worker.process
+        self.collector = ResultCollector()
+        self.worker.analyze.plugins = [self.collector]
+
+    @staticmethod
+    def get_files(paths):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, filenames in os.walk(path):
+                    files.extend(os.path.join(root, filename) for filename in filenames
+                                 if filename.lower().endswith(EXTENSIONS))
+            else:
+                files.append(path)
+        return sorted(files)
+
+    def read_samples(self, filename):
+        if not filename.lower().endswith('.wav'):
+            with open(filename, 'rb') as raw_file:
+                samples = raw_file.read()
+            return samples[0:len(samples) - len(samples) % 2]
+        with wave.open(filename, 'rb') as wave_file:
+            if wave_file.getnchannels() != 1 or wave_file.getsampwidth() != 2:
+                raise ValueError('only 16 bit mono wave files are supported')
+            if wave_file.getframerate() != self.cfg.getintoption('stream', 'SAMPLE_RATE'):
+                self.logger.warning(filename + ' sample rate ' + str(wave_file.getframerate()) +
+                                    ' does not match SAMPLE_RATE')
+            return wave_file.readframes(wave_file.getnframes())
+
+    def recognize(self, filename):
+        start = time.time()
+        try:
+            samples = self.read_samples(filename)
+        except (IOError, EOFError, ValueError, wave.Error) as exc:
+            return {'file': filename, 'error': str(exc) or exc.__class__.__name__}
+
+        processor = sopare.processing.Processor(self.cfg, None, True, self.queue, True)
+        self.collector.results = []
+        self.worker.analyze.stm.clock = processor.clock
+        try:
+            processor.check_block(samples)
+            if self.worker.counter > 0:
+                processor.prepare.force_tokenizer()
+        finally:
+            # nothing of this file may end up in the results of the next one
+            self.worker.reset()
+            self.worker.analyze.stm.reset()
+
+        return {'file': filename, 'results': self.collector.results,
+                'elapsed': round(time.time() - start, 4)}
+
+    def run(self, paths, workers=1):
+        files = self.get_files(paths)
+        if workers == 1 or len(files) < 2:
+            for filename in files:
+                yield self.recognize(filename)
+            sopare.trace.get_tracer(self.cfg).dump()
+            return
+        with multiprocessing.Pool(workers if workers > 0 else None, init_batch_process,
+                                  (self.cfg, self.dict_matrix)) as pool:
+            for result in pool.imap(recognize_file, files):
+                yield result
+
+
+def init_batch_process(cfg, dict_matrix):
+    global batch_engine
+    batch_engine = Batch(cfg, dict_matrix)
+
+
+def recognize_file(filename):
+    return batch_engine.recognize(filename)
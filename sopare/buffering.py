@@ -16,7 +16,9 @@ under the License.
 
 import multiprocessing
 import logging
+import time
 import sopare.processing
+import sopare.trace
 
 
 class Buffering(multiprocessing.Process):
@@ -24,11 +26,14 @@ class Buffering(multiprocessing.Process):
         super().__init__(name='buffering queue')
         self.cfg = cfg
         self.queue = queue
-        self.proc = sopare.processing.Processor(self.cfg, self)
+        self.proc = sopare.processing.Processor(
+            self.cfg, self, sample_clock=self.cfg.getoption('cmdlopt', 'infile') is not None)
         self.PROCESS_ROUND_DONE = False
         self.test_counter = 0
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
+        self.reload = multiprocessing.Event()
         self.start()
 
     def run(self):
@@ -38,10 +43,27 @@ class Buffering(multiprocessing.Process):
 
         while True:
             buf = self.queue.get()
+            if buf is None:
+                break
+            if self.reload.is_set():
+                # the worker reloads between two words
+                self.reload.clear()
+                self.proc.prepare.filter.reload_dictionary()
+            stamps = getattr(self.queue, 'stamps', None)
+            if isinstance(buf, tuple):
+                buf, stamps = buf
+            if stamps is not None:
+                self.tracer.span('recorder read', stamps[0], stamps[1])
+                self.tracer.span('recorder queue', stamps[1], time.monotonic())
             if (endless_loop is False or outfile is not None) and self.PROCESS_ROUND_DONE:
                 break
             self.proc.check_silence(buf)
         self.logger.info('terminating queue runner')
+        # spans which were never handed to the worker
+        self.tracer.dump()
+
+    def reload_dictionary(self):
+        self.reload.set()
 
     def flush(self, message):
         self.proc.stop(message)
@@ -0,0 +1,78 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import numpy
+
+
+class CandidateIndex:
+    # Coarse summary of every dictionary entry: the number of tokens and the
+    # running sums of the dominant frequency (df) and the frequency
+    # characteristic (fc) over its tokens. For a word id and a start position
+    # only the entries which can pass the length check and whose df and fc
+    # means are close to the ones of the utterance go to the deep inspection.
+    def __init__(self, dict_matrix, min_similarity):
+        self.dict_matrix = dict_matrix
+        self.min_similarity = min_similarity
+        self.lengths = dict_matrix.lengths
+        # column n holds the sum over the first n tokens
+        zeros = numpy.zeros((len(self.lengths), 1))
+        self.df_sums = numpy.hstack((zeros, numpy.cumsum(dict_matrix.df, axis=1)))
+        self.fc_sums = numpy.hstack((zeros, numpy.cumsum(dict_matrix.fc, axis=1)))
+        self.utterance = None
+        self.entries = 0
+        self.skipped_length = 0
+        self.skipped_coarse = 0
+
+    def reset(self):
+        # the counters are per utterance
+        self.entries = 0
+        self.skipped_length = 0
+        self.skipped_coarse = 0
+
+    def set_utterance(self, data):
+        characteristics = [characteristic for characteristic, _ in data]
+        self.utterance = (
+            numpy.concatenate(([0], numpy.cumsum([c['df'] for c in characteristics]))),
+            numpy.concatenate(([0], numpy.cumsum([c['fc'] for c in characteristics]))))
+
+    @staticmethod
+    def similarity(a, b):
+        high = numpy.maximum(a, b)
+        sim = numpy.divide(numpy.minimum(a, b), high, out=numpy.ones_like(high), where=high > 0)
+        return sim
+
+    def get_candidates(self, entries, startpos, min_tokens):
+        # mask of the (entry, start position) pairs worth a deep inspection.
+        # min_tokens is the lowest number of compared tokens which passes
+        # Analyze.valid_length, fewer tokens are skipped without recall loss.
+        self.entries += len(entries)
+        u_df, u_fc = self.utterance
+        tokens = numpy.minimum(self.lengths[entries], len(u_df) - 1 - startpos)
+        candidates = tokens >= min_tokens
+        self.skipped_length += int(numpy.count_nonzero(~candidates))
+        if self.min_similarity <= 0:
+            return candidates
+        tokens = numpy.maximum(tokens, 0)
+        end = startpos + tokens
+        sim = (self.similarity(self.df_sums[entries, tokens], u_df[end] - u_df[startpos]) +
+               self.similarity(self.fc_sums[entries, tokens], u_fc[end] - u_fc[startpos])) / 2
+        close = sim >= self.min_similarity
+        self.skipped_coarse += int(numpy.count_nonzero(candidates & ~close))
+        return candidates & close
+
+    def get_stats(self):
+        return {'entries': self.entries, 'skipped_length': self.skipped_length,
+                'skipped_coarse': self.skipped_coarse}
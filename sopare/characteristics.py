@@ -16,6 +16,77 @@ under the License.
 
 import numpy
 
+# keys of the dictionary schema, in the order of the former dicts
+KEYS = ('df', 'dfm', 'fc', 'peaks', 'token_peaks', 'volume', 'norm', 'weighting', 'shift')
+
+
+class TokenCharacteristic:
+    # Compact record of one token with array backed norm, peaks and
+    # token_peaks. Supports the dict access used for dictionary entries
+    # (c['norm'], 'shift' in c, c['weighting'] = ...) and to_dict() returns
+    # the dictionary schema. weighting and shift are unset until assigned.
+    __slots__ = KEYS
+
+    def __init__(self, df, dfm, fc, peaks, token_peaks, volume, norm):
+        self.df = int(df)
+        self.dfm = int(dfm)
+        self.fc = float(fc)
+        self.peaks = numpy.asarray(peaks, dtype=numpy.int32)
+        self.token_peaks = numpy.asarray(token_peaks, dtype=numpy.int64)
+        self.volume = volume
+        self.norm = numpy.asarray(norm, dtype=numpy.float64)
+        self.weighting = None
+        self.shift = None
+
+    def __getstate__(self):
+        # raw bytes pickle much smaller than arrays or lists
+        return (self.df, self.dfm, self.fc, self.peaks.tobytes(), self.token_peaks.tobytes(),
+                self.volume, self.norm.tobytes(), self.weighting, self.shift)
+
+    def __setstate__(self, state):
+        self.df, self.dfm, self.fc, peaks, token_peaks, self.volume, norm, self.weighting, \
+            self.shift = state
+        self.peaks = numpy.frombuffer(peaks, dtype=numpy.int32)
+        self.token_peaks = numpy.frombuffer(token_peaks, dtype=numpy.int64)
+        self.norm = numpy.frombuffer(norm, dtype=numpy.float64)
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in KEYS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in KEYS and getattr(self, key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [key for key in KEYS if getattr(self, key) is not None]
+
+    def to_dict(self):
+        obj = {'df': self.df, 'dfm': self.dfm, 'fc': self.fc, 'peaks': self.peaks.tolist(),
+               'token_peaks': self.token_peaks.tolist(), 'volume': self.volume,
+               'norm': self.norm.tolist()}
+        if self.weighting is not None:
+            obj['weighting'] = self.weighting
+        if self.shift is not None:
+            obj['shift'] = self.shift.to_dict() if isinstance(self.shift, TokenCharacteristic) \
+                else self.shift
+        return obj
+
 
 class Characteristic:
     def __init__(self, peak_factor):
@@ -26,18 +97,17 @@ class Characteristic:
         df = numpy.argmax(fft)
         dfm = int(numpy.amax(fft))
         fc = 0
-        peaks = []
+        peaks = ()
+        chunked_norm = numpy.asarray(chunked_norm, dtype=numpy.float64)
         if len(chunked_norm) > 0:
             where_range = numpy.mean(chunked_norm) / self.peak_factor
-            peaks = list(numpy.array(numpy.where(chunked_norm > where_range))[0])
+            peaks = numpy.flatnonzero(chunked_norm > where_range)
             where_range = numpy.mean(chunked_norm)
-            npeaks = numpy.array(numpy.where(chunked_norm > where_range))
+            npeaks = numpy.flatnonzero(chunked_norm > where_range)
             fc = round(numpy.sum(numpy.sqrt(npeaks)), 1)
         token_peaks = self.get_token_peaks(meta)
         volume = self.get_volume(meta)
-        model_characteristic = {'df': df, 'dfm': dfm, 'fc': fc, 'peaks': peaks,
-                                'token_peaks': token_peaks, 'volume': volume, 'norm': chunked_norm}
-        return model_characteristic
+        return TokenCharacteristic(df, dfm, fc, peaks, token_peaks, volume, chunked_norm)
 
     @staticmethod
     def get_token_peaks(meta):
@@ -14,65 +14,85 @@ License for the specific language governing permissions and limitations
 under the License.
 """
 
+import numpy
+
 
 class Compare:
-    def __init__(self, debug, util):
+    def __init__(self, debug, util, dict_matrix=None):
         self.debug = debug
         self.util = util
-        self.learned_dictionary = self.util.get_dict()
-        self.dict_analysis = self.util.compile_analysis(self.learned_dictionary)
-        self.results = {}
+        if dict_matrix is None:
+            dict_matrix = self.util.get_dict_matrix()
+        self.set_dict_matrix(dict_matrix)
+
+    def set_dict_matrix(self, dict_matrix):
+        self.dict_matrix = dict_matrix
+        self.dict_analysis = self.dict_matrix.analysis
+        self.ids = list(self.dict_analysis)
+        self.entry_ids = numpy.array([self.ids.index(id) for id in self.dict_matrix.ids],
+                                     dtype=numpy.intp)
+        self.tokens = 0
+        self.scores = numpy.zeros((len(self.ids), 0, 0))
 
     def reset(self):
-        self.results = {}
+        self.tokens = 0
 
     def get_results(self):
-        return self.results
+        results = {}
+        for i, id in enumerate(self.ids):
+            results[id] = [self.scores[i, x, 0:self.tokens - x].tolist()
+                           for x in range(0, self.tokens)]
+        return results
+
+    def get_start_scores(self):
+        # per dictionary entry score at its first token for the latest start position
+        return self.scores[self.entry_ids, self.tokens - 1, 0]
 
     def word(self, characteristics):
-        ll = len(characteristics) - 1
-        if ll == 0:
-            self.results = {}
-            for id in self.dict_analysis:
-                self.results[id] = []
+        self.tokens = len(characteristics)
         self.create_structure()
-        self.fill_structure(characteristics[ll])
+        self.fill_structure(characteristics[self.tokens - 1])
 
     def create_structure(self):
-        for id in self.dict_analysis:
-            self.results[id].append([])
-            for x in range(0, len(self.results[id])):
-                self.results[id][x].append(0)
+        # rows are start positions and columns dictionary token positions.
+        # Each token fills one anti-diagonal, so every cell is written exactly
+        # once per word and the buffer is only grown, never cleared.
+        capacity = self.scores.shape[1]
+        if self.tokens > capacity:
+            capacity = max(self.tokens, capacity * 2)
+            scores = numpy.zeros((len(self.ids), capacity, capacity))
+            scores[:, 0:self.scores.shape[1], 0:self.scores.shape[2]] = self.scores
+            self.scores = scores
 
     def fill_structure(self, characteristic_object):
+        rows = numpy.arange(0, self.tokens)
+        best = numpy.zeros((len(self.ids), self.tokens))
+        dict_c_pos = self.tokens - 1 - rows
+        valid = dict_c_pos[None, :] < self.dict_matrix.lengths[:, None]
+        if valid.any():
+            fast_sim = self.fast_similarity(characteristic_object,
+                                            numpy.where(valid, dict_c_pos[None, :], 0))
+            fast_sim[~valid] = 0
+            numpy.maximum.at(best, self.entry_ids, fast_sim)
+        self.scores[:, rows, dict_c_pos] = best
+
+    def fast_similarity(self, characteristic_object, dict_c_pos):
         characteristic, meta = characteristic_object
-        for dict_entries in self.learned_dictionary['dict']:
-            id = dict_entries['id']
-
-            for x in range(0, len(self.results[id])):
-                dict_c_pos = len(self.results[id][x]) - 1
-
-                if dict_c_pos < len(dict_entries['characteristic']):
-                    dcharacteristic = dict_entries['characteristic'][dict_c_pos]
-                    fc_sim = self.util.single_similarity(
-                        characteristic['fc'], dcharacteristic['fc'])
-                    dfm_sim = self.util.single_similarity(
-                        characteristic['dfm'], dcharacteristic['dfm'])
-                    volume_sim = 0
-
-                    if len(meta) > 0 and 'volume' in meta[0]:
-                        volume_sim = self.util.single_similarity(
-                            meta[0]['volume'], dcharacteristic['volume'])
-                    fast_sim = (fc_sim + dfm_sim + volume_sim) / 3.0
-
-                    if fast_sim > self.results[id][x][dict_c_pos]:
-                        self.results[id][x][dict_c_pos] = fast_sim
-
-                    if 'shift' in characteristic:
-                        shift = characteristic['shift']
-                        fc_sim = self.util.single_similarity(shift['fc'], dcharacteristic['fc'])
-                        dfm_sim = self.util.single_similarity(shift['dfm'], dcharacteristic['dfm'])
-                        fast_sim = (fc_sim + dfm_sim) / 2.0
-
-                        if fast_sim > self.results[id][x][dict_c_pos]:
-                            self.results[id][x][dict_c_pos] = fast_sim
+
+        fc = numpy.take_along_axis(self.dict_matrix.fc, dict_c_pos, axis=1)
+        dfm = numpy.take_along_axis(self.dict_matrix.dfm, dict_c_pos, axis=1)
+        fc_sim = self.dict_matrix.single_similarity(characteristic['fc'], fc)
+        dfm_sim = self.dict_matrix.single_similarity(characteristic['dfm'], dfm)
+        volume_sim = 0
+
+        if len(meta) > 0 and 'volume' in meta[0]:
+            volume = numpy.take_along_axis(self.dict_matrix.volume, dict_c_pos, axis=1)
+            volume_sim = self.dict_matrix.single_similarity(meta[0]['volume'], volume)
+        fast_sim = (fc_sim + dfm_sim + volume_sim) / 3.0
+
+        if 'shift' in characteristic:
+            shift = characteristic['shift']
+            fc_sim = self.dict_matrix.single_similarity(shift['fc'], fc)
+            dfm_sim = self.dict_matrix.single_similarity(shift['dfm'], dfm)
+            fast_sim = numpy.maximum(fast_sim, (fc_sim + dfm_sim) / 2.0)
+        return fast_sim
@@ -15,6 +15,122 @@ under the License.
 """
 
 import configparser
+import copy
+
+REQUIRED = object()
+
+# options of the settings snapshot: section, option, type, fallback
+OPTIONS = (
+    ('stream', 'CHUNK', int, REQUIRED),
+    ('stream', 'SAMPLE_RATE', int, REQUIRED),
+    ('stream', 'THRESHOLD', int, REQUIRED),
+    ('stream', 'MAX_SILENCE_AFTER_START', float, REQUIRED),
+    ('stream', 'MAX_TIME', float, REQUIRED),
+    ('stream', 'LONG_SILENCE', int, REQUIRED),
+    ('stream', 'CHUNKS', int, REQUIRED),
+    ('stream', 'RING_BUFFER_SLOTS', int, 0),
+    ('stream', 'TOKEN_BUFFER_SLOTS', int, 0),
+    ('characteristic', 'PROGRESSIVE_FACTOR', float, 0),
+    ('characteristic', 'START_PROGRESSIVE_FACTOR', float, None),
+    ('characteristic', 'MIN_PROGRESSIVE_STEP', int, REQUIRED),
+    ('characteristic', 'MAX_PROGRESSIVE_STEP', int, REQUIRED),
+    ('characteristic', 'LOW_FREQ', int, REQUIRED),
+    ('characteristic', 'HIGH_FREQ', int, REQUIRED),
+    ('characteristic', 'HANNING', bool, REQUIRED),
+    ('characteristic', 'PEAK_FACTOR', float, REQUIRED),
+    ('compare', 'MIN_START_TOKENS', int, REQUIRED),
+    ('compare', 'MARGINAL_VALUE', float, REQUIRED),
+    ('compare', 'MIN_CROSS_SIMILARITY', float, REQUIRED),
+    ('compare', 'SIMILARITY_NORM', float, REQUIRED),
+    ('compare', 'SIMILARITY_HEIGHT', float, REQUIRED),
+    ('compare', 'SIMILARITY_DOMINANT_FREQUENCY', float, REQUIRED),
+    ('compare', 'NUMBER_OF_BEST_MATCHES', int, 1),
+    ('compare', 'MIN_LEFT_DISTANCE', float, REQUIRED),
+    ('compare', 'MIN_RIGHT_DISTANCE', float, REQUIRED),
+    ('compare', 'MAX_WORD_START_RESULTS', int, REQUIRED),
+    ('compare', 'MAX_TOP_RESULTS', int, REQUIRED),
+    ('compare', 'STRICT_LENGTH_CHECK', bool, REQUIRED),
+    ('compare', 'STRICT_LENGTH_UNDERMINING', int, REQUIRED),
+    ('compare', 'STM_RETENTION', float, REQUIRED),
+    ('compare', 'FILL_RESULT_PERCENTAGE', float, REQUIRED),
+    ('compare', 'CANDIDATE_INDEX', bool, False),
+    ('compare', 'CANDIDATE_MIN_SIMILARITY', float, 0),
+    ('compare', 'INCREMENTAL_SEARCH', bool, True),
+    ('misc', 'LOGLEVEL', str, 'ERROR'),
+    ('misc', 'COMPILE_WORKERS', int, 1),
+    ('misc', 'INCREMENTAL_COMPILE', bool, False),
+    ('misc', 'BATCH_WORKERS', int, 1),
+    ('misc', 'SERVER_WORKERS', int, 0),
+    ('misc', 'ASYNC_RUNTIME', bool, False),
+    ('misc', 'PLUGIN_TIMEOUT', float, 0),
+    ('misc', 'PLUGIN_CONCURRENCY', int, 4),
+    ('misc', 'PLUGIN_POOL', bool, True),
+    ('misc', 'PLUGIN_QUEUE_SIZE', int, 4),
+    ('misc', 'PLUGIN_POLICY', str, 'drop'),
+    ('misc', 'PLUGIN_RAWBUF', bool, True),
+    ('misc', 'DICT_RELOAD_INTERVAL', float, 0),
+    ('misc', 'TRACE', bool, False),
+    ('misc', 'TRACE_FILE', str, None),
+    ('experimental', 'FFT_SHIFT', bool, False),
+    ('cmdlopt', 'endless_loop', bool, False),
+    ('cmdlopt', 'debug', bool, False),
+    ('cmdlopt', 'plot', bool, False),
+    ('cmdlopt', 'wave', bool, False),
+    ('cmdlopt', 'outfile', str, None),
+    ('cmdlopt', 'infile', str, None),
+    ('cmdlopt', 'dict', str, None)
+)
+
+
+class Settings:
+    # Read only snapshot of the typed options, the attribute names are the
+    # lower case option names. Hot paths read these attributes instead of
+    # parsing the configparser strings again for every chunk or token.
+    __slots__ = tuple(option.lower() for section, option, option_type, fallback in OPTIONS)
+
+    def __init__(self, values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('settings are read only, use Config.setoption')
+
+    def __delattr__(self, name):
+        raise AttributeError('settings are read only, use Config.setoption')
+
+    def __reduce__(self):
+        return Settings, (tuple(getattr(self, name) for name in self.__slots__), )
+
+    @staticmethod
+    def create(config):
+        values = []
+        for section, option, option_type, fallback in OPTIONS:
+            if not config.has_option(section, option) or \
+                    (option_type is not str and config.get(section, option) in (None, '')):
+                if fallback is REQUIRED:
+                    raise ValueError('missing option ' + option + ' in section [' + section + ']')
+                values.append(fallback)
+                continue
+            try:
+                if option_type is bool:
+                    value = config.getboolean(section, option)
+                elif option_type is str:
+                    value = config.get(section, option) or fallback
+                else:
+                    value = option_type(config.get(section, option))
+            except ValueError as exc:
+                raise ValueError('invalid value for ' + option + ' in section [' + section +
+                                 ']: ' + str(exc))
+            values.append(value)
+        settings = Settings(values)
+        for name in ('chunk', 'sample_rate', 'chunks', 'min_progressive_step'):
+            if getattr(settings, name) <= 0:
+                raise ValueError(name.upper() + ' must be greater than 0')
+        if settings.low_freq >= settings.high_freq:
+            raise ValueError('LOW_FREQ must be lower than HIGH_FREQ')
+        if settings.plugin_policy not in ('drop', 'skip'):
+            raise ValueError('PLUGIN_POLICY must be drop or skip')
+        return settings
 
 
 class Config:
@@ -22,6 +138,16 @@ class Config:
         self.config = configparser.ConfigParser(allow_no_value=True)
         self.config.read(config_file)
         self.logger = None
+        self.settings = None
+
+    def copy(self):
+        # options which can be changed without affecting this config,
+        # the logger is shared
+        cfg = Config.__new__(Config)
+        cfg.config = copy.deepcopy(self.config)
+        cfg.logger = self.logger
+        cfg.settings = None
+        return cfg
 
     def getoption(self, section, option, **kwargs):
         return self.config.get(section, option, **kwargs)
@@ -35,11 +161,19 @@ class Config:
     def getbool(self, section, option, **kwargs):
         return self.config.getboolean(section, option, **kwargs)
 
+    def getsettings(self):
+        # built on first use and after every change of the options
+        if self.settings is None:
+            self.settings = Settings.create(self.config)
+        return self.settings
+
     def addsection(self, section):
         self.config.add_section(section)
+        self.settings = None
 
     def setoption(self, section, id, option):
         self.config.set(section, id, option)
+        self.settings = None
 
     def hasoption(self, section, option):
         return self.config.has_option(section, option)
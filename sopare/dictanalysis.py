@@ -0,0 +1,79 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+
+class DictionaryAnalysis:
+    # Set based form of Util.compile_analysis. add() folds one dictionary
+    # entry into per word aggregates (sets for peaks and dominant
+    # frequencies, ordered sets for peak counts) and get_analysis() returns
+    # the dict_analysis layout.
+    def __init__(self, json_data=None):
+        self.words = {}
+        if json_data is not None:
+            for dict_entries in json_data['dict']:
+                self.add(dict_entries)
+
+    def add(self, dict_entries):
+        id = dict_entries['id']
+        if id not in self.words:
+            self.words[id] = {'min_tokens': 0, 'max_tokens': 0, 'first_peaks': [],
+                              'peaks': [], 'entries': [], 'df': [], 'cp': []}
+        word = self.words[id]
+        length = len(dict_entries['characteristic'])
+
+        if length < 2:
+            print('the following characteristic is < 2!')
+            print((id + ', ' + dict_entries['uuid']))
+
+        if length > word['max_tokens']:
+            word['max_tokens'] = length
+        if length < word['min_tokens'] or word['min_tokens'] == 0:
+            word['min_tokens'] = length
+
+        for i, entry in enumerate(dict_entries['characteristic']):
+            if i == len(word['first_peaks']):
+                # the first entry of a token keeps the order and duplicates
+                # of its peaks, later entries only add missing peaks
+                word['first_peaks'].append([int(peak) for peak in entry['peaks']])
+                word['peaks'].append(set())
+                word['entries'].append(0)
+                word['df'].append(set())
+                word['cp'].append({})
+            elif len(entry['peaks']) > 0:
+                word['peaks'][i].update(int(peak) for peak in entry['peaks'])
+            word['entries'][i] += 1
+            word['df'][i].add(entry['df'])
+            # dict keeps the insertion order of the peak counts
+            word['cp'][i].setdefault(len(entry['peaks']), None)
+
+    @staticmethod
+    def compile_word(word):
+        peaks = []
+        for first_peaks, peak_set, entries in zip(word['first_peaks'], word['peaks'],
+                                                  word['entries']):
+            if entries > 1:
+                peaks.append(sorted(first_peaks + list(peak_set.difference(first_peaks))))
+            else:
+                peaks.append(list(first_peaks))
+        cp = [list(counts) for counts in word['cp']]
+        return {'min_tokens': word['min_tokens'], 'max_tokens': word['max_tokens'],
+                'peaks': peaks, 'df': [sorted(df) for df in word['df']],
+                'minp': [min(p) if len(p) > 0 else 0 for p in peaks],
+                'maxp': [max(p) if len(p) > 0 else 0 for p in peaks],
+                'cp': cp, 'mincp': [min(c) for c in cp], 'maxcp': [max(c) for c in cp]}
+
+    def get_analysis(self):
+        return {id: self.compile_word(word) for id, word in self.words.items()}
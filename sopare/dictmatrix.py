@@ -0,0 +1,228 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import struct
+import numpy
+import sopare.dictstore
+import sopare.numpyjsonencoder
+
+MAGIC = b'SOPAREDM'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARRAYS = ('lengths', 'norm', 'norm_len', 'norm_length', 'token_peaks', 'token_peaks_len',
+          'token_peaks_length', 'df', 'fc', 'dfm', 'volume')
+
+
+class DictionaryMatrix:
+    def __init__(self, learned_dict, analysis=None):
+        entries = learned_dict['dict']
+        self.analysis = analysis
+        # signature of the dictionary files at compile time, see Util.get_dict_signature
+        self.sources = None
+        self.ids = [dict_entries['id'] for dict_entries in entries]
+        self.uuids = [dict_entries.get('uuid', '') for dict_entries in entries]
+        self.entries_by_id = self.index_ids(self.ids)
+        characteristics = [dict_entries['characteristic'] for dict_entries in entries]
+        self.lengths = numpy.array([len(c) for c in characteristics], dtype=numpy.intp)
+        max_tokens = int(self.lengths.max()) if len(entries) > 0 else 0
+        norm_bins = self.max_length(characteristics, 'norm')
+        peak_bins = self.max_length(characteristics, 'token_peaks')
+
+        self.norm = numpy.zeros((len(entries), max_tokens, norm_bins))
+        self.norm_len = numpy.zeros((len(entries), max_tokens), dtype=numpy.intp)
+        self.token_peaks = numpy.zeros((len(entries), max_tokens, peak_bins))
+        self.token_peaks_len = numpy.zeros((len(entries), max_tokens), dtype=numpy.intp)
+        self.df = numpy.zeros((len(entries), max_tokens))
+        self.fc = numpy.zeros((len(entries), max_tokens))
+        self.dfm = numpy.zeros((len(entries), max_tokens))
+        self.volume = numpy.zeros((len(entries), max_tokens))
+        for e, dict_characteristic in enumerate(characteristics):
+            for t, dcharacteristic in enumerate(dict_characteristic):
+                self.fill(self.norm, self.norm_len, e, t, dcharacteristic['norm'])
+                self.fill(self.token_peaks, self.token_peaks_len, e, t,
+                          dcharacteristic['token_peaks'])
+                self.df[e, t] = dcharacteristic['df']
+                self.fc[e, t] = dcharacteristic['fc']
+                self.dfm[e, t] = dcharacteristic['dfm']
+                self.volume[e, t] = dcharacteristic['volume']
+        self.norm_length = numpy.linalg.norm(self.norm, axis=-1)
+        self.token_peaks_length = numpy.linalg.norm(self.token_peaks, axis=-1)
+
+    @staticmethod
+    def index_ids(ids):
+        entries_by_id = {}
+        for i, id in enumerate(ids):
+            entries_by_id.setdefault(id, []).append(i)
+        return entries_by_id
+
+    def save(self, filename):
+        # flat layout: magic, version, header length, JSON header with the
+        # array index and the aligned raw arrays which can be mapped on load
+        arrays = {}
+        offset = 0
+        for name in ARRAYS:
+            array = numpy.ascontiguousarray(getattr(self, name))
+            arrays[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({'ids': self.ids, 'uuids': self.uuids, 'analysis': self.analysis,
+                             'sources': self.sources, 'arrays': arrays},
+                            cls=sopare.numpyjsonencoder.NumpyJSONEncoder).encode('utf-8')
+        start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+        header += b' ' * (start - len(MAGIC) - 8 - len(header))
+        chunks = [MAGIC + struct.pack('<II', FORMAT_VERSION, len(header)) + header]
+        for name in ARRAYS:
+            array = numpy.ascontiguousarray(getattr(self, name))
+            chunks.append(array.tobytes())
+            chunks.append(b'\0' * (-array.nbytes % ALIGNMENT))
+        # workers may map the old file while the new one is written
+        sopare.dictstore.write_atomic(filename, chunks)
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'rb') as matrix_file:
+            if matrix_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(filename + ' is not a compiled dictionary')
+            version, header_length = struct.unpack('<II', matrix_file.read(8))
+            if version != FORMAT_VERSION:
+                raise ValueError(filename + ' has unsupported format version ' + str(version))
+            header = json.loads(matrix_file.read(header_length).decode('utf-8'),
+                                object_hook=sopare.numpyjsonencoder.numpy_json_hook)
+        start = len(MAGIC) + 8 + header_length
+        buf = numpy.memmap(filename, dtype=numpy.uint8, mode='r')
+        matrix = DictionaryMatrix({'dict': []}, header['analysis'])
+        matrix.ids = header['ids']
+        matrix.uuids = header['uuids']
+        matrix.sources = header.get('sources')
+        matrix.entries_by_id = matrix.index_ids(matrix.ids)
+        for name in ARRAYS:
+            info = header['arrays'][name]
+            dtype = numpy.dtype(info['dtype'])
+            count = int(numpy.prod(info['shape']))
+            offset = start + info['offset']
+            array = buf[offset:offset + count * dtype.itemsize].view(dtype)
+            setattr(matrix, name, array.reshape(info['shape']))
+        return matrix
+
+    @staticmethod
+    def max_length(characteristics, key):
+        return max([len(dcharacteristic[key]) for dict_characteristic in characteristics
+                    for dcharacteristic in dict_characteristic], default=0)
+
+    @staticmethod
+    def fill(target, lengths, e, t, values):
+        values = numpy.asarray(values, dtype=float).ravel()
+        lengths[e, t] = len(values)
+        # values beyond the dictionary width never meet a dictionary value
+        values = values[:target.shape[-1]]
+        target[e, t, :len(values)] = values
+
+    def get_entries(self, id):
+        return self.entries_by_id.get(id, [])
+
+    def utterance(self, data):
+        characteristics = [characteristic for characteristic, _ in data]
+        utterance = {
+            'norm': self.pad([c['norm'] for c in characteristics], self.norm.shape[-1]),
+            'token_peaks': self.pad([c['token_peaks'] for c in characteristics],
+                                    self.token_peaks.shape[-1]),
+            'df': numpy.array([c['df'] for c in characteristics], dtype=float),
+            'shift': None,
+            'has_shift': numpy.array(['shift' in c for c in characteristics], dtype=bool)
+        }
+        if utterance['has_shift'].any():
+            shift = [c['shift']['norm'] if 'shift' in c else [] for c in characteristics]
+            utterance['shift'] = self.pad(shift, self.norm.shape[-1])
+        return utterance
+
+    @staticmethod
+    def pad(vectors, width):
+        padded = numpy.zeros((len(vectors), width))
+        lengths = numpy.zeros(len(vectors), dtype=numpy.intp)
+        vector_lengths = numpy.zeros(len(vectors))
+        for x, v in enumerate(vectors):
+            v = numpy.asarray(v, dtype=float).ravel()
+            lengths[x] = len(v)
+            vector_lengths[x] = numpy.linalg.norm(v)
+            v = v[:width]
+            padded[x, :len(v)] = v
+        return padded, lengths, vector_lengths
+
+    @staticmethod
+    def cosine(dvalues, dlength, uvalues, ulength):
+        dot = numpy.einsum('...n,...n->...', dvalues, uvalues)
+        np = dlength * ulength
+        return numpy.divide(dot, np, out=numpy.zeros_like(dot), where=np > 0)
+
+    @staticmethod
+    def single_similarity(a, b):
+        high = numpy.maximum(a, b)
+        low = numpy.minimum(a, b)
+        sim = numpy.divide(low, high, out=numpy.zeros_like(high), where=high != 0)
+        sim[(a == 0) & (b == 0)] = 1
+        return sim
+
+    @staticmethod
+    def manhattan_distance(dvalues, dlen, uvalues, ulen):
+        # mirrors Util.manhattan_distance: the split point depends on the longer
+        # vector while zip() only walks the common part of both vectors
+        ll = (numpy.maximum(dlen, ulen) // 2)[..., None]
+        common = numpy.minimum(dlen, ulen)[..., None]
+        bins = numpy.arange(dvalues.shape[-1])
+        diff = numpy.abs(uvalues - dvalues) * (bins < common)
+        left = bins < ll
+        return (diff * left).sum(axis=-1), (diff * ~left).sum(axis=-1)
+
+    def score(self, entries, tokens, utterance, upos, weights):
+        # entries/tokens select dictionary tokens, upos the utterance tokens.
+        # All three index arrays broadcast to the shape of the result.
+        unorm, unorm_len, unorm_length = utterance['norm']
+        dnorm = self.norm[entries, tokens]
+        dnorm_len = self.norm_len[entries, tokens]
+        sim_norm = self.cosine(dnorm, self.norm_length[entries, tokens],
+                               unorm[upos], unorm_length[upos])
+        upeaks, _, upeaks_length = utterance['token_peaks']
+        sim_token_peaks = self.cosine(self.token_peaks[entries, tokens],
+                                      self.token_peaks_length[entries, tokens],
+                                      upeaks[upos], upeaks_length[upos])
+        sim_dom_freq = self.single_similarity(utterance['df'][upos], self.df[entries, tokens])
+        sim = (sim_norm * weights[0] + sim_token_peaks * weights[1] +
+               sim_dom_freq * weights[2])
+
+        sl, sr = self.manhattan_distance(dnorm, dnorm_len, unorm[upos], unorm_len[upos])
+        if utterance['shift'] is not None:
+            snorm, snorm_len, _ = utterance['shift']
+            ssl, ssr = self.manhattan_distance(dnorm, dnorm_len, snorm[upos], snorm_len[upos])
+            has_shift = utterance['has_shift'][upos]
+            sl = numpy.where(has_shift, numpy.minimum(sl, ssl), sl)
+            sr = numpy.where(has_shift, numpy.minimum(sr, ssr), sr)
+        return sim, sl, sr
+
+    def inspect(self, entries, startpos, utterance, weights):
+        entries = numpy.asarray(entries, dtype=numpy.intp)
+        startpos = numpy.asarray(startpos, dtype=numpy.intp)
+        data_length = len(utterance['df'])
+        zeros = numpy.zeros(len(entries))
+        if len(entries) == 0 or data_length == 0:
+            return zeros, zeros, zeros, zeros.astype(numpy.intp)
+
+        tokens = numpy.arange(self.norm.shape[1])
+        pos = startpos[:, None] + tokens[None, :]
+        valid = (tokens[None, :] < self.lengths[entries][:, None]) & (pos < data_length)
+        pos = numpy.where(valid, pos, 0)
+        sim, sl, sr = self.score(entries[:, None], tokens[None, :], utterance, pos, weights)
+        return ((sim * valid).sum(axis=1), (sl * valid).sum(axis=1),
+                (sr * valid).sum(axis=1), valid.sum(axis=1))
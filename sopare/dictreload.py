@@ -0,0 +1,80 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import logging
+import threading
+import sopare.util
+
+
+class DictionaryReloader(threading.Thread):
+    # Loads the dictionary in the background when one of its files changed
+    # or a reload was requested. The worker takes the new matrix with get()
+    # between two words, so recognition goes on with the old one meanwhile.
+    def __init__(self, cfg, interval):
+        super().__init__(name='dictionary reloader')
+        self.daemon = True
+        self.logger = logging.getLogger(__name__)
+        # own instance, the cache of the worker util is in use by the analysis
+        self.util = sopare.util.Util(cfg.getbool('cmdlopt', 'debug'),
+                                     cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+        self.interval = interval
+        self.requested = threading.Event()
+        self.lock = threading.Lock()
+        self.running = True
+        self.dict_matrix = None
+        self.signature = sopare.util.Util.get_dict_signature()
+        self.reloads = 0
+        self.errors = 0
+
+    def request(self):
+        self.requested.set()
+
+    def run(self):
+        while self.running:
+            requested = self.requested.wait(self.interval if self.interval > 0 else None)
+            self.requested.clear()
+            # dict.bin is compiled from the files of the signature, a new one
+            # comes with a changed log
+            if self.running and (requested or
+                                 sopare.util.Util.get_dict_signature() != self.signature):
+                self.load()
+
+    def load(self):
+        signature = sopare.util.Util.get_dict_signature()
+        try:
+            dict_matrix = self.util.get_dict_matrix()
+        except (OSError, ValueError) as exc:
+            # e.g. a dict.json copied in right now, the next poll tries again
+            self.errors += 1
+            self.logger.error('dictionary reload failed: ' + str(exc))
+            return
+        # changes during the load are picked up next time
+        self.signature = signature
+        with self.lock:
+            self.dict_matrix = dict_matrix
+            self.reloads += 1
+        self.logger.info('dictionary reloaded with ' + str(len(dict_matrix.ids)) + ' entries')
+
+    def get(self):
+        # the matrix loaded since the last call or None
+        with self.lock:
+            dict_matrix = self.dict_matrix
+            self.dict_matrix = None
+        return dict_matrix
+
+    def stop(self):
+        self.running = False
+        self.requested.set()
@@ -0,0 +1,337 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import contextlib
+import json
+import os
+import uuid
+import sopare.numpyjsonencoder
+try:
+    import fcntl
+except ImportError:
+    # without flock only a single writer at a time is safe
+    fcntl = None
+
+MAGIC = ['sopare-dict', 1]
+INDEX_VERSION = 1
+# compact when at least COMPACT_RECORDS records are dead and they make up
+# more than COMPACT_RATIO of the log
+COMPACT_RECORDS = 16
+COMPACT_RATIO = 0.5
+
+
+class DictionaryStore:
+    # Append-only log of dictionary records. Every record is one line: a JSON
+    # header with the operation, word id and uuid, a tab and the JSON payload.
+    # A delete appends a tombstone, compaction copies the live records into a
+    # new log which replaces the old one with an atomic rename.
+    # The offsets of the live records are kept in the index file next to the
+    # log. It is valid for the inode and the size of the log it was written
+    # for, later records are read from the log. Writers hold an exclusive
+    # flock on the lock file, readers a shared one. A read-only store never
+    # writes, not even the lock file or a missing log.
+    def __init__(self, filename, readonly=False):
+        self.filename = filename
+        self.readonly = readonly
+        self.index_filename = filename + '.idx'
+        self.lock_filename = filename + '.lock'
+        self.offsets = {}
+        self.uuids_by_id = {}
+        self.records = 0
+        self.size = 0
+        self.inode = None
+        self.json_filename = None
+        with self.lock(not readonly):
+            if os.path.exists(filename):
+                self.read_index()
+                self.refresh()
+            elif not readonly:
+                self.write_log([])
+
+    @staticmethod
+    def load(filename, json_filename=None):
+        # a dictionary which only exists as JSON or a JSON file which was
+        # replaced after the last write of the log is imported. The JSON
+        # file is exported again with every compaction.
+        created = not os.path.exists(filename)
+        store = DictionaryStore(filename)
+        store.json_filename = json_filename
+        with store.lock(True):
+            store.refresh()
+            # another store may have added records to the new log in between
+            if store.needs_import(json_filename, created and store.records == 0):
+                store.write_entries(read_json(json_filename)['dict'])
+        return store
+
+    @staticmethod
+    def read(filename, json_filename=None):
+        # the dictionary as load() would see it, without writing anything
+        store = DictionaryStore(filename, readonly=True)
+        with store.lock(False):
+            store.refresh()
+            if store.needs_import(json_filename):
+                return read_json(json_filename)
+            return {'dict': store.read_entries('*')}
+
+    def needs_import(self, json_filename, created=False):
+        if json_filename is None or not os.path.exists(json_filename):
+            return False
+        if created or not os.path.exists(self.filename):
+            return True
+        return os.path.getmtime(json_filename) > os.path.getmtime(self.filename)
+
+    @contextlib.contextmanager
+    def lock(self, exclusive):
+        if exclusive and self.readonly:
+            raise ValueError(self.filename + ' is opened read-only')
+        if fcntl is None or (self.readonly and not os.path.exists(self.lock_filename)):
+            # no writer has used the log yet
+            yield
+            return
+        with open(self.lock_filename, 'r' if self.readonly else 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def encode_entry(dict_entries):
+        return DictionaryStore.encode(['add', dict_entries['id'], dict_entries['uuid']],
+                                      dict_entries)
+
+    @staticmethod
+    def encode(header, dict_entries=None):
+        line = json.dumps(header)
+        if dict_entries is not None:
+            line += '\t' + json.dumps(dict_entries, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+        return (line + '\n').encode('utf-8')
+
+    def read_index(self):
+        try:
+            with open(self.index_filename) as index_file:
+                index = json.load(index_file)
+            stat = os.stat(self.filename)
+            if index['version'] != INDEX_VERSION or index['inode'] != stat.st_ino or \
+                    index['size'] > stat.st_size:
+                return
+        except (OSError, ValueError, KeyError):
+            return
+        self.offsets = {}
+        self.uuids_by_id = {}
+        for _uuid, id, start, length, offset, line_length in index['offsets']:
+            self.offsets[_uuid] = (id, start, length, offset, line_length)
+            self.uuids_by_id.setdefault(id, []).append(_uuid)
+        self.records = index['records']
+        self.size = index['size']
+        self.inode = index['inode']
+
+    def write_index(self):
+        offsets = [[_uuid] + list(position) for _uuid, position in self.offsets.items()]
+        index = {'version': INDEX_VERSION, 'inode': self.inode, 'size': self.size,
+                 'records': self.records, 'offsets': offsets}
+        write_atomic(self.index_filename, [json.dumps(index).encode('utf-8')])
+
+    def refresh(self):
+        # picks up records appended by other processes. A new inode or a
+        # shorter file means the log was compacted in the meantime.
+        if self.readonly and not os.path.exists(self.filename):
+            return
+        stat = os.stat(self.filename)
+        if stat.st_ino != self.inode or stat.st_size < self.size:
+            self.offsets = {}
+            self.uuids_by_id = {}
+            self.records = 0
+            self.size = 0
+            self.inode = stat.st_ino
+        if stat.st_size == self.size:
+            return
+        with open(self.filename, 'rb') as log_file:
+            log_file.seek(self.size)
+            offset = self.size
+            for line in log_file:
+                if not line.endswith(b'\n'):
+                    # torn write of a crashed writer, overwritten by the next append
+                    break
+                self.read_record(line, offset)
+                offset += len(line)
+        self.size = offset
+
+    def read_record(self, line, offset):
+        header, _, payload = line.partition(b'\t')
+        header = json.loads(header.decode('utf-8'))
+        if offset == 0:
+            if header != MAGIC:
+                raise ValueError(self.filename + ' is not a sopare dictionary log')
+            return
+        self.records += 1
+        if header[0] == 'add':
+            _, id, _uuid = header
+            self.remove(_uuid)
+            start = offset + line.index(b'\t') + 1
+            self.offsets[_uuid] = (id, start, len(payload) - 1, offset, len(line))
+            self.uuids_by_id.setdefault(id, []).append(_uuid)
+        elif header[0] == 'delete':
+            if header[1] == '*':
+                self.offsets = {}
+                self.uuids_by_id = {}
+            else:
+                for _uuid in self.uuids_by_id.pop(header[1], []):
+                    del self.offsets[_uuid]
+        else:
+            raise ValueError(self.filename + ' contains unknown record ' + str(header[0]))
+
+    def remove(self, _uuid):
+        if _uuid in self.offsets:
+            id = self.offsets.pop(_uuid)[0]
+            self.uuids_by_id[id].remove(_uuid)
+            if len(self.uuids_by_id[id]) == 0:
+                del self.uuids_by_id[id]
+
+    def append(self, records):
+        with self.lock(True):
+            self.refresh()
+            with open(self.filename, 'r+b') as log_file:
+                # a torn record at the end is cut off before the new ones are added
+                log_file.seek(self.size)
+                log_file.truncate()
+                offset = self.size
+                if offset == 0:
+                    records = [self.encode(MAGIC)] + records
+                for line in records:
+                    log_file.write(line)
+                    self.read_record(line, offset)
+                    offset += len(line)
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            self.size = offset
+            dead = self.records - len(self.offsets)
+            if dead >= COMPACT_RECORDS and dead > self.records * COMPACT_RATIO:
+                self.write_live_records()
+            else:
+                self.write_index()
+
+    def add(self, dict_entries):
+        dict_entries = self.with_uuid(dict_entries)
+        self.append([self.encode_entry(dict_entries)])
+        return dict_entries
+
+    @staticmethod
+    def with_uuid(dict_entries):
+        if 'uuid' in dict_entries:
+            return dict_entries
+        return dict(dict_entries, uuid=str(uuid.uuid4()))
+
+    def delete(self, id):
+        self.append([self.encode(['delete', id])])
+
+    def get_ids(self):
+        with self.lock(False):
+            self.refresh()
+            return list(self.uuids_by_id)
+
+    def get_entries(self, id='*'):
+        with self.lock(False):
+            self.refresh()
+            return self.read_entries(id)
+
+    def read_entries(self, id):
+        if id == '*':
+            positions = list(self.offsets.values())
+        else:
+            positions = [self.offsets[_uuid] for _uuid in self.uuids_by_id.get(id, [])]
+        entries = []
+        if len(positions) == 0:
+            return entries
+        with open(self.filename, 'rb') as log_file:
+            for _, start, length, _, _ in positions:
+                log_file.seek(start)
+                entries.append(json.loads(
+                    log_file.read(length).decode('utf-8'),
+                    object_hook=sopare.numpyjsonencoder.numpy_json_hook))
+        return entries
+
+    def get_dict(self):
+        return {'dict': self.get_entries()}
+
+    def get_stats(self):
+        with self.lock(False):
+            self.refresh()
+            return {'records': self.records, 'live': len(self.offsets),
+                    'dead': self.records - len(self.offsets), 'size': self.size}
+
+    def compact(self):
+        with self.lock(True):
+            self.refresh()
+            self.write_live_records()
+
+    def write_live_records(self):
+        positions = list(self.offsets.values())
+        with open(self.filename, 'rb') as log_file:
+            lines = []
+            for _, _, _, offset, length in positions:
+                log_file.seek(offset)
+                lines.append(log_file.read(length))
+        self.write_log(lines)
+        if self.json_filename is not None:
+            self.write_json(self.json_filename)
+
+    def rewrite(self, entries):
+        with self.lock(True):
+            self.write_entries(entries)
+
+    def write_entries(self, entries):
+        self.write_log([self.encode_entry(self.with_uuid(dict_entries))
+                        for dict_entries in entries])
+
+    def write_log(self, lines):
+        write_atomic(self.filename, [self.encode(MAGIC)] + lines)
+        self.refresh()
+        self.write_index()
+
+    def export(self, filename):
+        with self.lock(False):
+            self.refresh()
+            self.write_json(filename)
+
+    def write_json(self, filename):
+        json_data = json.dumps({'dict': self.read_entries('*')},
+                               cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+        write_atomic(filename, [json_data.encode('utf-8')])
+        # same mtime as the log, so the export is not imported again
+        stat = os.stat(self.filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def read_json(filename):
+    with open(filename) as json_file:
+        return json.load(json_file, object_hook=sopare.numpyjsonencoder.numpy_json_hook)
+
+
+def write_atomic(filename, chunks):
+    # readers see either the old or the new file, never a partial one
+    tmp_filename = filename + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_filename, 'wb') as tmp_file:
+        for chunk in chunks:
+            tmp_file.write(chunk)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_filename, filename)
+    directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
@@ -0,0 +1,39 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import numpy
+
+
+def decode(buf):
+    # 16 bit signed mono samples, an odd trailing byte is ignored
+    return numpy.frombuffer(buf, dtype=numpy.int16, count=len(buf) // 2)
+
+
+def get_features(samples):
+    # RMS volume (as audioop.rms) and the sum of the absolute sample values
+    # along the last axis, for one chunk or a block of chunks at once
+    samples = samples.astype(numpy.int64)
+    length = max(samples.shape[-1], 1)
+    squares = numpy.einsum('...i,...i->...', samples, samples)
+    volume = numpy.sqrt(squares / length).astype(numpy.int64)
+    peaks = numpy.abs(samples).sum(axis=-1)
+    return volume, peaks
+
+
+def split(samples, chunk):
+    # full chunks as one (n, chunk) block and the remaining samples
+    end = len(samples) - len(samples) % chunk
+    return samples[0:end].reshape(-1, chunk), samples[end:]
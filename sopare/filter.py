@@ -16,33 +16,145 @@ under the License.
 
 import multiprocessing
 import logging
+import time
 import numpy
 import sopare.worker
 import sopare.characteristics
+import sopare.trace
+try:
+    from sopare.ringbuffer import RingBuffer
+except ImportError:
+    # multiprocessing.shared_memory requires Python 3.8
+    RingBuffer = None
 
+# sent instead of the filtered wave when nobody needs it
+EMPTY_TOKEN = numpy.zeros(0)
 
-class Filtering:
+
+class SpectralPlan:
+    # Everything the filter derives from the config, built once. Windows
+    # and progressive bin edges are cached per input length.
     def __init__(self, cfg):
+        self.chunks = cfg.getintoption('stream', 'CHUNKS')
+        self.low_freq = cfg.getintoption('characteristic', 'LOW_FREQ')
+        self.high_freq = cfg.getintoption('characteristic', 'HIGH_FREQ')
+        self.hanning = cfg.getbool('characteristic', 'HANNING')
+        self.fft_shift = cfg.getbool('experimental', 'FFT_SHIFT', fallback=False)
+        self.min_prog_step = cfg.getintoption('characteristic', 'MIN_PROGRESSIVE_STEP')
+        self.max_prog_step = cfg.getintoption('characteristic', 'MAX_PROGRESSIVE_STEP')
+        self.start_prog_factor = cfg.getfloatoption('characteristic', 'START_PROGRESSIVE_FACTOR',
+                                                    fallback=None)
+        self.band = slice(self.low_freq, self.high_freq)
+        self.windows = {}
+        self.edges = {}
+
+    def get_window(self, length):
+        if length not in self.windows:
+            hl = length
+            if hl % 2 != 0:
+                hl += 1
+            self.windows[length] = numpy.hanning(hl)
+        return self.windows[length]
+
+    def get_edges(self, size):
+        # start and end of every progressive bin, the bins may overlap
+        if size not in self.edges:
+            edges = []
+            progessive = 1
+            min_prog_step = self.min_prog_step
+            for x in range(0, size, self.min_prog_step):
+                if self.start_prog_factor is not None and x >= self.start_prog_factor:
+                    progessive += progessive * self.start_prog_factor
+                    min_prog_step += int(progessive)
+                    if min_prog_step > self.max_prog_step:
+                        min_prog_step = self.max_prog_step
+                edges.append(x)
+                edges.append(min(x + min_prog_step, size))
+            self.edges[size] = numpy.array(edges, dtype=numpy.intp)
+        return self.edges[size]
+
+    def get_chunked_norm(self, nfft):
+        if nfft.size == 0:
+            return numpy.zeros(0)
+        # the appended zero makes the end edge at nfft.size a valid index
+        return numpy.add.reduceat(numpy.append(nfft, 0), self.get_edges(nfft.size))[::2]
+
+
+class Filtering:
+    def __init__(self, cfg, queue=None):
         self.cfg = cfg
         self.first = True
-        self.queue = multiprocessing.Queue()
         self.characteristic = sopare.characteristics.Characteristic(
             self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
-        self.worker = sopare.worker.Worker(self.cfg, self.queue)
+        # the fft is only needed by the worker to plot or to train
+        self.send_fft = (self.cfg.getbool('cmdlopt', 'plot') is True or
+                         self.cfg.getoption('cmdlopt', 'dict') is not None)
+        # the filtered wave is only needed to save waves or for the plugins
+        self.send_token = (self.cfg.getbool('cmdlopt', 'wave') is True or
+                           self.cfg.getbool('misc', 'PLUGIN_RAWBUF', fallback=True) is True)
+        self.plan = SpectralPlan(self.cfg)
+        # without a queue the filtered data is handed to a new worker process,
+        # otherwise the owner of the queue consumes it
+        self.worker = None
+        self.token_buffer = None
+        if queue is None:
+            queue = multiprocessing.Queue()
+            self.token_buffer = self.create_token_buffer()
+            self.worker = sopare.worker.Worker(self.cfg, queue, token_buffer=self.token_buffer)
+        self.queue = queue
         self.data_shift = []
         self.last_data = None
         self.data_shift_counter = 0
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
+
+    def create_token_buffer(self):
+        slots = self.cfg.getintoption('stream', 'TOKEN_BUFFER_SLOTS', fallback=0)
+        if slots <= 0 or RingBuffer is None:
+            return None
+        chunks = self.cfg.getintoption('stream', 'CHUNKS')
+        slot_size = chunks * 8
+        if self.send_fft is True:
+            slot_size += (chunks // 2 + 1) * 16
+        # never block the filter, tokens that don't fit are sent with the message
+        return RingBuffer(slots, slot_size, 0)
 
     def stop(self):
         self.queue.put({'action': 'stop'})
         self.queue.close()
         self.queue.join_thread()
+        if self.token_buffer is not None:
+            self.token_buffer.unlink()
+            self.token_buffer = None
+
+    def send(self, data, fft, normalized, meta, characteristic):
+        obj = {
+            'action': 'data',
+            'token': data,
+            'fft': fft if self.send_fft is True else None,
+            'norm': normalized,
+            'meta': meta,
+            'characteristic': characteristic,
+            'shm': None,
+            'time': time.monotonic(),
+            'spans': self.tracer.take()
+        }
+        if self.token_buffer is not None:
+            arrays = [data, fft] if self.send_fft is True else [data]
+            buf = b''.join(array.tobytes() for array in arrays)
+            if len(buf) <= self.token_buffer.slot_size and self.token_buffer.put(buf):
+                obj['token'] = None
+                obj['fft'] = None
+                obj['shm'] = (len(data), len(fft) if self.send_fft is True else 0)
+        self.queue.put(obj)
 
     def reset(self):
         self.queue.put({'action': 'reset'})
 
+    def reload_dictionary(self):
+        self.queue.put({'action': 'reload'})
+
     @staticmethod
     def check_for_windowing(meta):
         for m in meta:
@@ -51,83 +163,62 @@ class Filtering:
         return False
 
     def get_chunked_norm(self, nfft):
-        chunked_norm = []
-        progessive = 1
-        min_prog_step = self.cfg.getintoption('characteristic', 'MIN_PROGRESSIVE_STEP')
-        max_prog_step = self.cfg.getintoption('characteristic', 'MAX_PROGRESSIVE_STEP')
-        start_prog_factor = self.cfg.getfloatoption('characteristic', 'START_PROGRESSIVE_FACTOR',
-                                                    fallback=None)
-        for x in range(0, nfft.size, min_prog_step):
-            if start_prog_factor is not None and x >= start_prog_factor:
-                progessive += progessive * start_prog_factor
-                min_prog_step += int(progessive)
-                if min_prog_step > max_prog_step:
-                    min_prog_step = max_prog_step
-            chunked_norm.append(nfft[x:x + min_prog_step].sum())
-
-        return numpy.array(chunked_norm)
+        return self.plan.get_chunked_norm(nfft)
 
     @staticmethod
     def normalize(fft):
         norm = numpy.linalg.norm(fft)
         if norm > 0:
-            return (fft / norm).tolist()
-        return []
+            return fft / norm
+        return numpy.zeros(0)
 
     def n_shift(self, data):
         if self.first is True:
-            self.data_shift = []
             self.data_shift_counter = 0
+        half = len(data) // 2
         if self.data_shift_counter == 0:
-            self.data_shift = [v for v in range(0, self.cfg.getintoption('stream', 'CHUNKS') // 2)]
-            self.data_shift.extend(data[len(data) // 2:])
+            self.data_shift = numpy.concatenate((numpy.arange(0, self.plan.chunks // 2),
+                                                 data[half:]))
         elif self.data_shift_counter == 1:
-            self.data_shift = self.data_shift[len(self.data_shift) // 2:]
-            self.data_shift.extend(data[0:len(data) // 2])
+            self.data_shift = numpy.concatenate((self.data_shift[len(self.data_shift) // 2:],
+                                                 data[0:half]))
         else:
-            self.data_shift = self.last_data[len(self.last_data) // 2:]
-            self.data_shift.extend(data[0:len(data) // 2])
+            self.data_shift = numpy.concatenate((self.last_data, data[0:half]))
 
-        self.last_data = data
+        # copy, data may be a view of a buffer that is reused by the caller
+        self.last_data = data[half:].copy()
         self.data_shift_counter += 1
 
     def filter(self, data, meta):
-        self.n_shift(data)
+        start = self.tracer.start()
+        plan = self.plan
         shift_fft = None
-        chunks = self.cfg.getintoption('stream', 'CHUNKS')
+        # the shifted fft is only used by the FFT_SHIFT experiment
+        if plan.fft_shift is True:
+            self.n_shift(data)
+        shift = plan.fft_shift is True and len(self.data_shift) >= plan.chunks
 
-        if (self.first is False or
-                self.cfg.getbool('characteristic', 'HANNING') is False or
-                len(data) < chunks):
+        if self.first is False or plan.hanning is False or len(data) < plan.chunks:
             fft = numpy.fft.rfft(data)
-            if len(self.data_shift) >= chunks:
+            if shift is True:
                 shift_fft = numpy.fft.rfft(self.data_shift)
             self.first = self.check_for_windowing(meta)
         elif self.first is True:
             self.logger.debug('New window!')
-            hl = len(data)
-            if hl % 2 != 0:
-                hl += 1
-            hw = numpy.hanning(hl)
-            fft = numpy.fft.rfft(data * hw)
-            if len(self.data_shift) >= chunks:
-                hl = len(self.data_shift)
-                if hl % 2 != 0:
-                    hl += 1
-                hw = numpy.hanning(hl)
-                shift_fft = numpy.fft.rfft(self.data_shift * hw)
-                self.first = False
+            fft = numpy.fft.rfft(data * plan.get_window(len(data)))
+            # a new window starts the shifted data with a full chunk
+            if shift is True:
+                shift_fft = numpy.fft.rfft(
+                    self.data_shift * plan.get_window(len(self.data_shift)))
+            self.first = False
 
         # FIXME: fft may not be set
-        fft[self.cfg.getintoption('characteristic', 'HIGH_FREQ'):] = 0
-        fft[:self.cfg.getintoption('characteristic', 'LOW_FREQ')] = 0
-        data = numpy.fft.irfft(fft)
-        nfft = fft[self.cfg.getintoption('characteristic', 'LOW_FREQ'):self.cfg.getintoption(
-            'characteristic', 'HIGH_FREQ')]
-        nfft = numpy.abs(nfft)
-        nfft[nfft == 0] = numpy.NaN
-        nfft = numpy.log10(nfft) ** 2
-        nfft[numpy.isnan(nfft)] = 0
+        fft[plan.high_freq:] = 0
+        fft[:plan.low_freq] = 0
+        data = EMPTY_TOKEN
+        if self.send_token is True:
+            data = numpy.fft.irfft(fft)
+        nfft = self.log_power(fft[plan.band])
         nam = numpy.amax(nfft)
         normalized = [0]
 
@@ -137,19 +228,11 @@ class Filtering:
             normalized = self.normalize(chunked_norm)
         characteristic = self.characteristic.get_characteristic(fft, normalized, meta)
 
-        experimental_fft_shift = self.cfg.getbool('experimental', 'FFT_SHIFT', fallback=False)
-        if shift_fft is not None and experimental_fft_shift is True:
-            shift_fft[self.cfg.getintoption('characteristic', 'HIGH_FREQ'):] = 0
-            shift_fft[:self.cfg.getintoption('characteristic', 'LOW_FREQ')] = 0
-            # FIXME shift_data is never used and shift_nfft immediately overwriten
-            shift_data = numpy.fft.irfft(shift_fft)  # noqa: F841
-            shift_nfft = fft[
-                         self.cfg.getintoption('characteristic', 'LOW_FREQ'):self.cfg.getintoption(
-                             'characteristic', 'HIGH_FREQ')]
-            shift_nfft = numpy.abs(nfft)
-            shift_nfft[nfft == 0] = numpy.NaN
-            shift_nfft = numpy.log10(nfft) ** 2
-            shift_nfft[numpy.isnan(shift_nfft)] = 0
+        if shift_fft is not None:
+            shift_fft[plan.high_freq:] = 0
+            shift_fft[:plan.low_freq] = 0
+            # FIXME shift_nfft is computed from the unshifted fft
+            shift_nfft = self.log_power(fft[plan.band])
             shift_nam = numpy.amax(shift_nfft)
             shift_normalized = [0]
 
@@ -162,11 +245,11 @@ class Filtering:
                                                                           shift_normalized, meta)
             characteristic['shift'] = shift_characteristic
 
-        self.queue.put({
-            'action': 'data',
-            'token': data,
-            'fft': fft,
-            'norm': normalized,
-            'meta': meta,
-            'characteristic': characteristic
-        })
+        self.tracer.stop('filter', start)
+        self.send(data, fft, normalized, meta, characteristic)
+
+    @staticmethod
+    def log_power(fft):
+        # squared log10 of the magnitudes, bins without energy stay 0
+        nfft = numpy.abs(fft)
+        return numpy.log10(nfft, out=numpy.zeros_like(nfft), where=nfft > 0) ** 2
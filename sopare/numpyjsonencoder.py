@@ -17,10 +17,13 @@ under the License.
 import base64
 import json
 import numpy
+import sopare.characteristics
 
 
 class NumpyJSONEncoder(json.JSONEncoder):
     def default(self, obj):
+        if isinstance(obj, sopare.characteristics.TokenCharacteristic):
+            return obj.to_dict()
         if isinstance(obj, numpy.ndarray):
             if obj.flags['C_CONTIGUOUS']:
                 obj_data = obj.data
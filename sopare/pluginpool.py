@@ -0,0 +1,212 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import asyncio
+import concurrent.futures
+import inspect
+import logging
+import queue
+import threading
+import time
+import sopare.trace
+
+SKIP = 'skip'
+DROP = 'drop'
+# max. seconds stop() waits for the plugins without a PLUGIN_TIMEOUT
+STOP_TIMEOUT = 5
+
+
+class PluginRunner(threading.Thread):
+    # calls one plugin for every queued result, one call at a time
+    def __init__(self, plugin, queue_size, timeout, policy, semaphore, results, loop=None):
+        self.plugin = plugin
+        self.loop = loop
+        self.name_ = getattr(plugin, '__name__', plugin.__class__.__name__)
+        super().__init__(name='plugin ' + self.name_)
+        self.daemon = True
+        self.queue = queue.Queue(queue_size)
+        self.timeout = timeout
+        self.policy = policy
+        self.semaphore = semaphore
+        self.results = results
+        self.busy_since = None
+        self.future = None
+        self.timed_out = False
+        self.stopping = threading.Event()
+        self.calls = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency_sum = 0
+        self.latency_max = 0
+        self.start()
+
+    def submit(self, args):
+        busy_since = self.busy_since
+        if self.timeout > 0 and busy_since is not None and \
+                time.monotonic() - busy_since > self.timeout:
+            # the current call hangs, don't pile up more work
+            if self.timed_out is False:
+                self.timed_out = True
+                self.timeouts += 1
+            self.skipped += 1
+            return False
+        if self.queue.full():
+            if self.policy == SKIP:
+                self.skipped += 1
+                return False
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+        try:
+            self.queue.put_nowait(args)
+        except queue.Full:
+            self.skipped += 1
+            return False
+        return True
+
+    def run(self):
+        while not (self.stopping.is_set() and self.queue.empty()):
+            args = self.queue.get()
+            if args is None:
+                break
+            with self.semaphore:
+                start = time.monotonic()
+                self.busy_since = start
+                error = None
+                try:
+                    self.call(args)
+                except Exception as exc:
+                    # a failing plugin must not stop the recognition
+                    error = exc
+                self.busy_since = None
+                self.results.put((self, start, time.monotonic(), error))
+
+    def call(self, args):
+        if not inspect.iscoroutinefunction(self.plugin.run):
+            return self.plugin.run(*args)
+        # coroutine plugins run on the event loop of the asyncio runtime.
+        # Unlike a hung thread a coroutine is cancelled after the timeout,
+        # collect() counts the timeout.
+        timeout = self.timeout if self.timeout > 0 else None
+        coroutine = self.plugin.run(*args)
+        if self.loop is None:
+            try:
+                return asyncio.run(asyncio.wait_for(coroutine, timeout))
+            except asyncio.TimeoutError:
+                return None
+        self.future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            self.future.cancel()
+            return None
+        except concurrent.futures.CancelledError:
+            # cancelled by stop()
+            return None
+        finally:
+            self.future = None
+
+    def cancel(self):
+        future = self.future
+        if future is not None:
+            future.cancel()
+
+    def get_stats(self):
+        return {'calls': self.calls, 'skipped': self.skipped, 'dropped': self.dropped,
+                'timeouts': self.timeouts, 'errors': self.errors,
+                'avg': self.latency_sum / self.calls if self.calls > 0 else 0,
+                'max': self.latency_max}
+
+
+class PluginPool:
+    # Registered as the only plugin of the worker process and of every
+    # source of the asyncio runtime. Every plugin gets a bounded queue and
+    # its own thread, at most PLUGIN_CONCURRENCY plugins run at the same
+    # time. When a queue is full PLUGIN_POLICY either skips the new result
+    # or drops the oldest queued one. A plugin module can override the
+    # defaults with TIMEOUT, POLICY and QUEUE_SIZE attributes.
+    def __init__(self, cfg, plugins, loop=None):
+        self.cfg = cfg
+        self.logger = logging.getLogger(__name__)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
+        timeout = self.cfg.getfloatoption('misc', 'PLUGIN_TIMEOUT', fallback=0)
+        policy = self.cfg.getoption('misc', 'PLUGIN_POLICY', fallback=DROP)
+        queue_size = self.cfg.getintoption('misc', 'PLUGIN_QUEUE_SIZE', fallback=4)
+        semaphore = threading.BoundedSemaphore(
+            self.cfg.getintoption('misc', 'PLUGIN_CONCURRENCY', fallback=4))
+        self.results = queue.Queue()
+        self.runners = [PluginRunner(plugin, getattr(plugin, 'QUEUE_SIZE', queue_size),
+                                     getattr(plugin, 'TIMEOUT', timeout),
+                                     getattr(plugin, 'POLICY', policy), semaphore, self.results,
+                                     loop)
+                        for plugin in plugins]
+
+    def run(self, readable_results, data, rawbuf):
+        for runner in self.runners:
+            if runner.submit((readable_results, data, rawbuf)) is False:
+                self.logger.warning('plugin ' + runner.name_ + ' is busy, skipped result')
+        self.collect()
+
+    def collect(self):
+        while True:
+            try:
+                runner, start, end, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            latency = end - start
+            runner.calls += 1
+            runner.latency_sum += latency
+            runner.latency_max = max(runner.latency_max, latency)
+            if runner.timeout > 0 and latency > runner.timeout:
+                if runner.timed_out is False:
+                    runner.timeouts += 1
+                self.logger.warning('plugin ' + runner.name_ + ' took ' + str(latency) + 's')
+            runner.timed_out = False
+            if error is not None:
+                runner.errors += 1
+                self.logger.error('plugin ' + runner.name_ + ' failed', exc_info=error)
+            self.tracer.span('plugin ' + runner.name_, start, end)
+
+    def get_stats(self):
+        self.collect()
+        return {runner.name_: runner.get_stats() for runner in self.runners}
+
+    def stop(self, timeout=0):
+        # queued results are still handed to the plugins, but never wait
+        # longer than timeout for all of them. A hung plugin thread is a
+        # daemon and abandoned.
+        for runner in self.runners:
+            runner.stopping.set()
+            try:
+                runner.queue.put_nowait(None)
+            except queue.Full:
+                # the runner stops after the last queued result
+                pass
+        deadline = time.monotonic() + (timeout if timeout > 0 else STOP_TIMEOUT)
+        for runner in self.runners:
+            runner.join(max(0, deadline - time.monotonic()))
+            if runner.is_alive():
+                runner.cancel()
+                self.logger.warning('plugin ' + runner.name_ + ' did not stop, abandoned')
+        stats = self.get_stats()
+        for name in stats:
+            self.logger.info('plugin ' + name + ': ' + ' '.join(
+                key + '=' + str(stats[name][key]) for key in sorted(stats[name])))
+        return stats
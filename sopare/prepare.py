@@ -16,18 +16,20 @@ under the License.
 
 import numpy
 import sopare.filter
+import sopare.trace
 import sopare.visual
 import sopare.util
 
 
 class Preparing():
-    def __init__(self, cfg):
+    def __init__(self, cfg, queue=None):
         self.cfg = cfg
         self.visual = sopare.visual.Visual()
         self.util = sopare.util.Util(
             self.cfg.getbool('cmdlopt', 'debug'),
             self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
-        self.filter = sopare.filter.Filtering(self.cfg)
+        self.filter = sopare.filter.Filtering(self.cfg, queue)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
         self.silence = 0
         self.force = False
         self.counter = 0
@@ -35,7 +37,11 @@ class Preparing():
         self.new_token = False
         self.new_word = False
         self.token_counter = 0
-        self.buffer = []
+        self.chunks = self.cfg.getintoption('stream', 'CHUNKS')
+        # samples of the current token, the filter gets a view of the
+        # first buffer_length samples and the buffer is reused afterwards
+        self.buffer = numpy.empty(self.chunks, dtype=numpy.int16)
+        self.buffer_length = 0
         self.peaks = []
         self.token_peaks = []
         self.last_low_pos = 0
@@ -43,16 +49,19 @@ class Preparing():
         self.entered_silence = False
 
     def tokenize(self, meta):
+        start = self.tracer.start()
         if self.valid_token(meta):
-            if len(self.buffer) == 0:
-                self.buffer = [0] * 512
-            self.filter.filter(self.buffer, meta)
-            self.buffer = []
+            if self.buffer_length == 0:
+                self.filter.filter(numpy.zeros(512, dtype=numpy.int16), meta)
+            else:
+                self.filter.filter(self.buffer[0:self.buffer_length], meta)
+            self.buffer_length = 0
             self.peaks.extend(self.token_peaks)
             self.token_peaks = []
             if self.force:
                 self.reset()
                 self.filter_reset()
+        self.tracer.stop('tokenize', start)
 
     def valid_token(self, meta):
         for m in meta:
@@ -75,7 +84,7 @@ class Preparing():
         self.new_token = False
         self.new_word = False
         self.token_counter = 0
-        self.buffer = []
+        self.buffer_length = 0
         self.peaks = []
         self.token_peaks = []
         self.last_low_pos = 0
@@ -90,21 +99,31 @@ class Preparing():
         self.tokenize([{'token': 'start analysis', 'silence': self.silence, 'pos': self.counter,
                         'adapting': 0, 'volume': 0, 'peaks': self.peaks}])
 
-    def prepare(self, buf, volume):
-        data = numpy.fromstring(buf, dtype=numpy.int16)
-        if (self.cfg.getbool('cmdlopt', 'plot') is True and
-                self.cfg.getbool('cmdlopt', 'endless_loop') is False):
+    def append_buffer(self, data):
+        end = self.buffer_length + len(data)
+        if end > len(self.buffer):
+            # CHUNKS is not a multiple of CHUNK or the token was not sent yet
+            buffer = numpy.empty(max(end, len(self.buffer) * 2), dtype=numpy.int16)
+            buffer[0:self.buffer_length] = self.buffer[0:self.buffer_length]
+            self.buffer = buffer
+        self.buffer[self.buffer_length:end] = data
+        self.buffer_length = end
+
+    def prepare(self, data, volume, adaptive):
+        # data are the decoded samples of one chunk, volume and adaptive
+        # its RMS and sum of absolute values from sopare.features
+        start = self.tracer.start()
+        settings = self.cfg.getsettings()
+        if settings.plot is True and settings.endless_loop is False:
             self.visual.extend_plot_cache(data)
-        self.buffer.extend(data)
+        self.append_buffer(data)
         self.counter += 1
-        abs_data = abs(data)
-        adaptive = sum(abs_data)
         self.token_peaks.append(adaptive)
         meta = []
 
-        if volume < self.cfg.getintoption('stream', 'THRESHOLD'):
+        if volume < settings.threshold:
             self.silence += 1
-            if self.silence == self.cfg.getintoption('stream', 'LONG_SILENCE'):
+            if self.silence == settings.long_silence:
                 self.new_word = True
                 self.entered_silence = True
                 self.peaks.extend(self.token_peaks)
@@ -113,14 +132,14 @@ class Preparing():
                      'adapting': adaptive, 'volume': volume, 'token_peaks': self.token_peaks,
                      'peaks': self.peaks})
                 self.peaks = []
-            elif self.silence > self.cfg.getintoption('stream', 'LONG_SILENCE'):
+            elif self.silence > settings.long_silence:
                 meta.append({'token': 'noop', 'silence': self.silence, 'pos': self.counter,
                              'adapting': adaptive, 'volume': volume})
         else:
             self.entered_silence = False
             self.silence = 0
 
-        if len(self.buffer) == self.cfg.getintoption('stream', 'CHUNKS'):
+        if self.buffer_length == self.chunks:
             self.new_token = True
             meta.append({'token': 'token', 'silence': self.silence, 'pos': self.counter,
                          'adapting': adaptive, 'volume': volume, 'token_peaks': self.token_peaks})
@@ -131,3 +150,4 @@ class Preparing():
             self.tokenize(meta)
             if self.new_word is True:
                 self.new_word = False
+        self.tracer.stop('prepare', start)
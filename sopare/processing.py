@@ -15,16 +15,26 @@ under the License.
 """
 
 import logging
-import audioop
+import numpy
 from . import prepare
+import sopare.features
+import sopare.trace
 import time
 import io
 
+# number of quiet chunks replayed when a word starts
+PRE_ROLL = 3
+
 
 class Processor:
-    def __init__(self, cfg, buffering, live=True):
+    def __init__(self, cfg, buffering, live=True, queue=None, sample_clock=False):
         self.append = False
         self.cfg = cfg
+        # the sample clock derives the time from the number of consumed samples
+        # which makes file input independent from the read speed
+        self.sample_clock = sample_clock
+        self.samples = 0
+        self.sample_rate = self.cfg.getintoption('stream', 'SAMPLE_RATE')
         self.out = None
         if self.cfg.getoption('cmdlopt', 'outfile') is not None:
             self.out = io.open(self.cfg.getoption('cmdlopt', 'outfile'), 'wb')
@@ -32,11 +42,23 @@ class Processor:
         self.live = live
         self.timer = 0
         self.silence_timer = 0
-        self.silence_buffer = []
-        self.prepare = prepare.Preparing(self.cfg)
+        # ring of the last PRE_ROLL quiet chunks with their features
+        self.chunk = self.cfg.getintoption('stream', 'CHUNK')
+        self.silence_buffer = numpy.zeros((PRE_ROLL, self.chunk), dtype=numpy.int16)
+        self.silence_lengths = numpy.zeros(PRE_ROLL, dtype=numpy.intp)
+        self.silence_features = numpy.zeros((PRE_ROLL, 2), dtype=numpy.int64)
+        self.silence_count = 0
+        self.silence_pos = 0
+        self.prepare = prepare.Preparing(self.cfg, queue)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
 
+    def clock(self):
+        if self.sample_clock is True:
+            return self.samples / float(self.sample_rate)
+        return time.time()
+
     def stop(self, message):
         self.logger.info(message)
         if self.out is not None:
@@ -51,30 +73,66 @@ class Processor:
             self.buffering.stop()
 
     def check_silence(self, buf):
-        max_silence_after_start = self.cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START')
-        max_time = self.cfg.getfloatoption('stream', 'MAX_TIME')
-        volume = audioop.rms(buf, 2)
+        start = self.tracer.start()
+        samples = sopare.features.decode(buf)
+        volume, peaks = sopare.features.get_features(samples)
+        self.process(samples, int(volume), int(peaks))
+        self.tracer.stop('check_silence', start)
+
+    def check_block(self, buf):
+        # decodes and measures all chunks of buf in one pass, used to replay
+        # files and streams. Behaves like check_silence for every chunk.
+        start = self.tracer.start()
+        block, rest = sopare.features.split(sopare.features.decode(buf), self.chunk)
+        volumes, peaks = sopare.features.get_features(block)
+        for samples, volume, peak in zip(block, volumes.tolist(), peaks.tolist()):
+            self.process(samples, volume, peak)
+        if len(rest) > 0:
+            volume, peak = sopare.features.get_features(rest)
+            self.process(rest, int(volume), int(peak))
+        self.tracer.stop('check_block', start)
+
+    def put_silence(self, samples, volume, peaks):
+        if len(samples) > self.silence_buffer.shape[1]:
+            silence_buffer = numpy.zeros((PRE_ROLL, len(samples)), dtype=numpy.int16)
+            silence_buffer[:, 0:self.silence_buffer.shape[1]] = self.silence_buffer
+            self.silence_buffer = silence_buffer
+        self.silence_buffer[self.silence_pos, 0:len(samples)] = samples
+        self.silence_lengths[self.silence_pos] = len(samples)
+        self.silence_features[self.silence_pos] = (volume, peaks)
+        self.silence_pos = (self.silence_pos + 1) % PRE_ROLL
+        self.silence_count = min(self.silence_count + 1, PRE_ROLL)
+
+    def replay_silence(self):
+        for x in range(PRE_ROLL - self.silence_count, PRE_ROLL):
+            slot = (self.silence_pos + x) % PRE_ROLL
+            volume, peaks = self.silence_features[slot].tolist()
+            # prepare copies the samples, the slot can be reused afterwards
+            self.prepare.prepare(self.silence_buffer[slot, 0:self.silence_lengths[slot]],
+                                 volume, peaks)
+        self.silence_count = 0
+
+    def process(self, samples, volume, peaks):
+        settings = self.cfg.getsettings()
+        self.samples += len(samples)
+        now = self.clock()
 
-        if volume >= self.cfg.getintoption('stream', 'THRESHOLD'):
-            self.silence_timer = time.time()
+        if volume >= settings.threshold:
+            self.silence_timer = now
             if self.append is False:
                 self.logger.info('starting append mode')
-                self.timer = time.time()
-                for sbuf in self.silence_buffer:
-                    self.prepare.prepare(sbuf, audioop.rms(sbuf, 2))
-                self.silence_buffer = []
+                self.timer = now
+                self.replay_silence()
             self.append = True
         else:
-            self.silence_buffer.append(buf)
-            if len(self.silence_buffer) > 3:
-                del self.silence_buffer[0]
+            self.put_silence(samples, volume, peaks)
         if self.out is not None and self.out.closed is False:
-            self.out.write(buf)
+            self.out.write(samples.tobytes())
         if self.append is True:
-            self.prepare.prepare(buf, volume)
+            self.prepare.prepare(samples, volume, peaks)
         if (self.append is True and self.silence_timer > 0 and
-                self.silence_timer + max_silence_after_start < time.time() and
+                self.silence_timer + settings.max_silence_after_start < now and
                 self.live is True):
             self.stop('stop append mode because of silence')
-        if self.append is True and self.timer + max_time < time.time() and self.live is True:
+        if self.append is True and self.timer + settings.max_time < now and self.live is True:
             self.stop("stop append mode because time is up")
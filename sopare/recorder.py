@@ -17,23 +17,32 @@ under the License.
 import multiprocessing
 import logging
 import numpy
+import signal
 import time
 import sys
 import io
 import sopare.audiofactory
 import sopare.buffering
+import sopare.trace
 import sopare.visual
+try:
+    from sopare.ringbuffer import RingBuffer
+except ImportError:
+    # multiprocessing.shared_memory requires Python 3.8
+    RingBuffer = None
 
 
 class Recorder:
     def __init__(self, cfg):
         self.cfg = cfg
         self.audio_factory = sopare.audiofactory.AudioFactory(cfg)
-        self.queue = multiprocessing.JoinableQueue()
         self.running = True
         self.visual = sopare.visual.Visual()
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
+        self.ring_buffer = False
+        self.queue = self.create_queue()
         self.buffering = sopare.buffering.Buffering(self.cfg, self.queue)
 
         if self.cfg.getoption('cmdlopt', 'infile') is None:
@@ -41,6 +50,28 @@ class Recorder:
         else:
             self.read_from_file()
 
+    def create_queue(self):
+        slots = self.cfg.getintoption('stream', 'RING_BUFFER_SLOTS', fallback=0)
+        if slots <= 0 or RingBuffer is None:
+            return multiprocessing.JoinableQueue()
+        # do not block the audio input longer than one chunk, a file
+        # is fed again as long as the buffering process is alive
+        timeout = (self.cfg.getintoption('stream', 'CHUNK') /
+                   float(self.cfg.getintoption('stream', 'SAMPLE_RATE')))
+        self.logger.debug('using shared memory ring buffer with ' + str(slots) + ' slots')
+        self.ring_buffer = True
+        return RingBuffer(slots, self.cfg.getintoption('stream', 'CHUNK') * 2, timeout)
+
+    def put(self, buf, read_start, drop=True):
+        # the read span travels with the chunk to the buffering process
+        stamps = None
+        if read_start is not None:
+            stamps = (read_start, time.monotonic())
+        if self.ring_buffer is True:
+            return self.queue.put(buf, stamps, drop)
+        self.queue.put(buf if stamps is None else (buf, stamps))
+        return True
+
     def debug_info(self):
         self.logger.debug('SAMPLE_RATE: ' + str(self.cfg.getintoption('stream', 'SAMPLE_RATE')))
         self.logger.debug('CHUNK: ' + str(self.cfg.getintoption('stream', 'CHUNK')))
@@ -51,27 +82,36 @@ class Recorder:
         file = io.open(self.cfg.getoption('cmdlopt', 'infile'), 'rb',
                        buffering=self.cfg.getintoption('stream', 'CHUNK'))
         while True:
+            if not self.buffering.is_alive():
+                # the round is done before the end of the file
+                self.logger.debug('buffering finished, stop reading')
+                break
+            read_start = self.tracer.start()
             buf = file.read(self.cfg.getintoption('stream', 'CHUNK') * 2)
             if buf:
-                self.queue.put(buf)
+                while self.put(buf, read_start, False) is False:
+                    if not self.buffering.is_alive():
+                        break
                 if self.cfg.getbool('cmdlopt', 'plot') is True:
-                    data = numpy.fromstring(buf, dtype=numpy.int16)
+                    data = numpy.frombuffer(buf, dtype=numpy.int16)
                     self.visual.extend_plot_cache(data)
             else:
-                self.queue.close()
                 break
+        self.queue.close()
         file.close()
         once = False
 
         if self.cfg.getbool('cmdlopt', 'plot') is True:
             self.visual.create_sample(self.visual.get_plot_cache(), 'sample.png')
 
-        while self.queue.qsize() > 0:
+        while self.queue.qsize() > 0 and self.buffering.is_alive():
             if once is False:
                 self.logger.debug('waiting for queue to finish...')
                 once = True
             time.sleep(.1)  # wait for all threads to finish their work
-        self.queue.close()
+        if self.queue.qsize() > 0 and hasattr(self.queue, 'cancel_join_thread'):
+            # nobody reads the rest anymore, join_thread would wait forever
+            self.queue.cancel_join_thread()
         self.buffering.flush('end of file')
         self.logger.info("* done ")
         self.stop()
@@ -82,12 +122,18 @@ class Recorder:
         stream = self.audio_factory.open(self.cfg.getintoption('stream', 'SAMPLE_RATE'))
         self.debug_info()
         self.logger.info('start endless recording')
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP,
+                          lambda signum, frame: self.buffering.reload_dictionary())
 
         while self.running:
             try:
                 if self.buffering.is_alive():
+                    read_start = self.tracer.start()
                     buf = stream.read(chunk)
-                    self.queue.put(buf)
+                    if self.put(buf, read_start) is False:
+                        self.logger.warning('ring buffer overrun, dropped chunk (' +
+                                            str(self.queue.get_overruns()) + ' overall)')
                 else:
                     self.logger.info('Buffering not alive, stop recording')
                     self.queue.close()
@@ -107,5 +153,9 @@ class Recorder:
         # FIXME should except specific exceptions. The way it is it even handles SyntaxError
         except:  # noqa: E722
             pass
+        if self.ring_buffer is True:
+            self.logger.info('ring buffer backpressure: ' + str(self.queue.get_backpressure()) +
+                             ', overruns: ' + str(self.queue.get_overruns()))
+            self.queue.unlink()
         self.audio_factory.close()
         self.audio_factory.terminate()
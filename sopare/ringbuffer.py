@@ -0,0 +1,134 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import multiprocessing
+import numpy
+from multiprocessing import shared_memory
+
+# header fields, each one int64
+WRITE_COUNT = 0
+READ_COUNT = 1
+OVERRUNS = 2
+BACKPRESSURE = 3
+CLOSED = 4
+HEADER_FIELDS = 8
+
+
+class RingBuffer:
+    # Single producer, single consumer ring of fixed size slots in shared
+    # memory. put/get/qsize/close/join_thread behave like the queue methods
+    # used between the sopare processes, but the data is copied into shared
+    # memory instead of being pickled through a pipe.
+    def __init__(self, slots, slot_size, timeout=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.timeout = timeout
+        size = (HEADER_FIELDS + slots * 3) * 8 + slots * slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.owner = True
+        self.free = multiprocessing.Semaphore(slots)
+        self.items = multiprocessing.Semaphore(0)
+        self.stamps = None
+        self.map()
+        self.header[:] = 0
+
+    def map(self):
+        self.header = numpy.ndarray((HEADER_FIELDS, ), dtype=numpy.int64, buffer=self.shm.buf)
+        self.lengths = numpy.ndarray((self.slots, ), dtype=numpy.int64, buffer=self.shm.buf,
+                                     offset=HEADER_FIELDS * 8)
+        # optional monotonic timestamps handed over with every slot
+        self.slot_stamps = numpy.ndarray((self.slots, 2), dtype=numpy.float64,
+                                         buffer=self.shm.buf,
+                                         offset=(HEADER_FIELDS + self.slots) * 8)
+        self.data = numpy.ndarray((self.slots, self.slot_size), dtype=numpy.uint8,
+                                  buffer=self.shm.buf,
+                                  offset=(HEADER_FIELDS + self.slots * 3) * 8)
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'slots': self.slots, 'slot_size': self.slot_size,
+                'timeout': self.timeout, 'free': self.free, 'items': self.items}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_size = state['slot_size']
+        self.timeout = state['timeout']
+        self.free = state['free']
+        self.items = state['items']
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self.owner = False
+        self.stamps = None
+        self.map()
+
+    def put(self, buf, stamps=None, drop=True):
+        if len(buf) > self.slot_size:
+            raise ValueError('chunk of ' + str(len(buf)) + ' bytes exceeds slot size ' +
+                             str(self.slot_size))
+        if not self.free.acquire(False):
+            # the consumer is behind, wait for one slot before dropping data
+            self.header[BACKPRESSURE] += 1
+            if not self.free.acquire(True, self.timeout):
+                # without drop the caller tries again, nothing is lost
+                if drop:
+                    self.header[OVERRUNS] += 1
+                return False
+        slot = self.header[WRITE_COUNT] % self.slots
+        self.data[slot, 0:len(buf)] = numpy.frombuffer(buf, dtype=numpy.uint8)
+        self.lengths[slot] = len(buf)
+        self.slot_stamps[slot] = stamps if stamps is not None else (0, 0)
+        self.header[WRITE_COUNT] += 1
+        self.items.release()
+        return True
+
+    def get(self):
+        self.items.acquire()
+        if self.header[READ_COUNT] == self.header[WRITE_COUNT]:
+            # woken up by close()
+            return None
+        slot = self.header[READ_COUNT] % self.slots
+        buf = self.data[slot, 0:self.lengths[slot]].tobytes()
+        self.stamps = None
+        if self.slot_stamps[slot, 1] > 0:
+            self.stamps = tuple(self.slot_stamps[slot].tolist())
+        self.header[READ_COUNT] += 1
+        self.free.release()
+        return buf
+
+    def qsize(self):
+        return int(self.header[WRITE_COUNT] - self.header[READ_COUNT])
+
+    def get_overruns(self):
+        return int(self.header[OVERRUNS])
+
+    def get_backpressure(self):
+        return int(self.header[BACKPRESSURE])
+
+    def close(self):
+        if self.header[CLOSED] == 0:
+            self.header[CLOSED] = 1
+            self.items.release()
+
+    def join_thread(self):
+        pass
+
+    def unlink(self):
+        self.header = self.lengths = self.slot_stamps = self.data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                # already unlinked by a forked copy
+                pass
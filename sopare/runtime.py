@@ -0,0 +1,138 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import sopare.batch
+import sopare.pluginpool
+import sopare.processing
+import sopare.util
+import sopare.worker
+
+
+class FileSource:
+    # async iterator over the chunks of a raw file
+    def __init__(self, filename, chunk):
+        self.filename = filename
+        self.size = chunk * 2
+        self.file = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        if self.file is None:
+            self.file = await loop.run_in_executor(None, open, self.filename, 'rb')
+        buf = await loop.run_in_executor(None, self.file.read, self.size)
+        if not buf:
+            self.file.close()
+            raise StopAsyncIteration
+        return buf
+
+
+class MicrophoneSource:
+    # async iterator over the chunks of the default input device. The
+    # blocking PyAudio read runs on a dedicated thread.
+    def __init__(self, cfg):
+        # imported here, file and network sources work without PyAudio
+        import sopare.audiofactory
+        self.chunk = cfg.getintoption('stream', 'CHUNK')
+        self.audio_factory = sopare.audiofactory.AudioFactory(cfg)
+        self.stream = self.audio_factory.open(cfg.getintoption('stream', 'SAMPLE_RATE'))
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.running = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.running is False or self.stream is None:
+            raise StopAsyncIteration
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.stream.read, self.chunk)
+
+    def close(self):
+        self.running = False
+        self.executor.shutdown()
+        self.audio_factory.close()
+        self.audio_factory.terminate()
+
+
+class Runtime:
+    # asyncio front end: audio sources are async iterators, the silence
+    # detection, tokenizer, filter and analysis of each source run on their
+    # own pipeline thread and the plugins run in a PluginPool like in the
+    # worker process
+    def __init__(self, cfg, dict_matrix=None):
+        self.cfg = cfg.copy()
+        self.cfg.setoption('cmdlopt', 'endless_loop', 'True')
+        self.logger = self.cfg.getlogger().get_log()
+        self.logger = logging.getLogger(__name__)
+        if dict_matrix is None:
+            util = sopare.util.Util(self.cfg.getbool('cmdlopt', 'debug'),
+                                    self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+            dict_matrix = util.get_dict_matrix()
+        self.dict_matrix = dict_matrix
+        self.plugin_timeout = self.cfg.getfloatoption('misc', 'PLUGIN_TIMEOUT', fallback=0)
+
+    async def recognize(self, source, plugins=None, reload=None):
+        loop = asyncio.get_running_loop()
+        queue = sopare.batch.DirectQueue()
+        processor = sopare.processing.Processor(self.cfg, None, True, queue,
+                                                not isinstance(source, MicrophoneSource))
+        worker = sopare.worker.Worker(self.cfg, queue, self.dict_matrix, False)
+        queue.consumer = worker.process
+        if plugins is None:
+            plugins = worker.analyze.plugins
+        pool = sopare.pluginpool.PluginPool(self.cfg, plugins, loop)
+        worker.analyze.plugins = [pool]
+        worker.analyze.stm.clock = processor.clock
+        # a file is over before a changed dictionary matters
+        if reload is True or (reload is None and isinstance(source, MicrophoneSource)):
+            worker.start_reloader()
+        # one thread per source keeps the pipeline state in order
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        try:
+            async for buf in source:
+                await loop.run_in_executor(executor, processor.check_silence, buf)
+            if worker.counter > 0:
+                await loop.run_in_executor(executor, processor.prepare.force_tokenizer)
+        finally:
+            executor.shutdown()
+            worker.stop_reloader()
+            # coroutine plugins need the loop while the pool waits for them
+            await loop.run_in_executor(None, pool.stop, self.plugin_timeout)
+
+    async def run(self, sources, plugins=None):
+        await asyncio.gather(*[self.recognize(source, plugins) for source in sources])
+
+
+def run(cfg):
+    runtime = Runtime(cfg)
+    infile = cfg.getoption('cmdlopt', 'infile')
+    if infile is not None:
+        source = FileSource(infile, cfg.getintoption('stream', 'CHUNK'))
+    else:
+        source = MicrophoneSource(cfg)
+    try:
+        asyncio.run(runtime.run([source]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(source, MicrophoneSource):
+            source.close()
@@ -0,0 +1,98 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import numpy
+
+
+class IncrementalSearch:
+    # Keeps the deep search sums (similarity, left and right distance and the
+    # number of compared tokens) for every (dictionary entry, start position)
+    # hypothesis of the current word and extends them whenever a token
+    # arrives, so the analysis at the end of a word only has to read them.
+    def __init__(self, dict_matrix, weights):
+        self.dict_matrix = dict_matrix
+        self.weights = weights
+        self.tokens = 0
+        self.scored = 0
+        self.pruned = 0
+        self.capacity = 0
+        self.create_structure(0)
+
+    def reset(self):
+        self.tokens = 0
+        self.scored = 0
+        self.pruned = 0
+
+    def create_structure(self, capacity):
+        entries = len(self.dict_matrix.ids)
+        sims = numpy.zeros((entries, capacity))
+        sls = numpy.zeros((entries, capacity))
+        srs = numpy.zeros((entries, capacity))
+        counts = numpy.zeros((entries, capacity), dtype=numpy.intp)
+        alive = numpy.zeros((entries, capacity), dtype=bool)
+        if self.capacity > 0:
+            sims[:, 0:self.capacity] = self.sims
+            sls[:, 0:self.capacity] = self.sls
+            srs[:, 0:self.capacity] = self.srs
+            counts[:, 0:self.capacity] = self.counts
+            alive[:, 0:self.capacity] = self.alive
+        self.sims, self.sls, self.srs, self.counts, self.alive = sims, sls, srs, counts, alive
+        self.capacity = capacity
+
+    def add(self, characteristic, alive=None):
+        # alive flags the entries that may start at this token at all, start
+        # positions that can never pass the framing are not extended any more
+        t = self.tokens
+        self.tokens += 1
+        if self.tokens > self.capacity:
+            self.create_structure(max(self.tokens, self.capacity * 2))
+        self.sims[:, t] = 0
+        self.sls[:, t] = 0
+        self.srs[:, t] = 0
+        self.counts[:, t] = 0
+        self.alive[:, t] = True if alive is None else alive
+
+        # dictionary token x of a hypothesis that started at t - x meets this token
+        tokens = numpy.arange(0, min(self.tokens, self.dict_matrix.norm.shape[1]))
+        starts = t - tokens
+        reached = tokens[None, :] < self.dict_matrix.lengths[:, None]
+        valid = reached & self.alive[:, starts]
+        self.pruned += int(numpy.count_nonzero(reached & ~valid))
+        entries, positions = numpy.nonzero(valid)
+        if len(entries) == 0:
+            return
+        self.scored += len(entries)
+        utterance = self.dict_matrix.utterance([(characteristic, None)])
+        sim, sl, sr = self.dict_matrix.score(entries, positions, utterance,
+                                             numpy.zeros(len(entries), dtype=numpy.intp),
+                                             self.weights)
+        startpos = starts[positions]
+        self.sims[entries, startpos] += sim
+        self.sls[entries, startpos] += sl
+        self.srs[entries, startpos] += sr
+        self.counts[entries, startpos] += 1
+
+    def inspect(self, entries, startpos, data_length):
+        # same result as DictionaryMatrix.inspect or None if the sums do not
+        # cover exactly data_length tokens (e.g. after trailing silence removal)
+        if data_length != self.tokens:
+            return None
+        entries = numpy.asarray(entries, dtype=numpy.intp)
+        startpos = numpy.asarray(startpos, dtype=numpy.intp)
+        if len(entries) > 0 and not self.alive[entries, startpos].all():
+            return None
+        return (self.sims[entries, startpos], self.sls[entries, startpos],
+                self.srs[entries, startpos], self.counts[entries, startpos])
@@ -0,0 +1,288 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import sopare.processing
+import sopare.util
+import sopare.worker
+
+
+def parse_address(address):
+    # host:port for TCP, everything else is a Unix socket path
+    host, _, port = address.rpartition(':')
+    if host != '' and port.isdigit() and '/' not in address:
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class StreamQueue:
+    # used as queue of the per stream Filtering, tags every object with the
+    # stream id and the stream clock and hands it to the analysis process
+    # that owns the stream
+    def __init__(self, stream_id, queue, clock):
+        self.stream_id = stream_id
+        self.queue = queue
+        self.clock = clock
+
+    def put(self, obj):
+        obj['clock'] = self.clock()
+        self.queue.put((self.stream_id, obj))
+
+    def close(self):
+        pass
+
+    def join_thread(self):
+        pass
+
+
+class ResultForwarder:
+    # registered as the only plugin of every stream worker
+    def __init__(self, stream_id, results):
+        self.stream_id = stream_id
+        self.results = results
+
+    def run(self, readable_results, data, rawbuf):
+        # like the batch, analyses without any word are left out
+        if len(readable_results) > 0:
+            self.results.put((self.stream_id, readable_results))
+
+
+class AnalysisProcess(multiprocessing.Process):
+    # one of the shared analysis processes. It keeps the worker state
+    # (tokens, compare structure, short term memory) of all streams assigned
+    # to it, the dictionary is compiled once by the server.
+    def __init__(self, cfg, queue, results, dict_matrix):
+        super().__init__(name='stream analysis')
+        self.cfg = cfg
+        self.dict_matrix = dict_matrix
+        self.queue = queue
+        self.results = results
+        self.workers = {}
+        self.clocks = {}
+        self.start()
+
+    def run(self):
+        dict_matrix = self.dict_matrix
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+            stream_id, obj = message
+            if obj['action'] == 'close':
+                self.workers.pop(stream_id, None)
+                self.clocks.pop(stream_id, None)
+                self.results.put((stream_id, None))
+                continue
+            if stream_id not in self.workers:
+                self.workers[stream_id] = self.create_worker(stream_id, dict_matrix)
+            self.clocks[stream_id] = obj.get('clock', 0)
+            self.workers[stream_id].process(obj)
+
+    def create_worker(self, stream_id, dict_matrix):
+        worker = sopare.worker.Worker(self.cfg, None, dict_matrix, False,
+                                      plugins=[ResultForwarder(stream_id, self.results)])
+        # the short term memory follows the audio time of the stream
+        worker.analyze.stm.clock = lambda: self.clocks[stream_id]
+        return worker
+
+
+class Stream:
+    def __init__(self, cfg, stream_id, queue, callback):
+        self.cfg = cfg
+        self.stream_id = stream_id
+        self.queue = queue
+        self.callback = callback
+        self.closed = threading.Event()
+        self.chunk = self.cfg.getintoption('stream', 'CHUNK') * 2
+        self.pending = b''
+        # the sample clock keeps the silence detection independent from
+        # network jitter
+        stream_queue = StreamQueue(stream_id, queue, None)
+        self.processor = sopare.processing.Processor(self.cfg, None, True, stream_queue, True)
+        stream_queue.clock = self.processor.clock
+
+    def feed(self, buf):
+        buf = self.pending + buf
+        end = len(buf) - len(buf) % self.chunk
+        self.processor.check_block(buf[0:end])
+        self.pending = buf[end:]
+
+    def close(self):
+        if self.processor.append is True:
+            self.processor.stop('end of stream ' + str(self.stream_id))
+        self.queue.put((self.stream_id, {'action': 'close'}))
+
+
+class StreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        lock = threading.Lock()
+
+        def send(stream_id, results):
+            with lock:
+                self.wfile.write((json.dumps({'stream': stream_id, 'results': results}) +
+                                  '\n').encode('utf-8'))
+
+        stream = self.server.recognizer.open_stream(send)
+        try:
+            while True:
+                buf = self.request.recv(stream.chunk * 4)
+                if not buf:
+                    break
+                stream.feed(buf)
+        finally:
+            stream.close()
+        stream.closed.wait()
+
+
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    ThreadingUnixServer = None
+
+
+class Server:
+    # Many concurrent PCM streams (16 bit mono with SAMPLE_RATE) in one
+    # process. Every stream keeps its own Processor/Preparing/Filtering
+    # state, all streams share the dictionary and the analysis processes.
+    def __init__(self, cfg, workers=0, dict_matrix=None):
+        self.cfg = cfg.copy()
+        self.cfg.setoption('cmdlopt', 'endless_loop', 'True')
+        # results are forwarded without the filtered wave
+        self.cfg.setoption('misc', 'PLUGIN_RAWBUF', 'False')
+        self.logger = self.cfg.getlogger().get_log()
+        self.logger = logging.getLogger(__name__)
+        self.results = multiprocessing.Queue()
+        self.queues = []
+        self.processes = []
+        if dict_matrix is None:
+            # compiled once, the forked analysis processes share the pages
+            util = sopare.util.Util(self.cfg.getbool('cmdlopt', 'debug'),
+                                    self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+            dict_matrix = util.get_dict_matrix()
+        for x in range(0, workers if workers > 0 else multiprocessing.cpu_count()):
+            queue = multiprocessing.Queue()
+            self.queues.append(queue)
+            self.processes.append(AnalysisProcess(self.cfg, queue, self.results, dict_matrix))
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.server = None
+        self.stopped = False
+        self.dispatcher = threading.Thread(target=self.dispatch, name='result dispatcher')
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def open_stream(self, callback):
+        with self.lock:
+            stream_id = next(self.ids)
+            stream = Stream(self.cfg, stream_id, self.queues[stream_id % len(self.queues)],
+                            callback)
+            self.streams[stream_id] = stream
+        self.logger.info('opened stream ' + str(stream_id))
+        return stream
+
+    def dispatch(self):
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            stream_id, results = message
+            with self.lock:
+                stream = self.streams.get(stream_id)
+                if results is None:
+                    self.streams.pop(stream_id, None)
+            if stream is None:
+                continue
+            if results is None:
+                self.logger.info('closed stream ' + str(stream_id))
+                stream.closed.set()
+                continue
+            try:
+                stream.callback(stream_id, results)
+            except (IOError, ValueError) as exc:
+                self.logger.warning('result callback of stream ' + str(stream_id) + ' failed',
+                                    exc_info=exc)
+
+    def listen(self, address):
+        family, address = parse_address(address)
+        if family == socket.AF_INET:
+            self.server = ThreadingTCPServer(address, StreamHandler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = ThreadingUnixServer(address, StreamHandler)
+        self.server.recognizer = self
+        return self.server.server_address
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.stopped is True:
+            return
+        self.stopped = True
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(self.server.server_address, str) and \
+                    os.path.exists(self.server.server_address):
+                os.remove(self.server.server_address)
+            self.server = None
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join()
+        self.results.put(None)
+        self.dispatcher.join()
+
+
+class Client:
+    # sends raw PCM to a server and returns the results of the stream
+    def __init__(self, address):
+        family, self.address = parse_address(address)
+        self.family = family
+
+    def recognize(self, buf, chunk=4096):
+        results = []
+        with socket.socket(self.family, socket.SOCK_STREAM) as sock:
+            sock.connect(self.address)
+            for x in range(0, len(buf), chunk):
+                sock.sendall(buf[x:x + chunk])
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile('r', encoding='utf-8') as lines:
+                for line in lines:
+                    results.append(json.loads(line)['results'])
+        return results
+
+    def recognize_file(self, filename):
+        with open(filename, 'rb') as raw_file:
+            return self.recognize(raw_file.read())
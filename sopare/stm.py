@@ -25,6 +25,12 @@ class ShortTermMemory:
         self.last_debug_info = ''
         self.last_results = []
         self.last_time = 0
+        self.clock = time.time
+
+    def reset(self):
+        self.last_debug_info = ''
+        self.last_results = []
+        self.last_time = 0
 
     def get_stm_results(self, results):
         stm_results = self.last_results[:]
@@ -37,12 +43,12 @@ class ShortTermMemory:
     def get_results(self, results, debug_info):
         if results is None or len(results) == 0:
             return results, debug_info
-        if time.time() < self.last_time:
+        if self.clock() < self.last_time:
             logging.debug('stm input: ' + str(results) + ' ' + str(self.last_results))
             results = self.get_stm_results(results)
             debug_info = self.get_stm_debug_info(debug_info)
             logging.debug('stm mnodification: ' + str(results))
         self.last_results = results
         self.last_debug_info = debug_info
-        self.last_time = time.time() + self.cfg.getfloatoption('compare', 'STM_RETENTION')
+        self.last_time = self.clock() + self.cfg.getsettings().stm_retention
         return results, debug_info
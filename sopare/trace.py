@@ -0,0 +1,142 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import logging
+import math
+import time
+
+# log scaled histogram buckets starting at one microsecond, every bucket is
+# 5 percent wider than the previous one
+MIN_VALUE = 0.000001
+GROWTH = 1.05
+PERCENTILES = (50, 95, 99)
+# max. number of spans waiting for the next stage, e.g. during a long
+# silence nothing takes the spans of the recorder and the silence detection
+MAX_PENDING = 4096
+
+tracers = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        index = 0
+        if value > MIN_VALUE:
+            index = int(math.log(value / MIN_VALUE) / math.log(GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile):
+        rank = self.count * percentile / 100.0
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(MIN_VALUE * GROWTH ** (index + 1), self.max)
+        return self.max
+
+    def get_summary(self):
+        summary = {'count': self.count, 'avg': self.total / self.count if self.count else 0,
+                   'max': self.max}
+        for percentile in PERCENTILES:
+            summary['p' + str(percentile)] = self.percentile(percentile)
+        return summary
+
+
+class Tracer:
+    # Spans are (stage, start, end) tuples with monotonic timestamps. They are
+    # collected per process and attached to the objects passed to the next
+    # stage until the worker process aggregates them into histograms.
+    def __init__(self, enabled=False, filename=None):
+        self.enabled = enabled
+        self.filename = filename
+        self.spans = []
+        self.histograms = {}
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        if self.enabled is False:
+            return None
+        return time.monotonic()
+
+    def stop(self, stage, start):
+        if start is not None:
+            self.append((stage, start, time.monotonic()))
+
+    def span(self, stage, start, end):
+        if self.enabled is True and start is not None and end is not None:
+            self.append((stage, start, end))
+
+    def append(self, span):
+        self.spans.append(span)
+        if len(self.spans) > MAX_PENDING:
+            # keep them in the histograms of this process instead
+            self.record()
+
+    def take(self):
+        spans = self.spans
+        self.spans = []
+        return spans
+
+    def add(self, spans):
+        if spans:
+            self.spans.extend(spans)
+            if len(self.spans) > MAX_PENDING:
+                self.record()
+
+    def record(self):
+        for stage, start, end in self.take():
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram()
+            self.histograms[stage].add(end - start)
+
+    def get_summary(self):
+        return {stage: self.histograms[stage].get_summary() for stage in sorted(self.histograms)}
+
+    def dump(self):
+        if self.enabled is False:
+            return
+        self.record()
+        summary = self.get_summary()
+        for stage in summary:
+            self.logger.info(stage + ': ' + ' '.join(
+                key + '=' + str(round(summary[stage][key] * 1000, 3) if key != 'count'
+                                else summary[stage][key])
+                for key in ('count', 'avg', 'p50', 'p95', 'p99', 'max')) + ' (ms)')
+        if self.filename:
+            with open(self.filename, 'w') as trace_file:
+                json.dump(summary, trace_file, indent=2, sort_keys=True)
+
+
+def get_tracer(cfg=None):
+    # one tracer per process and TRACE/TRACE_FILE settings, forked processes
+    # continue with a copy
+    enabled = False
+    filename = None
+    if cfg is not None:
+        enabled = cfg.getbool('misc', 'TRACE', fallback=False)
+        filename = cfg.getoption('misc', 'TRACE_FILE', fallback='') or None
+    if (enabled, filename) not in tracers:
+        tracers[(enabled, filename)] = Tracer(enabled, filename)
+    return tracers[(enabled, filename)]
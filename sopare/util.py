@@ -15,8 +15,11 @@ under the License.
 """
 
 
+import collections
 import datetime
+import hashlib
 import json
+import multiprocessing
 import os
 import uuid
 import wave
@@ -25,94 +28,46 @@ import numpy
 from scipy.io.wavfile import write
 
 import sopare.characteristics
+import sopare.dictanalysis
+import sopare.dictmatrix
+import sopare.dictstore
 import sopare.numpyjsonencoder
 from sopare.path import __wavedestination__
+from sopare.version import __version__
+
+DICT_LOG = os.path.join('dict', 'dict.log')
+DICT_JSON = os.path.join('dict', 'dict.json')
+DICT_MATRIX = os.path.join('dict', 'dict.bin')
+# max. number of prepared vectors kept by Util.similarity
+SIMILARITY_CACHE_SIZE = 4096
 
 
 class Util:
-    def __init__(self, debug, peak_factor):
+    def __init__(self, debug, peak_factor, cache_size=SIMILARITY_CACHE_SIZE):
         self.debug = debug
         self.characteristic = sopare.characteristics.Characteristic(peak_factor)
-        self.cache = {}
+        self.cache = collections.OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def show_dict_entries_by_id(self):
-        json_data = self.get_dict()
-        for dict_entries in json_data['dict']:
-            print((dict_entries['id'] + ' ' + dict_entries['uuid']))
+        dict_matrix = self.get_dict_matrix()
+        for _id, _uuid in zip(dict_matrix.ids, dict_matrix.uuids):
+            print((_id + ' ' + _uuid))
 
     def show_dict_entry(self, sid):
-        json_data = self.get_dict()
-        ids = []
-        for dict_entries in json_data['dict']:
-            if (dict_entries['id'] == sid or sid == '*') and dict_entries['id'] not in ids:
-                print((dict_entries['id'] + ' - ' + dict_entries['uuid']))
-                for i, entry in enumerate(dict_entries['characteristic']):
-                    output = str(entry['norm'])
-                    print((str(i) + ', ' + str(entry['fc']) + ', ' + output[1:len(output) - 1]))
+        # only the records of sid are read from the dictionary log
+        store = sopare.dictstore.DictionaryStore(DICT_LOG, readonly=True)
+        for dict_entries in store.get_entries(sid):
+            print((dict_entries['id'] + ' - ' + dict_entries['uuid']))
+            for i, entry in enumerate(dict_entries['characteristic']):
+                output = str(entry['norm'])
+                print((str(i) + ', ' + str(entry['fc']) + ', ' + output[1:len(output) - 1]))
 
     @staticmethod
     def compile_analysis(json_data):
-        analysis = {}
-        for dict_entries in json_data['dict']:
-            if dict_entries['id'] not in analysis:
-                analysis[dict_entries['id']] = {
-                    'min_tokens': 0, 'max_tokens': 0, 'peaks': [],
-                    'df': [], 'minp': [], 'maxp': [], 'cp': [],
-                    'mincp': [], 'maxcp': []}
-            length = len(dict_entries['characteristic'])
-
-            if length < 2:
-                print('the following characteristic is < 2!')
-                print((dict_entries['id'] + ', ' + dict_entries['uuid']))
-
-            if length > analysis[dict_entries['id']]['max_tokens']:
-                analysis[dict_entries['id']]['max_tokens'] = length
-
-            if (length < analysis[dict_entries['id']]['min_tokens'] or
-                    analysis[dict_entries['id']]['min_tokens'] == 0):
-                analysis[dict_entries['id']]['min_tokens'] = length
-
-            for i, entry in enumerate(dict_entries['characteristic']):
-                if i == len(analysis[dict_entries['id']]['cp']):
-                    analysis[dict_entries['id']]['cp'].append([len(entry['peaks'])])
-                else:
-                    peak_length = len(entry['peaks'])
-                    if peak_length not in analysis[dict_entries['id']]['cp'][i]:
-                        analysis[dict_entries['id']]['cp'][i].append(peak_length)
-
-                if i == len(analysis[dict_entries['id']]['peaks']):
-                    analysis[dict_entries['id']]['peaks'].append(entry['peaks'])
-                else:
-                    for miss in entry['peaks']:
-                        if miss not in analysis[dict_entries['id']]['peaks'][i]:
-                            analysis[dict_entries['id']]['peaks'][i].append(miss)
-                    op = sorted(analysis[dict_entries['id']]['peaks'][i])
-                    analysis[dict_entries['id']]['peaks'][i] = op
-
-                if i == len(analysis[dict_entries['id']]['df']):
-                    analysis[dict_entries['id']]['df'].append([])
-
-                if entry['df'] not in analysis[dict_entries['id']]['df'][i]:
-                    analysis[dict_entries['id']]['df'][i].append(entry['df'])
-                    op = sorted(analysis[dict_entries['id']]['df'][i])
-                    analysis[dict_entries['id']]['df'][i] = op
-
-        for id in analysis:
-            for p in analysis[id]['peaks']:
-                if len(p) > 0:
-                    analysis[id]['minp'].append(min(p))
-                else:
-                    analysis[id]['minp'].append(0)
-
-                if len(p) > 0:
-                    analysis[id]['maxp'].append(max(p))
-                else:
-                    analysis[id]['maxp'].append(0)
-
-            for cp in analysis[id]['cp']:
-                analysis[id]['mincp'].append(min(cp))
-                analysis[id]['maxcp'].append(max(cp))
-        return analysis
+        return sopare.dictanalysis.DictionaryAnalysis(json_data).get_analysis()
 
     @staticmethod
     def store_raw_dict_entry(dict_id, raw_characteristics):
@@ -143,55 +98,182 @@ class Util:
         return tokens
 
     def add2dict(self, obj, word_tendency, id):
-        json_obj = self.get_dict()
-        json_obj['dict'].append({
+        dict_entries = self.get_store().add({
             'id': id,
             'characteristic': obj,
             'word_tendency': word_tendency,
             'uuid': str(uuid.uuid4())})
-        self.write_dict(json_obj)
-        return json_obj
+        return dict_entries
+
+    def write_dict(self, json_data):
+        store = sopare.dictstore.DictionaryStore(DICT_LOG)
+        store.rewrite(json_data['dict'])
+        store.export(DICT_JSON)
+        self.write_dict_matrix(json_data)
+
+    def export_dict(self, filename=DICT_JSON):
+        self.get_store().export(filename)
 
     @staticmethod
-    def write_dict(json_data):
-        with open(os.path.join('dict', 'dict.json'), 'w') as json_file:
-            json.dump(json_data, json_file, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+    def get_store(filename=DICT_LOG, json_filename=DICT_JSON):
+        return sopare.dictstore.DictionaryStore.load(filename, json_filename)
+
+    def update_dict_matrix(self, filename=DICT_MATRIX):
+        store = self.get_store()
+        sources = self.get_dict_signature()
+        return self.write_dict_matrix(store.get_dict(), filename, sources)
+
+    def write_dict_matrix(self, json_data, filename=DICT_MATRIX, sources=None):
+        # json_data has to be the current content of the dictionary files
+        dict_matrix = sopare.dictmatrix.DictionaryMatrix(json_data,
+                                                         self.compile_analysis(json_data))
+        dict_matrix.sources = sources if sources is not None else self.get_dict_signature()
+        dict_matrix.save(filename)
+        return dict_matrix
 
     @staticmethod
-    def get_dict(filename="dict/dict.json"):
-        with open(filename) as json_file:
-            return json.load(json_file, object_hook=sopare.numpyjsonencoder.numpy_json_hook)
+    def get_dict_signature(store_filename=DICT_LOG, json_filename=DICT_JSON):
+        # inode, size and mtime in ns of every file. The mtime alone misses
+        # writes in the same tick of a coarse timestamp.
+        signature = []
+        for filename in (store_filename, json_filename):
+            try:
+                stat = os.stat(filename)
+                signature.append([stat.st_ino, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                signature.append(None)
+        return signature
+
+    @staticmethod
+    def get_dict(filename=None):
+        if filename is None:
+            return sopare.dictstore.DictionaryStore.read(DICT_LOG, DICT_JSON)
+        return sopare.dictstore.read_json(filename)
+
+    def get_dict_matrix(self, filename=DICT_MATRIX, store_filename=DICT_LOG,
+                        json_filename=DICT_JSON):
+        # the matrix holds the prepared dictionary vectors and their norms,
+        # vectors cached for the previous dictionary are of no use anymore.
+        # Nothing is written here. Every write of the dictionary changes the
+        # signature, a stale dict.bin is compiled in memory until -c writes
+        # it again.
+        self.clear_cache()
+        if os.path.exists(filename):
+            try:
+                dict_matrix = sopare.dictmatrix.DictionaryMatrix.load(filename)
+                if dict_matrix.sources == self.get_dict_signature(store_filename, json_filename):
+                    return dict_matrix
+            except ValueError as exc:
+                print(('ignoring compiled dictionary: ' + str(exc)))
+        json_data = sopare.dictstore.DictionaryStore.read(store_filename, json_filename)
+        return sopare.dictmatrix.DictionaryMatrix(json_data, self.compile_analysis(json_data))
+
+    def get_compiled_dict(self, workers=1, manifest=None):
+        # manifest maps raw file names to mtime and content hash of the last
+        # build. Unchanged files reuse their entry from the current dict.json.
+        filenames = sorted(filename for filename in os.listdir('dict')
+                           if filename.endswith('.raw'))
+        previous = {}
+        files = {}
+        if manifest is not None:
+            if (manifest.get('peak_factor') == self.characteristic.peak_factor and
+                    manifest.get('version') == __version__ and
+                    (os.path.exists(DICT_LOG) or os.path.exists(DICT_JSON))):
+                previous = {dict_entries['uuid']: dict_entries
+                            for dict_entries in self.get_dict()['dict']}
+                files = manifest.get('files', {})
+            manifest.clear()
+            manifest.update({'peak_factor': self.characteristic.peak_factor,
+                             'version': __version__, 'files': {}})
+
+        todo = []
+        for filename in filenames:
+            path = os.path.join('dict', filename)
+            mtime = os.path.getmtime(path)
+            known = files.get(filename)
+            reusable = known is not None and filename.split('.')[0] in previous
+            if reusable and known['mtime'] == mtime:
+                file_info = known
+            else:
+                file_info = {'mtime': mtime, 'sha1': self.get_file_hash(path)}
+                if not reusable or known['sha1'] != file_info['sha1']:
+                    todo.append(filename)
+            if manifest is not None:
+                manifest['files'][filename] = file_info
+
+        if len(todo) > 0:
+            print(('compiling ' + str(len(todo)) + ' of ' + str(len(filenames)) +
+                   ' raw files'))
+        args = [(os.path.join('dict', filename), self.characteristic.peak_factor)
+                for filename in todo]
+        if workers != 1 and len(todo) > 1:
+            with multiprocessing.Pool(workers if workers > 0 else None) as pool:
+                compiled = dict(zip(todo, pool.map(self.compile_raw_file, args)))
+        else:
+            compiled = dict(zip(todo, map(self.compile_raw_file, args)))
 
-    def get_compiled_dict(self):
         compiled_dict = {'dict': []}
-        for filename in os.listdir('dict'):
-            if filename.endswith('.raw'):
-                fu = filename.split('.')
-                file_uuid = fu[0]
-                tokens = []
-                with open(os.path.join('dict', filename)) as raw_json_file:
-                    json_obj = json.load(raw_json_file,
-                                         object_hook=sopare.numpyjsonencoder.numpy_json_hook)
-                    for raw_obj in json_obj['characteristic']:
-                        meta = raw_obj['meta']
-                        fft = raw_obj['fft']
-                        norm = raw_obj['norm']
-                        characteristic = self.characteristic.get_characteristic(fft, norm, meta)
-                        if characteristic is not None:
-                            for m in meta:
-                                if m['token'] != 'stop':
-                                    tokens.append(characteristic)
-                    if len(tokens) > 0:
-                        self.add_weighting(tokens)
-                        compiled_dict['dict'].append({
-                            'id': json_obj['id'],
-                            'characteristic': tokens,
-                            'uuid': file_uuid})
-                    else:
-                        print((json_obj['id'] + ' ' + file_uuid + ' got no tokens!'))
-                raw_json_file.close()
+        for filename in filenames:
+            file_uuid = filename.split('.')[0]
+            if filename not in compiled:
+                compiled_dict['dict'].append(previous[file_uuid])
+                continue
+            id, tokens = compiled[filename]
+            if len(tokens) > 0:
+                compiled_dict['dict'].append({
+                    'id': id,
+                    'characteristic': tokens,
+                    'uuid': file_uuid})
+            else:
+                print((id + ' ' + file_uuid + ' got no tokens!'))
         return compiled_dict
 
+    @staticmethod
+    def compile_raw_file(args):
+        path, peak_factor = args
+        with open(path) as raw_json_file:
+            json_obj = json.load(raw_json_file,
+                                 object_hook=sopare.numpyjsonencoder.numpy_json_hook)
+        return json_obj['id'], Util.compile_raw_characteristics(json_obj['characteristic'],
+                                                                peak_factor)
+
+    @staticmethod
+    def compile_raw_characteristics(raw_characteristics, peak_factor):
+        characteristic_factory = sopare.characteristics.Characteristic(peak_factor)
+        tokens = []
+        for raw_obj in raw_characteristics:
+            meta = raw_obj['meta']
+            fft = raw_obj['fft']
+            norm = raw_obj['norm']
+            characteristic = characteristic_factory.get_characteristic(fft, norm, meta)
+            if characteristic is not None:
+                for m in meta:
+                    if m['token'] != 'stop':
+                        tokens.append(characteristic)
+        if len(tokens) > 0:
+            Util.add_weighting(tokens)
+        return tokens
+
+    @staticmethod
+    def get_file_hash(path):
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as raw_file:
+            for block in iter(lambda: raw_file.read(65536), b''):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def get_manifest(filename='dict/manifest.json'):
+        if not os.path.exists(filename):
+            return {}
+        with open(filename) as json_file:
+            return json.load(json_file)
+
+    @staticmethod
+    def write_manifest(manifest, filename='dict/manifest.json'):
+        with open(filename, 'w') as json_file:
+            json.dump(manifest, json_file)
+
     @staticmethod
     def add_weighting(tokens):
         high = 0
@@ -203,17 +285,16 @@ class Util:
             token['weighting'] = sum(token['token_peaks']) / 1000.0 / high
 
     def delete_from_dict(self, id):
-        json_obj = self.get_dict()
-        new_dict = {'dict': []}
-        if id != '*':
-            dict_objects = json_obj['dict']
-            for do in dict_objects:
-                if do['id'] != id:
-                    new_dict['dict'].append(do)
-        self.write_dict(new_dict)
-
-    def recreate_dict_from_raw_files(self):
-        self.write_dict(self.get_compiled_dict())
+        store = self.get_store()
+        if id == '*':
+            store.rewrite([])
+        else:
+            store.delete(id)
+
+    def recreate_dict_from_raw_files(self, workers=1, incremental=False):
+        manifest = self.get_manifest() if incremental else {}
+        self.write_dict(self.get_compiled_dict(workers, manifest))
+        self.write_manifest(manifest)
 
     @staticmethod
     def save_raw_wave(filename, start, end, raw):
@@ -236,27 +317,41 @@ class Util:
         mdr = sum(abs(e - s) for s, e in zip(arr1[ll:], arr2[ll:]))
         return mdl, mdr
 
+    @staticmethod
+    def prepare_vector(values):
+        vector = numpy.asarray(values, dtype=numpy.float64) / 1000.0
+        return vector, numpy.linalg.norm(vector)
+
+    def get_prepared_vector(self, values):
+        # LRU keyed by id(). The entry keeps a reference to values, so the
+        # id can't be reused by another object while the entry exists.
+        key = id(values)
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] is values:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry[1]
+        self.cache_misses += 1
+        prepared = self.prepare_vector(values)
+        self.cache[key] = (values, prepared)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return prepared
+
+    def clear_cache(self):
+        self.cache.clear()
+
+    def get_cache_stats(self):
+        return {'size': len(self.cache), 'hits': self.cache_hits, 'misses': self.cache_misses}
+
     def similarity(self, a, b):
-        len_a = len(a)
-        len_b = len(b)
-        a = numpy.array(a)
-        a = numpy.array(a / 1000.0)
-        b_id = id(b)
-        if b_id not in self.cache:
-            b = numpy.array(b)
-            b = numpy.array(b / 1000.0)
-            self.cache[b_id] = b
-        else:
-            b = self.cache[b_id]
-        if len_a < len_b:
-            a = numpy.resize(a, len_b)
-            a[len_a:len_b] = 0
-        elif len_b < len_a:
-            b = numpy.resize(b, len_a)
-            b[len_b:len_a] = 0
-        np = (numpy.linalg.norm(a) * numpy.linalg.norm(b))
+        a, norm_a = self.prepare_vector(a)
+        b, norm_b = self.get_prepared_vector(b)
+        # zero padding the shorter vector changes neither the dot product nor the norm
+        length = min(len(a), len(b))
+        np = norm_a * norm_b
         if np > 0:
-            return numpy.dot(a, b) / np
+            return numpy.dot(a[0:length], b[0:length]) / np
         else:
             return 0
 
@@ -16,31 +16,49 @@ under the License.
 
 import multiprocessing
 import logging
+import signal
+import time
 import uuid
+import numpy
 import sopare.util
 import sopare.visual
 import sopare.analyze
 import sopare.characteristics
 import sopare.comparator
+import sopare.dictreload
+import sopare.pluginpool
+import sopare.trace
 
 
 class Worker(multiprocessing.Process):
-    def __init__(self, cfg, queue):
+    def __init__(self, cfg, queue, dict_matrix=None, autostart=True, token_buffer=None,
+                 plugins=None):
         super().__init__(name='worker for filtered data')
         self.cfg = cfg
         self.queue = queue
+        self.token_buffer = token_buffer
+        self.latency_count = 0
+        self.latency_sum = 0
+        self.latency_max = 0
         self.visual = sopare.visual.Visual()
         self.util = sopare.util.Util(self.cfg.getbool('cmdlopt', 'debug'),
                                      self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
         self.logger = self.cfg.getlogger().get_log()
         self.logger = logging.getLogger(__name__)
-        self.analyze = sopare.analyze.Analyze(self.cfg)
-        self.compare = sopare.comparator.Compare(self.cfg.getbool('cmdlopt', 'debug'), self.util)
+        self.tracer = sopare.trace.get_tracer(self.cfg)
+        if dict_matrix is None:
+            dict_matrix = self.util.get_dict_matrix()
+        self.dict_matrix = dict_matrix
+        self.reloader = None
+        self.analyze = sopare.analyze.Analyze(self.cfg, self.dict_matrix, plugins)
+        self.compare = sopare.comparator.Compare(self.cfg.getbool('cmdlopt', 'debug'), self.util,
+                                                 self.dict_matrix)
         self.running = True
         self.counter = 0
         self.plot_counter = 0
         self.reset_counter = 0
-        self.rawbuf = []
+        self.rawbuf = numpy.empty(0)
+        self.rawbuf_length = 0
         self.rawfft = []
         self.raw = []
         self.fft = []
@@ -48,13 +66,16 @@ class Worker(multiprocessing.Process):
         self.character = []
         self.raw_character = []
         self.uid = str(uuid.uuid4())
-        self.start()
+        if autostart:
+            self.start()
 
     def reset(self):
         self.counter = 0
-        if self.cfg.getbool('cmdlopt', 'wave') is True and len(self.rawbuf) > 0:
+        if self.cfg.getbool('cmdlopt', 'wave') is True and self.rawbuf_length > 0:
             self.save_wave_buf()
-        self.rawbuf = []
+        # plugins may still hold a view of the old buffer, never reuse it
+        self.rawbuf = numpy.empty(len(self.rawbuf))
+        self.rawbuf_length = 0
         self.raw = []
         self.fft = []
         self.word_tendency = None
@@ -65,8 +86,48 @@ class Worker(multiprocessing.Process):
         self.reset_counter += 1
         self.compare.reset()
 
+    def append_rawbuf(self, raw_token):
+        end = self.rawbuf_length + len(raw_token)
+        if end > len(self.rawbuf):
+            rawbuf = numpy.empty(max(end, len(self.rawbuf) * 2))
+            rawbuf[0:self.rawbuf_length] = self.rawbuf[0:self.rawbuf_length]
+            self.rawbuf = rawbuf
+        self.rawbuf[self.rawbuf_length:end] = raw_token
+        self.rawbuf_length = end
+
+    def get_rawbuf(self):
+        # read only view, the part up to rawbuf_length is never written again
+        rawbuf = self.rawbuf[0:self.rawbuf_length]
+        rawbuf.flags.writeable = False
+        return rawbuf
+
+    def start_reloader(self):
+        self.reloader = sopare.dictreload.DictionaryReloader(
+            self.cfg, self.cfg.getsettings().dict_reload_interval)
+        self.reloader.start()
+
+    def stop_reloader(self):
+        if self.reloader is not None:
+            self.reloader.stop()
+            self.reloader = None
+
+    def request_reload(self):
+        if self.reloader is not None:
+            self.reloader.request()
+
+    def swap_dictionary(self):
+        # called without a word in progress, nothing refers to the old matrix
+        dict_matrix = self.reloader.get()
+        if dict_matrix is None:
+            return
+        self.dict_matrix = dict_matrix
+        self.analyze.set_dict_matrix(dict_matrix)
+        self.compare.set_dict_matrix(dict_matrix)
+        self.util.clear_cache()
+
     def save_wave_buf(self):
-        self.util.save_filtered_wave('filtered_results' + str(self.reset_counter), self.rawbuf)
+        self.util.save_filtered_wave('filtered_results' + str(self.reset_counter),
+                                     self.get_rawbuf())
 
     def remove_silence(self, m):
         # TODO: Find auto value or make configurable
@@ -83,57 +144,118 @@ class Worker(multiprocessing.Process):
 
     def run(self):
         self.logger.info("worker queue runner started")
+        if self.tracer.enabled is True and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.tracer.dump())
+        settings = self.cfg.getsettings()
+        # training only writes raw files, a single word needs no reload
+        if settings.endless_loop is True and settings.dict is None:
+            self.start_reloader()
+        pool = None
+        if self.cfg.getbool('misc', 'PLUGIN_POOL', fallback=True) is True:
+            pool = sopare.pluginpool.PluginPool(self.cfg, self.analyze.plugins)
+            self.analyze.plugins = [pool]
         while self.running:
-            obj = self.queue.get()
-            if obj['action'] == 'data':
-                raw_token = obj['token']
-                # TODO: "or True" is just temporary for testing. Must be removed later on!
-                if self.cfg.getbool('cmdlopt', 'wave') is True or True:
-                    self.rawbuf.extend(raw_token)
-                fft = obj['fft']
-                if self.cfg.getbool('cmdlopt', 'plot') is True:
-                    self.rawfft.extend(fft)
-                meta = obj['meta']
-                norm = obj['norm']
-                characteristic = obj['characteristic']
-                self.character.append((characteristic, meta))
-                self.compare.word(self.character)
-                if self.cfg.getoption('cmdlopt', 'dict') is not None:
-                    self.raw_character.append({'fft': fft, 'norm': norm, 'meta': meta})
-                if characteristic is not None:
-                    self.logger.debug(
-                        'characteristic = ' + str(self.counter) + ' ' + str(characteristic))
-                    self.logger.debug('meta = ' + str(meta))
-                    if self.cfg.getbool('cmdlopt', 'wave') is True:
-                        self.util.save_filtered_wave('token' + str(self.counter) + self.uid,
-                                                     raw_token)
-                    if self.cfg.getbool('cmdlopt', 'plot') is True and self.plot_counter < 6:
-                        self.visual.create_sample(characteristic['norm'],
-                                                  'norm' + str(self.plot_counter) + '.png')
-                        self.visual.create_sample(fft, 'fft' + str(self.plot_counter) + '.png')
-                    self.plot_counter += 1
-                self.counter += 1
-            elif obj['action'] == 'reset' and self.cfg.getoption('cmdlopt', 'dict') is None:
-                self.reset()
-            elif obj['action'] == 'stop':
-                self.running = False
-
-            if self.counter > 0 and meta is not None:
-                for m in meta:
-                    if m['token'] == 'start analysis':
-                        self.remove_silence(m)
-                        if self.cfg.getoption('cmdlopt', 'dict') is None:
-                            self.analyze.do_analysis(self.compare.get_results(), self.character,
-                                                     self.rawbuf)
-                        else:
-                            self.util.store_raw_dict_entry(self.cfg.getoption('cmdlopt', 'dict'),
-                                                           self.raw_character)
-                        self.reset()
-
-        if self.cfg.getbool('cmdlopt', 'wave') is True and len(self.rawbuf) > 0:
+            self.process(self.queue.get())
+
+        if self.cfg.getbool('cmdlopt', 'wave') is True and self.rawbuf_length > 0:
             self.save_wave_buf()
 
+        self.stop_reloader()
+
+        if pool is not None:
+            pool.stop(self.cfg.getfloatoption('misc', 'PLUGIN_TIMEOUT', fallback=0))
+
         self.queue.close()
 
+        if self.latency_count > 0:
+            self.logger.info('token queue latency avg: ' +
+                             str(self.latency_sum / self.latency_count) +
+                             ' max: ' + str(self.latency_max))
+
+        self.tracer.dump()
+
         if self.cfg.getbool('cmdlopt', 'plot') is True:
             self.visual.create_sample(self.rawfft, 'fft.png')
+
+    def read_token_buffer(self, sizes):
+        token_size, fft_size = sizes
+        buf = self.token_buffer.get()
+        token = numpy.frombuffer(buf, dtype=numpy.float64, count=token_size)
+        fft = None
+        if fft_size > 0:
+            fft = numpy.frombuffer(buf, dtype=numpy.complex128, count=fft_size,
+                                   offset=token_size * 8)
+        return token, fft
+
+    def measure_latency(self, obj):
+        if 'time' not in obj:
+            return
+        now = time.monotonic()
+        latency = now - obj['time']
+        self.tracer.span('worker queue', obj['time'], now)
+        self.latency_count += 1
+        self.latency_sum += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        self.logger.debug('token queue latency = ' + str(latency))
+
+    def process(self, obj):
+        settings = self.cfg.getsettings()
+        meta = None
+        if self.counter == 0 and self.reloader is not None:
+            self.swap_dictionary()
+        if obj['action'] == 'data':
+            self.tracer.add(obj.get('spans'))
+            self.measure_latency(obj)
+            raw_token = obj['token']
+            fft = obj['fft']
+            if obj.get('shm') is not None:
+                raw_token, fft = self.read_token_buffer(obj['shm'])
+            # TODO: "or True" is just temporary for testing. Must be removed later on!
+            if settings.wave is True or True:
+                self.append_rawbuf(raw_token)
+            if settings.plot is True:
+                self.rawfft.extend(fft)
+            meta = obj['meta']
+            norm = obj['norm']
+            characteristic = obj['characteristic']
+            self.character.append((characteristic, meta))
+            start = self.tracer.start()
+            self.compare.word(self.character)
+            self.tracer.stop('compare', start)
+            if settings.dict is not None:
+                self.raw_character.append({'fft': fft, 'norm': norm, 'meta': meta})
+            else:
+                self.analyze.add_token(characteristic, self.compare.get_start_scores())
+            if characteristic is not None:
+                self.logger.debug(
+                    'characteristic = ' + str(self.counter) + ' ' + str(characteristic))
+                self.logger.debug('meta = ' + str(meta))
+                if settings.wave is True:
+                    self.util.save_filtered_wave('token' + str(self.counter) + self.uid,
+                                                 raw_token)
+                if settings.plot is True and self.plot_counter < 6:
+                    self.visual.create_sample(characteristic['norm'],
+                                              'norm' + str(self.plot_counter) + '.png')
+                    self.visual.create_sample(fft, 'fft' + str(self.plot_counter) + '.png')
+                self.plot_counter += 1
+            self.counter += 1
+        elif obj['action'] == 'reset' and settings.dict is None:
+            self.reset()
+        elif obj['action'] == 'reload':
+            self.request_reload()
+        elif obj['action'] == 'stop':
+            self.running = False
+
+        if self.counter > 0 and meta is not None:
+            for m in meta:
+                if m['token'] == 'start analysis':
+                    self.remove_silence(m)
+                    if settings.dict is None:
+                        self.analyze.do_analysis(self.compare.get_results(), self.character,
+                                                 self.get_rawbuf())
+                    else:
+                        self.util.store_raw_dict_entry(settings.dict,
+                                                       self.raw_character)
+                    self.reset()
+        self.tracer.record()
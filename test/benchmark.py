@@ -0,0 +1,228 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import getopt
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import numpy
+import sopare.analyze
+import sopare.comparator
+import sopare.dictmatrix
+import sopare.filter
+import sopare.numpyjsonencoder
+import sopare.util
+import test.synthetic
+
+DICT_SIZES = (10, 100, 1000)
+SAMPLES_PER_WORD = 5
+MIN_TOKENS = 4
+MAX_TOKENS = 12
+ROUNDS = 5
+THRESHOLD = 0.2
+SEED = 4711
+
+
+class Benchmark:
+    def __init__(self, rounds=ROUNDS, dict_sizes=DICT_SIZES):
+        self.rounds = rounds
+        self.dict_sizes = dict_sizes
+        self.cfg = test.synthetic.create_config()
+        self.util = sopare.util.Util(False,
+                                     self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+        self.synthesizer = test.synthetic.Synthesizer(self.cfg, SEED)
+        self.models = self.synthesizer.create_words(max(self.dict_sizes) // SAMPLES_PER_WORD,
+                                                    MIN_TOKENS, MAX_TOKENS)
+        self.test_dict = None
+        self.results = {}
+
+    def create_tokens(self):
+        # the first three words spoken in a row, one list per token like Preparing creates it
+        chunks = self.cfg.getintoption('stream', 'CHUNKS')
+        samples = numpy.concatenate([self.synthesizer.render(self.synthesizer.vary(model))
+                                     for model in self.models[0:3]])
+        return [samples[x:x + chunks].tolist()
+                for x in range(0, len(samples) - chunks + 1, chunks)]
+
+    def measure(self, stage, function, ops=1):
+        timings = []
+        for x in range(0, self.rounds):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) / ops)
+        median = statistics.median(timings)
+        self.results[stage] = {'median': median, 'min': min(timings), 'ops': ops,
+                               'throughput': 1 / median if median > 0 else 0}
+
+    def run_filter(self, tokens):
+        queue = test.synthetic.NullQueue()
+        filtering = sopare.filter.Filtering(self.cfg, queue)
+        # the fft is needed as input for the characteristic stage
+        filtering.send_fft = True
+        meta = [{'token': 'token', 'volume': 1000, 'token_peaks': []}]
+
+        def filter_tokens():
+            filtering.first = True
+            for token in tokens:
+                filtering.filter(token, meta)
+
+        self.measure('filter', filter_tokens, len(tokens))
+        objects = queue.objects[0:len(tokens)]
+
+        def get_characteristics():
+            for obj in objects:
+                filtering.characteristic.get_characteristic(obj['fft'], obj['norm'], obj['meta'])
+
+        self.measure('characteristic', get_characteristics, len(objects))
+        return [(obj['characteristic'], obj['meta']) for obj in objects]
+
+    def run_dict(self, entries, data):
+        test_dict = {'dict': self.test_dict['dict'][0:entries]}
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'dict.json')
+            with open(filename, 'w') as json_file:
+                json.dump(test_dict, json_file, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+            self.measure('get_dict/' + str(entries), lambda: self.util.get_dict(filename))
+            dict_matrix = sopare.dictmatrix.DictionaryMatrix(
+                test_dict, self.util.compile_analysis(test_dict))
+            bin_filename = os.path.join(directory, 'dict.bin')
+            dict_matrix.save(bin_filename)
+            self.measure('dict_matrix_load/' + str(entries),
+                         lambda: sopare.dictmatrix.DictionaryMatrix.load(bin_filename))
+        finally:
+            shutil.rmtree(directory)
+
+        compare = sopare.comparator.Compare(False, self.util, dict_matrix)
+        analyze = sopare.analyze.Analyze(self.cfg, dict_matrix)
+        analyze.plugins = []
+
+        def compare_words():
+            compare.reset()
+            analyze.reset()
+            for x in range(1, len(data) + 1):
+                compare.word(data[0:x])
+                analyze.add_token(data[x - 1][0], compare.get_start_scores())
+
+        self.measure('compare/' + str(entries), compare_words, len(data))
+        results = compare.get_results()
+        self.measure('do_analysis/' + str(entries),
+                     lambda: analyze.do_analysis(results, data, []))
+        self.results['peak_rss/' + str(entries)] = {'kb': self.get_peak_rss()}
+
+    @staticmethod
+    def get_peak_rss():
+        # kilobytes on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            rss //= 1024
+        return rss
+
+    def run(self):
+        self.test_dict = self.synthesizer.create_dict(self.models, SAMPLES_PER_WORD)
+        tokens = self.create_tokens()
+        data = self.run_filter(tokens)
+        for entries in self.dict_sizes:
+            self.run_dict(entries, data)
+        self.results['peak_rss'] = {'kb': self.get_peak_rss()}
+        return self.results
+
+
+def compare_results(results, baseline, threshold):
+    regressions = []
+    for stage in sorted(results):
+        if 'median' in results[stage] and stage in baseline and 'median' in baseline[stage]:
+            previous = baseline[stage]['median']
+            if previous > 0 and results[stage]['median'] > previous * (1 + threshold):
+                regressions.append((stage, previous, results[stage]['median']))
+    return regressions
+
+
+def print_results(results):
+    for stage in sorted(results):
+        result = results[stage]
+        if 'median' in result:
+            print(stage.ljust(28) + ('%.6f s/op' % result['median']).rjust(16) +
+                  ('%.1f op/s' % result['throughput']).rjust(16))
+        else:
+            print(stage.ljust(28) + (str(result['kb']) + ' kB').rjust(16))
+
+
+def usage():
+    print("usage: python -m test.benchmark [options]")
+    print(" -o --output    [file] : write results to [file] (default benchmark.json)")
+    print(" -b --baseline  [file] : compare with [file] (default: previous output)")
+    print(" -t --threshold [num]  : allowed slowdown before a stage counts as")
+    print("                         regression (default 0.2 = 20%)")
+    print(" -r --rounds    [num]  : rounds per stage (default 5)")
+    print(" -q --quick            : only use the smallest dictionary")
+
+
+def main(argv):
+    output = 'benchmark.json'
+    baseline_file = None
+    threshold = THRESHOLD
+    rounds = ROUNDS
+    dict_sizes = DICT_SIZES
+    try:
+        opts, args = getopt.getopt(argv, "ho:b:t:r:q", ["help", "output=", "baseline=",
+                                                        "threshold=", "rounds=", "quick"])
+    except getopt.GetoptError:
+        usage()
+        return 2
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            usage()
+            return 0
+        if opt in ("-o", "--output"):
+            output = arg
+        if opt in ("-b", "--baseline"):
+            baseline_file = arg
+        if opt in ("-t", "--threshold"):
+            threshold = float(arg)
+        if opt in ("-r", "--rounds"):
+            rounds = int(arg)
+        if opt in ("-q", "--quick"):
+            dict_sizes = DICT_SIZES[0:1]
+
+    if baseline_file is None and os.path.exists(output):
+        baseline_file = output
+    baseline = None
+    if baseline_file is not None:
+        with open(baseline_file) as json_file:
+            baseline = json.load(json_file)
+
+    results = Benchmark(rounds, dict_sizes).run()
+    print_results(results)
+    with open(output, 'w') as json_file:
+        json.dump(results, json_file, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare_results(results, baseline, threshold)
+        for stage, previous, current in regressions:
+            print(('regression: ' + stage + ' %.6f s/op -> %.6f s/op' % (previous, current)))
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
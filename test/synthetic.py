@@ -0,0 +1,253 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import getopt
+import json
+import os
+import sys
+import uuid
+import numpy
+import sopare.config
+import sopare.filter
+import sopare.log
+import sopare.numpyjsonencoder
+import sopare.processing
+import sopare.util
+
+SEED = 4711
+# formant ranges in Hz, every token of a word gets one value per range
+FORMANTS = ((300, 900), (900, 2500), (2500, 3500))
+PITCH = (100, 250)
+MAX_FREQ = 4000
+
+
+class NullQueue:
+    # collects the objects the filter would send to the worker
+    def __init__(self):
+        self.objects = []
+
+    def put(self, obj):
+        self.objects.append(obj)
+
+    def close(self):
+        pass
+
+    def join_thread(self):
+        pass
+
+
+class Synthesizer:
+    # Words are sequences of voiced tokens with a fixed pitch and formant
+    # signature. Every spoken sample of a word varies pitch, formants,
+    # loudness, length and noise a little and runs through the real filter,
+    # so the dictionary entries follow the exact characteristic schema.
+    def __init__(self, cfg, seed=SEED):
+        self.cfg = cfg
+        self.random = numpy.random.RandomState(seed)
+        self.sample_rate = self.cfg.getintoption('stream', 'SAMPLE_RATE')
+        self.chunk = self.cfg.getintoption('stream', 'CHUNK')
+        self.chunks = self.cfg.getintoption('stream', 'CHUNKS')
+        self.phase = 0
+
+    def create_words(self, words, min_tokens, max_tokens):
+        models = []
+        for x in range(0, words):
+            tokens = []
+            for t in range(0, self.random.randint(min_tokens, max_tokens + 1)):
+                tokens.append({'pitch': self.random.uniform(*PITCH),
+                               'formants': [self.random.uniform(*f) for f in FORMANTS],
+                               'amplitude': self.random.uniform(2000, 9000)})
+            models.append({'id': 'word' + str(x), 'tokens': tokens})
+        return models
+
+    def vary(self, model):
+        # one spoken sample: tokens may be dropped or repeated
+        tokens = list(model['tokens'])
+        if len(tokens) > 2 and self.random.rand() < 0.2:
+            del tokens[self.random.randint(1, len(tokens) - 1)]
+        elif self.random.rand() < 0.2:
+            x = self.random.randint(0, len(tokens))
+            tokens.insert(x, tokens[x])
+        pitch = self.random.uniform(0.98, 1.02)
+        loudness = self.random.uniform(0.7, 1.3)
+        return [{'pitch': token['pitch'] * pitch,
+                 'formants': [f * self.random.uniform(0.97, 1.03) for f in token['formants']],
+                 'amplitude': token['amplitude'] * loudness} for token in tokens]
+
+    def render(self, tokens):
+        t = numpy.arange(self.chunks) / float(self.sample_rate)
+        samples = []
+        for token in tokens:
+            harmonics = numpy.arange(1, int(MAX_FREQ / token['pitch']) + 1) * token['pitch']
+            envelope = sum(numpy.exp(-((harmonics - formant) / 150.0) ** 2)
+                           for formant in token['formants'])
+            phase = 2 * numpy.pi * numpy.outer(harmonics, t) + self.phase
+            signal = (envelope[:, None] * numpy.sin(phase)).sum(axis=0)
+            self.phase = (self.phase + 2 * numpy.pi * token['pitch'] * self.chunks /
+                          float(self.sample_rate)) % (2 * numpy.pi)
+            signal *= token['amplitude'] / max(numpy.abs(signal).max(), 1e-9)
+            samples.append(signal + self.random.normal(0, 30, len(signal)))
+        return numpy.clip(numpy.concatenate(samples), -32768, 32767).astype(numpy.int16)
+
+    def silence(self, seconds):
+        return self.random.normal(0, 20, int(seconds * self.sample_rate)).astype(numpy.int16)
+
+    def get_raw_characteristics(self, samples):
+        # same path as training: silence detection, tokenizer and filter
+        queue = NullQueue()
+        processor = sopare.processing.Processor(self.cfg, None, True, queue, True)
+        processor.prepare.filter.send_fft = True
+        processor.check_block(samples.tobytes())
+        raw_characteristics = []
+        for obj in queue.objects:
+            if obj['action'] == 'data':
+                raw_characteristics.append({'fft': obj['fft'], 'norm': obj['norm'],
+                                            'meta': obj['meta']})
+                if any(m['token'] == 'start analysis' for m in obj['meta']):
+                    break
+        return raw_characteristics
+
+    def create_entry(self, model):
+        # just enough trailing silence to reach LONG_SILENCE and start the analysis
+        pause = ((self.cfg.getintoption('stream', 'LONG_SILENCE') + 1) * self.chunk /
+                 float(self.sample_rate))
+        samples = numpy.concatenate((self.silence(pause), self.render(self.vary(model)),
+                                     self.silence(pause)))
+        raw_characteristics = self.get_raw_characteristics(samples)
+        characteristics = sopare.util.Util.compile_raw_characteristics(
+            raw_characteristics, self.cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+        return {'id': model['id'], 'characteristic': characteristics,
+                'uuid': str(uuid.uuid4())}, raw_characteristics
+
+    def create_dict(self, models, samples_per_word, raw_directory=None):
+        # raw_directory additionally receives the raw training files for -c
+        dict_entries = []
+        for model in models:
+            for x in range(0, samples_per_word):
+                entry, raw_characteristics = self.create_entry(model)
+                dict_entries.append(entry)
+                if raw_directory is not None:
+                    with open(os.path.join(raw_directory, entry['uuid'] + '.raw'), 'w') as f:
+                        json.dump({'id': entry['id'], 'characteristic': raw_characteristics},
+                                  f, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+        return {'dict': dict_entries}
+
+    def create_utterance(self, models, words, pause):
+        ids = []
+        samples = [self.silence(pause)]
+        for x in range(0, words):
+            model = models[self.random.randint(0, len(models))]
+            ids.append(model['id'])
+            samples.append(self.render(self.vary(model)))
+            samples.append(self.silence(pause))
+        return numpy.concatenate(samples), ids
+
+
+def create_config():
+    cfg = sopare.config.Config()
+    cfg.addsection('cmdlopt')
+    for option, value in (('endless_loop', 'True'), ('debug', 'False'), ('plot', 'False'),
+                          ('wave', 'False'), ('outfile', None), ('infile', None),
+                          ('dict', None)):
+        cfg.setoption('cmdlopt', option, value)
+    cfg.addlogger(sopare.log.Log(False, False, cfg))
+    return cfg
+
+
+def generate(directory, words, samples_per_word, min_tokens, max_tokens, utterances,
+             words_per_utterance, seed=SEED, cfg=None, raw=False):
+    if cfg is None:
+        cfg = create_config()
+    synthesizer = Synthesizer(cfg, seed)
+    models = synthesizer.create_words(words, min_tokens, max_tokens)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    raw_directory = None
+    if raw is True:
+        raw_directory = os.path.join(directory, 'raw')
+        if not os.path.exists(raw_directory):
+            os.makedirs(raw_directory)
+    with open(os.path.join(directory, 'dict.json'), 'w') as json_file:
+        json.dump(synthesizer.create_dict(models, samples_per_word, raw_directory),
+                  json_file, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+    # long enough for the silence detection to split the words
+    pause = cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START') * 1.5
+    expected = {}
+    for x in range(0, utterances):
+        samples, ids = synthesizer.create_utterance(models, words_per_utterance, pause)
+        filename = 'utterance' + str(x) + '.raw'
+        with open(os.path.join(directory, filename), 'wb') as raw_file:
+            raw_file.write(samples.tobytes())
+        expected[filename] = ids
+    with open(os.path.join(directory, 'utterances.json'), 'w') as json_file:
+        json.dump(expected, json_file, indent=2, sort_keys=True)
+
+
+def usage():
+    print("usage: python -m test.synthetic [options] [directory]")
+    print(" -w --words      [num]     : number of words (default 10)")
+    print(" -s --samples    [num]     : samples per word (default 5)")
+    print(" -l --length     [min:max] : tokens per word (default 4:12)")
+    print(" -u --utterances [num]     : number of raw utterance files (default 5)")
+    print(" -p --per        [num]     : words per utterance (default 3)")
+    print(" -r --seed       [num]     : random seed (default " + str(SEED) + ")")
+    print(" -c --raw                  : also write raw training files to [directory]/raw")
+
+
+def main(argv):
+    words = 10
+    samples_per_word = 5
+    min_tokens = 4
+    max_tokens = 12
+    utterances = 5
+    words_per_utterance = 3
+    seed = SEED
+    raw = False
+    try:
+        opts, args = getopt.getopt(argv, "hw:s:l:u:p:r:c",
+                                   ["help", "words=", "samples=", "length=", "utterances=",
+                                    "per=", "seed=", "raw"])
+    except getopt.GetoptError:
+        usage()
+        return 2
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            usage()
+            return 0
+        if opt in ("-w", "--words"):
+            words = int(arg)
+        if opt in ("-s", "--samples"):
+            samples_per_word = int(arg)
+        if opt in ("-l", "--length"):
+            min_tokens, max_tokens = [int(v) for v in arg.split(':')]
+        if opt in ("-u", "--utterances"):
+            utterances = int(arg)
+        if opt in ("-p", "--per"):
+            words_per_utterance = int(arg)
+        if opt in ("-r", "--seed"):
+            seed = int(arg)
+        if opt in ("-c", "--raw"):
+            raw = True
+    directory = args[0] if len(args) > 0 else 'synthetic'
+    generate(directory, words, samples_per_word, min_tokens, max_tokens, utterances,
+             words_per_utterance, seed, raw=raw)
+    print(('wrote ' + str(words * samples_per_word) + ' dictionary entries and ' +
+           str(utterances) + ' utterances to ' + directory))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+import sopare.analyze
+import sopare.batch
+import sopare.dictmatrix
+import sopare.util
+import test.synthetic
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.cfg = test.synthetic.create_config()
+        self.cfg.setoption('cmdlopt', 'endless_loop', 'False')
+        synthesizer = test.synthetic.Synthesizer(self.cfg)
+        models = synthesizer.create_words(3, 3, 6)
+        test_dict = synthesizer.create_dict(models, 2)
+        self.dict_matrix = sopare.dictmatrix.DictionaryMatrix(
+            test_dict, sopare.util.Util.compile_analysis(test_dict))
+        pause = self.cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START') * 1.5
+        self.directory = tempfile.mkdtemp()
+        self.filenames = []
+        self.ids = []
+        for x in range(0, 3):
+            samples, ids = synthesizer.create_utterance(models, 2, pause)
+            self.filenames.append(os.path.join(self.directory, str(x) + '.wav'))
+            self.ids.append(ids)
+            with wave.open(self.filenames[-1], 'wb') as wave_file:
+                wave_file.setnchannels(1)
+                wave_file.setsampwidth(2)
+                wave_file.setframerate(self.cfg.getintoption('stream', 'SAMPLE_RATE'))
+                wave_file.writeframes(samples.tobytes())
+        # a training record as written by -t
+        with open(os.path.join(self.directory, 'training.raw'), 'w') as raw_file:
+            json.dump({'id': 'word0', 'characteristic': []}, raw_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_files(self):
+        self.assertEqual(sopare.batch.Batch.get_files([self.directory]), self.filenames)
+        raw_filename = os.path.join(self.directory, 'training.raw')
+        self.assertEqual(sopare.batch.Batch.get_files([raw_filename]), [raw_filename])
+
+    def test_run(self):
+        loads = []
+        load_plugins = sopare.analyze.Analyze.load_plugins
+        sopare.analyze.Analyze.load_plugins = lambda analyze: loads.append(analyze)
+        try:
+            batch = sopare.batch.Batch(self.cfg, self.dict_matrix)
+            results = list(batch.run([self.directory]))
+            # every file on its own gives the same results
+            expected = [sopare.batch.Batch(self.cfg, self.dict_matrix).recognize(filename)
+                        for filename in self.filenames]
+        finally:
+            sopare.analyze.Analyze.load_plugins = load_plugins
+        self.assertEqual(len(loads), 1 + len(self.filenames))
+        self.assertEqual([result['file'] for result in results], self.filenames)
+        self.assertEqual([result['results'] for result in results],
+                         [result['results'] for result in expected])
+        for result, ids in zip(results, self.ids):
+            self.assertNotIn([], result['results'])
+            self.assertEqual(len(result['results']), len(ids))
+        # the options changed for the batch are not visible to the caller
+        self.assertFalse(self.cfg.getbool('cmdlopt', 'endless_loop'))
+        self.assertTrue(self.cfg.getbool('misc', 'PLUGIN_RAWBUF'))
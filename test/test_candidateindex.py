@@ -0,0 +1,68 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import unittest
+import numpy
+import sopare.analyze
+import sopare.candidateindex
+import sopare.dictmatrix
+import sopare.util
+import test.synthetic
+
+
+class CandidateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.cfg = test.synthetic.create_config()
+        util = sopare.util.Util(False, 0.7)
+        self.test_dict = util.get_dict('test/files/test_dict.json')
+        # the dictionary in dict/ is not used
+        self.analyze = sopare.analyze.Analyze(self.cfg, sopare.dictmatrix.DictionaryMatrix(
+            self.test_dict, util.compile_analysis(self.test_dict)))
+
+    def create_data(self, entry, df_factor=1):
+        data = []
+        for dcharacteristic in self.test_dict['dict'][entry]['characteristic']:
+            characteristic = dict(dcharacteristic)
+            characteristic['df'] = characteristic['df'] * df_factor
+            data.append((characteristic, [{'token': 'token'}]))
+        return data
+
+    def test_candidates(self):
+        index = sopare.candidateindex.CandidateIndex(self.analyze.dict_matrix, 0.9)
+        entries = numpy.arange(len(self.test_dict['dict']))
+        startpos = numpy.zeros(len(entries), dtype=numpy.intp)
+        index.set_utterance(self.create_data(1))
+        self.assertTrue(index.get_candidates(entries, startpos, 0)[1])
+        self.assertFalse(index.get_candidates(entries, startpos, 100).any())
+        index.set_utterance(self.create_data(1, 4))
+        self.assertFalse(index.get_candidates(entries, startpos, 0)[1])
+        self.assertEqual(index.get_stats(), {'entries': len(entries) * 3,
+                                             'skipped_length': len(entries),
+                                             'skipped_coarse': index.skipped_coarse})
+        self.assertGreater(index.skipped_coarse, 0)
+        index.reset()
+        self.assertEqual(index.get_stats()['entries'], 0)
+
+    def test_length_check_keeps_results(self):
+        data = self.create_data(1)
+        framing = {id: [0, 1, 2] for id in self.analyze.dict_analysis}
+        expected = self.analyze.batch_inspection(framing, data)
+        self.cfg.setoption('compare', 'CANDIDATE_INDEX', 'true')
+        self.cfg.setoption('compare', 'CANDIDATE_MIN_SIMILARITY', '0')
+        self.analyze.create_search()
+        self.assertEqual(self.analyze.batch_inspection(framing, data), expected)
+        self.assertGreater(self.analyze.candidates.skipped_length, 0)
+        self.assertEqual(self.analyze.candidates.skipped_coarse, 0)
@@ -0,0 +1,49 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import pickle
+import unittest
+import numpy
+import sopare.characteristics
+import sopare.numpyjsonencoder
+
+
+class CharacteristicTest(unittest.TestCase):
+    def test_token_characteristic(self):
+        characteristic_factory = sopare.characteristics.Characteristic(0.7)
+        fft = numpy.zeros(64, dtype=complex)
+        fft[10] = 100
+        characteristic = characteristic_factory.get_characteristic(
+            fft, [0.1, 0.9, 0.2, 0.8], [{'token': 'token', 'token_peaks': [5, 7], 'volume': 3}])
+        self.assertEqual(characteristic['df'], 10)
+        self.assertEqual(characteristic['dfm'], 100)
+        self.assertSequenceEqual(characteristic['peaks'].tolist(), [1, 3])
+        self.assertNotIn('shift', characteristic)
+        self.assertRaises(KeyError, characteristic.__getitem__, 'weighting')
+        characteristic['weighting'] = 0.5
+        characteristic['shift'] = characteristic_factory.get_characteristic(fft, [], [])
+
+        obj = characteristic.to_dict()
+        self.assertSequenceEqual(sorted(obj), sorted(characteristic))
+        self.assertSequenceEqual(obj['norm'], [0.1, 0.9, 0.2, 0.8])
+        self.assertSequenceEqual(obj['token_peaks'], [5, 7])
+        self.assertEqual(obj['shift']['peaks'], [])
+        self.assertEqual(json.loads(json.dumps(
+            characteristic, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)), obj)
+
+        copy = pickle.loads(pickle.dumps(characteristic))
+        self.assertEqual(copy.to_dict(), obj)
@@ -0,0 +1,124 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import copy
+import unittest
+import numpy
+import sopare.util as util
+import sopare.comparator as comparator
+import sopare.dictmatrix
+
+
+class CompareTest(unittest.TestCase):
+    def test_compare_word(self):
+        test_util = util.Util(False, 0.7)
+        test_dict = test_util.get_dict('test/files/test_dict.json')
+        dict_matrix = sopare.dictmatrix.DictionaryMatrix(test_dict,
+                                                         test_util.compile_analysis(test_dict))
+        compare = comparator.Compare(False, test_util, dict_matrix)
+        dict_entries = test_dict['dict'][1]
+        characteristics = []
+        for dcharacteristic in dict_entries['characteristic']:
+            characteristics.append((dcharacteristic, [{'volume': dcharacteristic['volume']}]))
+            compare.word(characteristics)
+        results = compare.get_results()
+        self.assertSequenceEqual(list(results), list(compare.dict_analysis))
+        for _id in results:
+            self.assertEqual(len(results[_id]), len(characteristics))
+            for x, row in enumerate(results[_id]):
+                self.assertEqual(len(row), len(characteristics) - x)
+        self.assertSequenceEqual(results[dict_entries['id']][0], [1.0] * len(characteristics))
+
+        compare.reset()
+        compare.word(characteristics[0:1])
+        results = compare.get_results()
+        self.assertSequenceEqual(results[dict_entries['id']], [[1.0]])
+
+    @staticmethod
+    def reference_results(learned_dictionary, dict_analysis, characteristics):
+        # the per entry and start position loop of the Compare before the matrix
+        results = {}
+        for ll in range(0, len(characteristics)):
+            if ll == 0:
+                for id in dict_analysis:
+                    results[id] = []
+            for id in dict_analysis:
+                results[id].append([])
+                for x in range(0, len(results[id])):
+                    results[id][x].append(0)
+            characteristic, meta = characteristics[ll]
+            for dict_entries in learned_dictionary['dict']:
+                id = dict_entries['id']
+                for x in range(0, len(results[id])):
+                    dict_c_pos = len(results[id][x]) - 1
+                    if dict_c_pos < len(dict_entries['characteristic']):
+                        dcharacteristic = dict_entries['characteristic'][dict_c_pos]
+                        fc_sim = util.Util.single_similarity(
+                            characteristic['fc'], dcharacteristic['fc'])
+                        dfm_sim = util.Util.single_similarity(
+                            characteristic['dfm'], dcharacteristic['dfm'])
+                        volume_sim = 0
+                        if len(meta) > 0 and 'volume' in meta[0]:
+                            volume_sim = util.Util.single_similarity(
+                                meta[0]['volume'], dcharacteristic['volume'])
+                        fast_sim = (fc_sim + dfm_sim + volume_sim) / 3.0
+                        if fast_sim > results[id][x][dict_c_pos]:
+                            results[id][x][dict_c_pos] = fast_sim
+                        if 'shift' in characteristic:
+                            shift = characteristic['shift']
+                            fc_sim = util.Util.single_similarity(shift['fc'],
+                                                                 dcharacteristic['fc'])
+                            dfm_sim = util.Util.single_similarity(shift['dfm'],
+                                                                  dcharacteristic['dfm'])
+                            fast_sim = (fc_sim + dfm_sim) / 2.0
+                            if fast_sim > results[id][x][dict_c_pos]:
+                                results[id][x][dict_c_pos] = fast_sim
+        return results
+
+    def test_reference(self):
+        test_util = util.Util(False, 0.7)
+        test_dict = test_util.get_dict('test/files/test_dict.json')
+        dict_matrix = sopare.dictmatrix.DictionaryMatrix(test_dict,
+                                                         test_util.compile_analysis(test_dict))
+        compare = comparator.Compare(False, test_util, dict_matrix)
+        random = numpy.random.RandomState(7)
+        dcharacteristics = [dcharacteristic for dict_entries in test_dict['dict']
+                            for dcharacteristic in dict_entries['characteristic']]
+        for run in range(0, 20):
+            characteristics = []
+            compare.reset()
+            for x in range(0, random.randint(1, 25)):
+                characteristic = copy.deepcopy(
+                    dcharacteristics[random.randint(0, len(dcharacteristics))])
+                # shifted frequencies and a different volume
+                characteristic['fc'] = int(characteristic['fc'] + random.randint(-3, 4))
+                characteristic['dfm'] = max(0, characteristic['dfm'] + random.randint(-2, 3))
+                if random.rand() < 0.3:
+                    characteristic['shift'] = {'fc': int(random.randint(0, 40)),
+                                               'dfm': int(random.randint(0, 5))}
+                meta = []
+                if random.rand() < 0.8:
+                    meta = [{'volume': characteristic['volume'] * random.uniform(0.2, 3)}]
+                characteristics.append((characteristic, meta))
+                compare.word(characteristics)
+            expected = self.reference_results(test_dict, compare.dict_analysis, characteristics)
+            results = compare.get_results()
+            self.assertSequenceEqual(list(results), list(expected))
+            for _id in expected:
+                self.assertEqual([len(row) for row in results[_id]],
+                                 [len(row) for row in expected[_id]])
+                for row, expected_row in zip(results[_id], expected[_id]):
+                    numpy.testing.assert_allclose(row, expected_row, rtol=1e-12)
@@ -0,0 +1,97 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sopare.numpyjsonencoder
+import sopare.util
+import test.synthetic
+
+
+class CompileTest(unittest.TestCase):
+    def setUp(self):
+        cfg = test.synthetic.create_config()
+        synthesizer = test.synthetic.Synthesizer(cfg)
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        os.mkdir('dict')
+        synthesizer.create_dict(synthesizer.create_words(3, 3, 5), 2, 'dict')
+        self.util = sopare.util.Util(False, cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+        self.compiled = []
+        self.compile_raw_file = sopare.util.Util.compile_raw_file
+
+    def tearDown(self):
+        sopare.util.Util.compile_raw_file = staticmethod(self.compile_raw_file)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def dumps(json_data):
+        return json.dumps(json_data, cls=sopare.numpyjsonencoder.NumpyJSONEncoder)
+
+    def get_raw_files(self):
+        return sorted(filename for filename in os.listdir('dict') if filename.endswith('.raw'))
+
+    def test_parallel(self):
+        serial = self.util.get_compiled_dict(1)
+        self.assertEqual(len(serial['dict']), len(self.get_raw_files()))
+        self.assertEqual(self.dumps(self.util.get_compiled_dict(2)), self.dumps(serial))
+        self.assertEqual(self.dumps(self.util.get_compiled_dict(0)), self.dumps(serial))
+
+    def test_manifest(self):
+        # counts the compiled files of serial builds
+        def compile_raw_file(args):
+            self.compiled.append(os.path.basename(args[0]))
+            return self.compile_raw_file(args)
+        sopare.util.Util.compile_raw_file = staticmethod(compile_raw_file)
+
+        self.util.recreate_dict_from_raw_files(1, True)
+        filenames = self.get_raw_files()
+        self.assertEqual(sorted(self.compiled), filenames)
+        expected = self.dumps(self.util.get_dict())
+
+        # unchanged files and files with a new mtime only are not compiled again
+        del self.compiled[:]
+        mtime = time.time() + 10
+        os.utime(os.path.join('dict', filenames[0]), (mtime, mtime))
+        self.util.recreate_dict_from_raw_files(1, True)
+        self.assertEqual(self.compiled, [])
+        self.assertEqual(self.dumps(self.util.get_dict()), expected)
+        self.assertEqual(self.util.get_manifest()['files'][filenames[0]]['mtime'], mtime)
+
+        # a changed file is compiled, a deleted one leaves the dictionary
+        with open(os.path.join('dict', filenames[1])) as raw_file:
+            raw = json.load(raw_file)
+        raw['id'] = 'changed'
+        with open(os.path.join('dict', filenames[1]), 'w') as raw_file:
+            json.dump(raw, raw_file)
+        os.remove(os.path.join('dict', filenames[2]))
+        self.util.recreate_dict_from_raw_files(1, True)
+        self.assertEqual(self.compiled, [filenames[1]])
+        json_data = self.util.get_dict()
+        self.assertEqual(len(json_data['dict']), len(filenames) - 1)
+        self.assertEqual([dict_entries['id'] for dict_entries in json_data['dict']
+                          if dict_entries['uuid'] == filenames[1].split('.')[0]], ['changed'])
+        self.assertNotIn(filenames[2], self.util.get_manifest()['files'])
+        # same result as a full compile
+        del self.compiled[:]
+        self.assertEqual(self.dumps(self.util.get_compiled_dict(1)), self.dumps(json_data))
+        self.assertEqual(len(self.compiled), len(filenames) - 1)
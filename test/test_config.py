@@ -0,0 +1,46 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import pickle
+import unittest
+import sopare.config
+
+
+class ConfigTest(unittest.TestCase):
+    def test_settings(self):
+        cfg = sopare.config.Config()
+        settings = cfg.getsettings()
+        self.assertIs(cfg.getsettings(), settings)
+        self.assertEqual(settings.chunk, cfg.getintoption('stream', 'CHUNK'))
+        self.assertEqual(settings.max_time, cfg.getfloatoption('stream', 'MAX_TIME'))
+        self.assertIs(settings.hanning, True)
+        self.assertIsNone(settings.dict)
+        self.assertRaises(AttributeError, setattr, settings, 'chunk', 1)
+        copy = pickle.loads(pickle.dumps(settings))
+        self.assertSequenceEqual([getattr(copy, name) for name in copy.__slots__],
+                                 [getattr(settings, name) for name in settings.__slots__])
+
+        cfg.setoption('stream', 'THRESHOLD', '100')
+        self.assertEqual(cfg.getsettings().threshold, 100)
+        self.assertNotEqual(settings.threshold, 100)
+
+    def test_validation(self):
+        cfg = sopare.config.Config()
+        cfg.setoption('stream', 'THRESHOLD', 'loud')
+        self.assertRaises(ValueError, cfg.getsettings)
+        cfg.setoption('stream', 'THRESHOLD', '100')
+        cfg.setoption('characteristic', 'LOW_FREQ', '700')
+        self.assertRaises(ValueError, cfg.getsettings)
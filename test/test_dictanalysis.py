@@ -0,0 +1,109 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import random
+import unittest
+import sopare.dictanalysis
+import sopare.util
+
+
+def create_entry(id, tokens):
+    characteristic = [{'peaks': peaks, 'df': df} for peaks, df in tokens]
+    return {'id': id, 'uuid': id, 'characteristic': characteristic}
+
+
+def reference_compile_analysis(json_data):
+    # Util.compile_analysis before the set based aggregation
+    analysis = {}
+    for dict_entries in json_data['dict']:
+        if dict_entries['id'] not in analysis:
+            analysis[dict_entries['id']] = {
+                'min_tokens': 0, 'max_tokens': 0, 'peaks': [],
+                'df': [], 'minp': [], 'maxp': [], 'cp': [],
+                'mincp': [], 'maxcp': []}
+        word = analysis[dict_entries['id']]
+        length = len(dict_entries['characteristic'])
+        if length > word['max_tokens']:
+            word['max_tokens'] = length
+        if length < word['min_tokens'] or word['min_tokens'] == 0:
+            word['min_tokens'] = length
+        for i, entry in enumerate(dict_entries['characteristic']):
+            if i == len(word['cp']):
+                word['cp'].append([len(entry['peaks'])])
+            else:
+                peak_length = len(entry['peaks'])
+                if peak_length not in word['cp'][i]:
+                    word['cp'][i].append(peak_length)
+            if i == len(word['peaks']):
+                word['peaks'].append([int(peak) for peak in entry['peaks']])
+            else:
+                for miss in entry['peaks']:
+                    if miss not in word['peaks'][i]:
+                        word['peaks'][i].append(int(miss))
+                word['peaks'][i] = sorted(word['peaks'][i])
+            if i == len(word['df']):
+                word['df'].append([])
+            if entry['df'] not in word['df'][i]:
+                word['df'][i].append(entry['df'])
+                word['df'][i] = sorted(word['df'][i])
+    for id in analysis:
+        for p in analysis[id]['peaks']:
+            analysis[id]['minp'].append(min(p) if len(p) > 0 else 0)
+            analysis[id]['maxp'].append(max(p) if len(p) > 0 else 0)
+        for cp in analysis[id]['cp']:
+            analysis[id]['mincp'].append(min(cp))
+            analysis[id]['maxcp'].append(max(cp))
+    return analysis
+
+
+class DictionaryAnalysisTest(unittest.TestCase):
+    def test_analysis(self):
+        analysis = sopare.dictanalysis.DictionaryAnalysis()
+        analysis.add(create_entry('a', [([3, 1], 7), ([2], 5)]))
+        analysis.add(create_entry('b', [([], 1), ([4], 1)]))
+        first = analysis.get_analysis()
+        self.assertEqual(first['a'], {'min_tokens': 2, 'max_tokens': 2, 'peaks': [[3, 1], [2]],
+                                      'df': [[7], [5]], 'minp': [1, 2], 'maxp': [3, 2],
+                                      'cp': [[2], [1]], 'mincp': [2, 1], 'maxcp': [2, 1]})
+        self.assertEqual(first['b']['minp'], [0, 4])
+
+        analysis.add(create_entry('a', [([1, 5, 6], 2), ([2], 5), ([9, 8], 5)]))
+        self.assertEqual(analysis.get_analysis()['a'], {
+            'min_tokens': 2, 'max_tokens': 3, 'peaks': [[1, 3, 5, 6], [2], [9, 8]],
+            'df': [[2, 7], [5], [5]], 'minp': [1, 2, 8], 'maxp': [6, 2, 9],
+            'cp': [[2, 3], [1], [2]], 'mincp': [2, 1, 2], 'maxcp': [3, 1, 2]})
+
+    def test_duplicate_peaks(self):
+        # duplicates of the first entry of a token survive, later ones don't
+        json_data = {'dict': [create_entry('a', [([3, 3, 1], 7), ([2, 2], 5)]),
+                              create_entry('a', [([2, 2, 3], 7)])]}
+        analysis = sopare.dictanalysis.DictionaryAnalysis(json_data).get_analysis()
+        self.assertEqual(analysis['a']['peaks'], [[1, 2, 3, 3], [2, 2]])
+        self.assertEqual(analysis, reference_compile_analysis(json_data))
+
+    def test_reference(self):
+        test_dict = sopare.util.Util.get_dict('test/files/test_dict.json')
+        self.assertEqual(sopare.util.Util.compile_analysis(test_dict),
+                         reference_compile_analysis(test_dict))
+        generator = random.Random(3)
+        entries = []
+        for x in range(0, 200):
+            tokens = [([generator.randint(0, 12) for p in range(0, generator.randint(0, 6))],
+                       generator.randint(0, 4)) for t in range(0, generator.randint(2, 8))]
+            entries.append(create_entry('word' + str(generator.randint(0, 9)), tokens))
+        json_data = {'dict': entries}
+        self.assertEqual(sopare.util.Util.compile_analysis(json_data),
+                         reference_compile_analysis(json_data))
@@ -0,0 +1,153 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import copy
+import os
+import tempfile
+import unittest
+import numpy
+import sopare.config
+import sopare.dictmatrix
+import sopare.log
+import sopare.util as util
+import sopare.analyze as analyze
+
+
+class DictionaryMatrixTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cfg = sopare.config.Config()
+        cfg.addsection('cmdlopt')
+        cfg.setoption('cmdlopt', 'debug', 'False')
+        cfg.addlogger(sopare.log.Log(False, False, cfg))
+        cls.cfg = cfg
+        cls.util = util.Util(False, cfg.getfloatoption('characteristic', 'PEAK_FACTOR'))
+        cls.test_dict = cls.util.get_dict('test/files/test_dict.json')
+        # the dictionary in dict/ is not used
+        cls.analyze = analyze.Analyze(cfg, sopare.dictmatrix.DictionaryMatrix(
+            cls.test_dict, cls.util.compile_analysis(cls.test_dict)))
+
+    def create_test_data(self, shift=False):
+        random = numpy.random.RandomState(42)
+        data = []
+        for dict_entries in self.test_dict['dict']:
+            for dcharacteristic in dict_entries['characteristic']:
+                characteristic = copy.deepcopy(dcharacteristic)
+                norm = numpy.array(characteristic['norm']) + random.rand(len(characteristic['norm']))
+                characteristic['norm'] = norm[0:random.randint(len(norm) - 5, len(norm) + 1)].tolist()
+                characteristic['token_peaks'] = (numpy.array(characteristic['token_peaks']) *
+                                                 random.rand(len(characteristic['token_peaks'])))
+                characteristic['df'] = characteristic['df'] + random.randint(0, 3)
+                if shift and len(data) % 3 == 0:
+                    characteristic['shift'] = dict(characteristic)
+                    characteristic['shift']['norm'] = random.rand(len(norm) + 2).tolist()
+                data.append((characteristic, [{'token': 'token'}]))
+        return data
+
+    def reference_inspection(self, _id, startpos, data):
+        word_sim = []
+        for dict_entries in self.test_dict['dict']:
+            if _id == dict_entries['id']:
+                token_sim = [0, 0, 0, startpos, 0, _id]
+                c = 0
+                for i, dcharacteristic in enumerate(dict_entries['characteristic']):
+                    if startpos + i < len(data):
+                        characteristic, _ = data[startpos + i]
+                        sim, sl, sr = self.analyze.token_sim(characteristic, dcharacteristic)
+                        if 'shift' in characteristic:
+                            _, ssl, ssr = self.analyze.token_sim(characteristic['shift'],
+                                                                 dcharacteristic)
+                            sl = min(sl, ssl)
+                            sr = min(sr, ssr)
+                        token_sim[0] += sim
+                        token_sim[1] += sl
+                        token_sim[2] += sr
+                        c += 1
+                if c > 0:
+                    token_sim = [token_sim[0] / c, token_sim[1] / c, token_sim[2] / c,
+                                 startpos, c, _id]
+                if self.analyze.valid_length(_id, c):
+                    word_sim.append(token_sim)
+        return word_sim
+
+    def compare_inspection(self, data):
+        framing = {}
+        for _id in self.analyze.dict_analysis:
+            framing[_id] = [0, 5, 11, len(data) - 4, len(data)]
+        batch = self.analyze.batch_inspection(framing, data)
+        x = 0
+        for _id in framing:
+            for startpos in framing[_id]:
+                expected = self.reference_inspection(_id, startpos, data)
+                self.assertEqual(len(batch[x]), len(expected))
+                for token_sim, expected_sim in zip(batch[x], expected):
+                    for value, expected_value in zip(token_sim, expected_sim):
+                        if isinstance(expected_value, str):
+                            self.assertEqual(value, expected_value)
+                        else:
+                            self.assertAlmostEqual(value, expected_value, places=9)
+                x += 1
+
+    def test_batch_inspection(self):
+        self.compare_inspection(self.create_test_data())
+
+    def test_batch_inspection_shift(self):
+        self.compare_inspection(self.create_test_data(shift=True))
+
+    def test_batch_inspection_empty(self):
+        self.assertSequenceEqual(self.analyze.batch_inspection({}, []), [])
+
+    def test_incremental_search(self):
+        data = self.create_test_data(shift=True)
+        framing = {}
+        for _id in self.analyze.dict_analysis:
+            framing[_id] = [0, 5, 11, len(data) - 4, len(data) - 1]
+        expected = self.analyze.batch_inspection(framing, data)
+        entries = len(self.analyze.dict_matrix.ids)
+        search = self.analyze.search
+        try:
+            for x, (characteristic, _) in enumerate(data):
+                start_scores = numpy.ones(entries)
+                if x == 7:
+                    start_scores[0] = 0
+                self.analyze.add_token(characteristic, start_scores)
+            self.assertGreater(search.pruned, 0)
+            self.assertIsNone(search.inspect([0], [7], len(data)))
+            self.assertIsNone(search.inspect([0], [0], len(data) - 1))
+            incremental = self.analyze.batch_inspection(framing, data)
+            self.assertEqual(len(incremental), len(expected))
+            for word_sim, expected_sim in zip(incremental, expected):
+                self.assertEqual(len(word_sim), len(expected_sim))
+                for token_sim, expected_token_sim in zip(word_sim, expected_sim):
+                    self.assertEqual(token_sim[3:], expected_token_sim[3:])
+                    for value, expected_value in zip(token_sim[0:3], expected_token_sim[0:3]):
+                        self.assertAlmostEqual(value, expected_value, places=9)
+        finally:
+            self.analyze.reset()
+        self.assertEqual(search.tokens, 0)
+
+    def test_save_load(self):
+        dict_matrix = self.analyze.dict_matrix
+        filename = os.path.join(tempfile.mkdtemp(), 'dict.bin')
+        dict_matrix.save(filename)
+        loaded = sopare.dictmatrix.DictionaryMatrix.load(filename)
+        self.assertSequenceEqual(loaded.ids, dict_matrix.ids)
+        self.assertSequenceEqual(loaded.uuids, dict_matrix.uuids)
+        self.assertEqual(list(loaded.analysis), list(dict_matrix.analysis))
+        for name in sopare.dictmatrix.ARRAYS:
+            self.assertTrue(numpy.array_equal(getattr(loaded, name), getattr(dict_matrix, name)))
+        self.assertIsInstance(loaded.norm.base, numpy.memmap)
+        os.remove(filename)
@@ -0,0 +1,134 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sopare.dictmatrix
+import sopare.util
+import sopare.worker
+import test.synthetic
+
+
+class DictionaryReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.cfg = test.synthetic.create_config()
+        self.util = sopare.util.Util(False, 0.7)
+        self.test_dict = self.util.get_dict('test/files/test_dict.json')
+        self.first = {'dict': self.test_dict['dict'][1:]}
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, 'dict'))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def first_matrix(self):
+        return sopare.dictmatrix.DictionaryMatrix(self.first,
+                                                  self.util.compile_analysis(self.first))
+
+    def create_worker(self, interval):
+        self.cfg.setoption('misc', 'DICT_RELOAD_INTERVAL', str(interval))
+        # plugins are loaded from the current directory
+        worker = sopare.worker.Worker(self.cfg, None, self.first_matrix(), False)
+        os.chdir(self.directory)
+        self.util.write_dict(self.first)
+        worker.start_reloader()
+        return worker
+
+    def wait_for_reload(self, worker, reloads):
+        for x in range(0, 500):
+            if worker.reloader.reloads >= reloads:
+                return
+            time.sleep(0.01)
+        self.fail('dictionary was not reloaded')
+
+    def test_watch(self):
+        worker = self.create_worker(0.01)
+        try:
+            dict_entries = self.test_dict['dict'][0]
+            written = [os.stat(filename).st_mtime_ns
+                       for filename in (sopare.util.DICT_JSON, sopare.util.DICT_MATRIX)]
+            self.util.add2dict(dict_entries['characteristic'], None, dict_entries['id'])
+            # only the log is written, the reloader compiles the dictionary
+            self.assertEqual([os.stat(filename).st_mtime_ns for filename in
+                              (sopare.util.DICT_JSON, sopare.util.DICT_MATRIX)], written)
+            self.wait_for_reload(worker, 1)
+            # no swap while a word is in progress
+            worker.counter = 1
+            worker.process({'action': 'stop'})
+            self.assertEqual(len(worker.dict_matrix.ids), len(self.first['dict']))
+            worker.counter = 0
+            worker.process({'action': 'reset'})
+            self.assertEqual(len(worker.dict_matrix.ids), len(self.test_dict['dict']))
+            self.assertIs(worker.analyze.dict_matrix, worker.dict_matrix)
+            self.assertIs(worker.compare.dict_matrix, worker.dict_matrix)
+            self.assertIn(dict_entries['id'], worker.compare.ids)
+            # one append, one reload
+            time.sleep(0.1)
+            self.assertEqual(worker.reloader.reloads, 1)
+        finally:
+            worker.stop_reloader()
+
+    def test_reload_action(self):
+        worker = self.create_worker(0)
+        try:
+            self.util.delete_from_dict(self.first['dict'][0]['id'])
+            time.sleep(0.05)
+            self.assertEqual(worker.reloader.reloads, 0)
+            worker.process({'action': 'reload'})
+            self.wait_for_reload(worker, 1)
+            worker.process({'action': 'reset'})
+            self.assertNotIn(self.first['dict'][0]['id'], worker.analyze.dict_analysis)
+        finally:
+            worker.stop_reloader()
+
+    def test_training(self):
+        started = []
+        stop = {'action': 'stop'}
+
+        class StopQueue:
+            def get(self):
+                return stop
+
+            def close(self):
+                pass
+        self.cfg.setoption('misc', 'PLUGIN_POOL', 'False')
+        for dict_id in (None, 'test'):
+            self.cfg.setoption('cmdlopt', 'dict', dict_id)
+            worker = sopare.worker.Worker(self.cfg, StopQueue(), self.first_matrix(), False)
+            worker.start_reloader = lambda: started.append(dict_id)
+            worker.run()
+        # only recognition in a loop starts the reloader
+        self.assertEqual(started, [None])
+
+    def test_stale_matrix(self):
+        os.chdir(self.directory)
+        self.util.write_dict(self.first)
+        dict_matrix = self.util.get_dict_matrix()
+        self.assertIsNotNone(dict_matrix.sources)
+        # an append within the same timestamp is not missed
+        stat = os.stat(sopare.util.DICT_LOG)
+        self.util.get_store().add(self.test_dict['dict'][0])
+        os.utime(sopare.util.DICT_LOG, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        dict_matrix = self.util.get_dict_matrix()
+        self.assertIsNone(dict_matrix.sources)
+        self.assertEqual(len(dict_matrix.ids), len(self.test_dict['dict']))
+        self.util.update_dict_matrix()
+        self.assertIsNotNone(self.util.get_dict_matrix().sources)
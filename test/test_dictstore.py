@@ -0,0 +1,165 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import sopare.dictstore
+import sopare.util
+
+
+class DictionaryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'dict.log')
+        self.test_dict = sopare.util.Util.get_dict('test/files/test_dict.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_add_delete(self):
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        for dict_entries in self.test_dict['dict']:
+            store.add(dict_entries)
+        ids = [dict_entries['id'] for dict_entries in self.test_dict['dict']]
+        self.assertEqual(store.get_ids(), list(dict.fromkeys(ids)))
+        deleted = ids[0]
+        store.delete(deleted)
+        expected = [dict_entries for dict_entries in self.test_dict['dict']
+                    if dict_entries['id'] != deleted]
+        # a second store sees the records appended by the first one
+        other = sopare.dictstore.DictionaryStore(self.filename)
+        entries = other.get_entries()
+        self.assertEqual([e['uuid'] for e in entries], [e['uuid'] for e in expected])
+        self.assertEqual(other.get_entries(deleted), [])
+        self.assertEqual(other.get_entries(expected[0]['id'])[0]['characteristic'][0]['norm'],
+                         expected[0]['characteristic'][0]['norm'])
+        stats = other.get_stats()
+        self.assertEqual((stats['live'], stats['records']), (len(expected), len(ids) + 1))
+
+        size = stats['size']
+        other.compact()
+        self.assertLess(other.get_stats()['size'], size)
+        self.assertEqual(other.get_stats()['records'], len(expected))
+        store.add(self.test_dict['dict'][0])
+        self.assertEqual(len(other.get_entries(deleted)), 1)
+
+    def test_torn_record(self):
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        store.add(self.test_dict['dict'][0])
+        with open(self.filename, 'ab') as log_file:
+            log_file.write(b'["add", "x", "y"]\t{"id": ')
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        self.assertEqual(store.get_stats()['live'], 1)
+        store.add(self.test_dict['dict'][1])
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        self.assertEqual(len(store.get_entries()), 2)
+
+    def test_import_export(self):
+        json_filename = os.path.join(self.directory, 'dict.json')
+        shutil.copy('test/files/test_dict.json', json_filename)
+        store = sopare.dictstore.DictionaryStore.load(self.filename, json_filename)
+        self.assertEqual(len(store.get_entries()), len(self.test_dict['dict']))
+        store.delete('*')
+        store.export(json_filename)
+        with open(json_filename) as json_file:
+            self.assertEqual(json.load(json_file), {'dict': []})
+        # the export is not imported again, a replaced JSON file is
+        store = sopare.dictstore.DictionaryStore.load(self.filename, json_filename)
+        self.assertEqual(store.get_stats()['records'], len(self.test_dict['dict']) + 1)
+        mtime = os.path.getmtime(self.filename) + 1
+        os.utime(json_filename, (mtime, mtime))
+        store = sopare.dictstore.DictionaryStore.load(self.filename, json_filename)
+        self.assertEqual(store.get_stats()['records'], 0)
+
+    def test_json_copy(self):
+        json_filename = os.path.join(self.directory, 'dict.json')
+        shutil.copy('test/files/test_dict.json', json_filename)
+        store = sopare.dictstore.DictionaryStore.load(self.filename, json_filename)
+        # like sopare.py -d "*"
+        store.rewrite([])
+        # the outdated JSON file is neither written nor imported again
+        store = sopare.dictstore.DictionaryStore.load(self.filename, json_filename)
+        self.assertEqual(store.get_entries(), [])
+        self.assertEqual(sopare.util.Util.get_dict(json_filename), self.test_dict)
+        store.add(self.test_dict['dict'][0])
+        # the compaction exports the JSON file
+        store.compact()
+        self.assertEqual(sopare.util.Util.get_dict(json_filename)['dict'][0]['uuid'],
+                         self.test_dict['dict'][0]['uuid'])
+        self.assertEqual(len(sopare.util.Util.get_dict(json_filename)['dict']), 1)
+        self.assertFalse(store.needs_import(json_filename))
+
+    def test_index(self):
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        for dict_entries in self.test_dict['dict']:
+            store.add(dict_entries)
+        read = []
+        read_record = sopare.dictstore.DictionaryStore.read_record
+
+        def counting_read_record(store, line, offset):
+            read.append(offset)
+            return read_record(store, line, offset)
+        sopare.dictstore.DictionaryStore.read_record = counting_read_record
+        try:
+            # the index covers the whole log, nothing is read on open
+            other = sopare.dictstore.DictionaryStore(self.filename)
+            self.assertEqual(read, [])
+            self.assertEqual(len(other.get_entries()), len(self.test_dict['dict']))
+            # records of a writer which did not update the index are read from the tail
+            size = os.path.getsize(self.filename)
+            with open(self.filename, 'ab') as log_file:
+                log_file.write(store.encode(['delete', self.test_dict['dict'][0]['id']]))
+            other = sopare.dictstore.DictionaryStore(self.filename)
+            self.assertEqual(read, [size])
+            # an index of a compacted log is not used
+            store.compact()
+            with open(self.filename + '.idx', 'rb') as index_file:
+                index = index_file.read()
+            store.add(self.test_dict['dict'][0])
+            store.compact()
+            with open(self.filename + '.idx', 'wb') as index_file:
+                index_file.write(index)
+            del read[:]
+            other = sopare.dictstore.DictionaryStore(self.filename)
+            self.assertEqual(read[0], 0)
+        finally:
+            sopare.dictstore.DictionaryStore.read_record = read_record
+        self.assertEqual(len(other.get_entries()), len(store.get_entries()))
+
+    def test_read_only(self):
+        json_filename = os.path.join(self.directory, 'dict.json')
+        matrix_filename = os.path.join(self.directory, 'dict.bin')
+        shutil.copy('test/files/test_dict.json', json_filename)
+        util = sopare.util.Util(False, 0.7)
+        dict_matrix = util.get_dict_matrix(matrix_filename, self.filename, json_filename)
+        self.assertEqual(len(dict_matrix.ids), len(self.test_dict['dict']))
+        self.assertEqual(os.listdir(self.directory), ['dict.json'])
+        # a JSON file newer than the log is read, but not imported
+        store = sopare.dictstore.DictionaryStore(self.filename)
+        store.add(self.test_dict['dict'][0])
+        mtime = os.path.getmtime(self.filename) + 1
+        os.utime(json_filename, (mtime, mtime))
+        files = sorted(os.listdir(self.directory))
+        json_data = sopare.dictstore.DictionaryStore.read(self.filename, json_filename)
+        self.assertEqual(len(json_data['dict']), len(self.test_dict['dict']))
+        self.assertEqual(store.get_stats()['live'], 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), files)
+        with self.assertRaises(ValueError):
+            sopare.dictstore.DictionaryStore(self.filename, readonly=True).add(
+                self.test_dict['dict'][0])
@@ -15,24 +15,79 @@ under the License.
 """
 
 import unittest
+import numpy
+import sopare.batch
 import sopare.config
-from sopare.filter import Filtering
+import test.synthetic
+from sopare.filter import Filtering, SpectralPlan
 
 
 class FilterTest(unittest.TestCase):
+    @staticmethod
+    def reference_n_shift(state, first, chunks, data):
+        # the list based n_shift which kept the whole previous token
+        if first is True:
+            state['data_shift'] = []
+            state['data_shift_counter'] = 0
+        if state['data_shift_counter'] == 0:
+            state['data_shift'] = [v for v in range(0, chunks // 2)]
+            state['data_shift'].extend(data[len(data) // 2:])
+        elif state['data_shift_counter'] == 1:
+            state['data_shift'] = state['data_shift'][len(state['data_shift']) // 2:]
+            state['data_shift'].extend(data[0:len(data) // 2])
+        else:
+            state['data_shift'] = state['last_data'][len(state['last_data']) // 2:]
+            state['data_shift'].extend(data[0:len(data) // 2])
+        state['last_data'] = data
+        state['data_shift_counter'] += 1
+
     def test_filter_n_shift(self):
         chunks = 10
-        cfg = sopare.config.Config()
-        cfg.setoption('stream', 'CHUNKS', '10')
-        filtering = Filtering(cfg)
+        cfg = test.synthetic.create_config()
+        cfg.setoption('stream', 'CHUNKS', str(chunks))
+        # no worker process, the filtered data is not used
+        queue = sopare.batch.DirectQueue()
+        queue.consumer = lambda obj: None
+        filtering = Filtering(cfg, queue)
         data_object_array = [v for v in range(0, 40)]
+        # the token buffer of Preparing which is reused for every token
+        buffer = numpy.empty(chunks, dtype=numpy.int16)
+        reference = {}
         for x in range(0, len(data_object_array), chunks):
             data_object = data_object_array[x:x + chunks]
-            filtering.n_shift(data_object)
+            buffer[:] = data_object
+            self.reference_n_shift(reference, filtering.first, chunks, data_object)
+            filtering.n_shift(buffer[0:chunks])
+            self.assertSequenceEqual(filtering.data_shift.tolist(), reference['data_shift'])
             if x == 0:
                 filtering.first = False
             else:
                 correct_object = data_object_array[x - chunks // 2:x + chunks // 2]
-                self.assertSequenceEqual(filtering.data_shift, correct_object,
+                self.assertSequenceEqual(filtering.data_shift.tolist(), correct_object,
                                          'test_filter_n_shift 0 failed!')
+        # a new window starts over
+        filtering.first = True
+        buffer[:] = data_object_array[0:chunks]
+        self.reference_n_shift(reference, True, chunks, data_object_array[0:chunks])
+        filtering.n_shift(buffer[0:chunks])
+        self.assertSequenceEqual(filtering.data_shift.tolist(), reference['data_shift'])
         filtering.stop()
+
+    def test_spectral_plan_chunked_norm(self):
+        cfg = sopare.config.Config()
+        cfg.setoption('characteristic', 'MIN_PROGRESSIVE_STEP', '3')
+        cfg.setoption('characteristic', 'MAX_PROGRESSIVE_STEP', '20')
+        cfg.setoption('characteristic', 'START_PROGRESSIVE_FACTOR', '0.5')
+        plan = SpectralPlan(cfg)
+        nfft = numpy.arange(0, 100, dtype=numpy.float64)
+        chunked_norm = []
+        progessive = 1
+        step = 3
+        for x in range(0, nfft.size, 3):
+            if x >= 0.5:
+                progessive += progessive * 0.5
+                step = min(step + int(progessive), 20)
+            chunked_norm.append(nfft[x:x + step].sum())
+        self.assertTrue(numpy.allclose(plan.get_chunked_norm(nfft), chunked_norm))
+        self.assertIs(plan.get_window(10), plan.get_window(10))
+        self.assertEqual(len(plan.get_window(11)), 12)
@@ -0,0 +1,167 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+import sopare.config
+import sopare.pluginpool
+
+
+class SlowPlugin:
+    def __init__(self, event, fail=False):
+        self.event = event
+        self.fail = fail
+        self.results = []
+
+    def run(self, readable_results, data, rawbuf):
+        self.event.wait()
+        self.results.append(readable_results)
+        if self.fail:
+            raise ValueError('failing plugin')
+
+
+class PluginPoolTest(unittest.TestCase):
+    def create_pool(self, plugins, policy, timeout=0):
+        cfg = sopare.config.Config()
+        cfg.setoption('misc', 'PLUGIN_POLICY', policy)
+        cfg.setoption('misc', 'PLUGIN_QUEUE_SIZE', '1')
+        cfg.setoption('misc', 'PLUGIN_TIMEOUT', str(timeout))
+        return sopare.pluginpool.PluginPool(cfg, plugins)
+
+    def wait_busy(self, pool):
+        while any(runner.busy_since is None for runner in pool.runners):
+            time.sleep(0.001)
+
+    def test_policies(self):
+        event = threading.Event()
+        drop = SlowPlugin(event)
+        drop.POLICY = sopare.pluginpool.DROP
+        skip = SlowPlugin(event, True)
+        skip.POLICY = sopare.pluginpool.SKIP
+        pool = self.create_pool([drop, skip], sopare.pluginpool.SKIP)
+        pool.run([0], '', None)
+        self.wait_busy(pool)
+        for x in range(1, 4):
+            pool.run([x], '', None)
+        event.set()
+        stats = pool.stop(1)
+        self.assertSequenceEqual(drop.results, [[0], [3]])
+        self.assertSequenceEqual(skip.results, [[0], [1]])
+        self.assertEqual(stats['SlowPlugin']['calls'], 2)
+        drop_stats, skip_stats = [runner.get_stats() for runner in pool.runners]
+        self.assertEqual((drop_stats['dropped'], drop_stats['skipped']), (2, 0))
+        self.assertEqual((skip_stats['dropped'], skip_stats['skipped']), (0, 2))
+        self.assertEqual(skip_stats['errors'], 2)
+
+    def test_timeout(self):
+        event = threading.Event()
+        plugin = SlowPlugin(event)
+        pool = self.create_pool([plugin], sopare.pluginpool.DROP, 0.01)
+        pool.run([0], '', None)
+        self.wait_busy(pool)
+        time.sleep(0.02)
+        pool.run([1], '', None)
+        pool.run([2], '', None)
+        event.set()
+        stats = pool.stop(1)['SlowPlugin']
+        self.assertSequenceEqual(plugin.results, [[0]])
+        self.assertEqual((stats['timeouts'], stats['skipped'], stats['calls']), (1, 2, 1))
+        self.assertGreater(stats['max'], 0.01)
+
+    def test_stop_hung_plugin(self):
+        event = threading.Event()
+        plugin = SlowPlugin(event)
+        pool = self.create_pool([plugin], sopare.pluginpool.DROP)
+        try:
+            pool.run([0], '', None)
+            self.wait_busy(pool)
+            pool.run([1], '', None)
+            start = time.monotonic()
+            pool.stop(0.2)
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertTrue(pool.runners[0].is_alive())
+        finally:
+            event.set()
+        pool.runners[0].join(1)
+        # the queued result is still delivered once the plugin returns
+        self.assertSequenceEqual(plugin.results, [[0], [1]])
+
+    def test_coroutine_plugin(self):
+        class CoroutinePlugin:
+            def __init__(self):
+                self.results = []
+
+            async def run(self, readable_results, data, rawbuf):
+                self.results.append((readable_results, asyncio.get_running_loop()))
+
+        async def run_pool(plugin):
+            loop = asyncio.get_running_loop()
+            pool = sopare.pluginpool.PluginPool(sopare.config.Config(), [plugin], loop)
+            pool.run([0], '', None)
+            # the loop has to be free while the pool waits for the plugin
+            stats = await loop.run_in_executor(None, pool.stop, 1)
+            return loop, stats
+
+        plugin = CoroutinePlugin()
+        loop, stats = asyncio.run(run_pool(plugin))
+        self.assertEqual(plugin.results, [([0], loop)])
+        self.assertEqual(stats['CoroutinePlugin']['calls'], 1)
+        # without a loop every call gets its own one
+        plugin = CoroutinePlugin()
+        pool = sopare.pluginpool.PluginPool(sopare.config.Config(), [plugin])
+        pool.run([1], '', None)
+        pool.stop(1)
+        self.assertEqual([results for results, loop in plugin.results], [[1]])
+
+    def test_coroutine_timeout(self):
+        class HungPlugin:
+            def __init__(self):
+                self.cancelled = 0
+
+            async def run(self, readable_results, data, rawbuf):
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    self.cancelled += 1
+                    raise
+
+        async def run_pool(plugin, timeout):
+            loop = asyncio.get_running_loop()
+            pool = self.create_pool([plugin], sopare.pluginpool.DROP, timeout)
+            pool.runners[0].loop = loop
+            pool.run([0], '', None)
+            stats = await loop.run_in_executor(None, pool.stop, 0.2)
+            # give the loop a moment for the cancellation
+            await asyncio.sleep(0.01)
+            return stats
+
+        start = time.monotonic()
+        plugin = HungPlugin()
+        stats = asyncio.run(run_pool(plugin, 0.05))['HungPlugin']
+        self.assertEqual((plugin.cancelled, stats['calls'], stats['timeouts']), (1, 1, 1))
+        # without a PLUGIN_TIMEOUT stop() cancels the call
+        plugin = HungPlugin()
+        asyncio.run(run_pool(plugin, 0))
+        self.assertEqual(plugin.cancelled, 1)
+        # without a loop as well
+        plugin = HungPlugin()
+        pool = self.create_pool([plugin], sopare.pluginpool.DROP, 0.05)
+        pool.run([0], '', None)
+        stats = pool.stop(1)['HungPlugin']
+        self.assertEqual((plugin.cancelled, stats['calls'], stats['timeouts']), (1, 1, 1))
+        self.assertLess(time.monotonic() - start, 5)
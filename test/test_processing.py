@@ -0,0 +1,116 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import unittest
+import numpy
+import sopare.config
+import sopare.log
+import sopare.processing
+
+
+class ListQueue:
+    def __init__(self):
+        self.objects = []
+
+    def put(self, obj):
+        self.objects.append(obj)
+
+    def close(self):
+        pass
+
+    def join_thread(self):
+        pass
+
+
+class ProcessorTest(unittest.TestCase):
+    def setUp(self):
+        cfg = sopare.config.Config()
+        cfg.addsection('cmdlopt')
+        for option, value in (('endless_loop', 'True'), ('debug', 'False'), ('plot', 'False'),
+                              ('wave', 'False'), ('outfile', None), ('infile', None),
+                              ('dict', None)):
+            cfg.setoption('cmdlopt', option, value)
+        cfg.addlogger(sopare.log.Log(False, False, cfg))
+        self.cfg = cfg
+        self.chunk = cfg.getintoption('stream', 'CHUNK')
+        self.sample_rate = cfg.getintoption('stream', 'SAMPLE_RATE')
+
+    def count_chunks(self, seconds):
+        return int(seconds * self.sample_rate / self.chunk)
+
+    def test_sample_clock_max_time(self):
+        queue = ListQueue()
+        processor = sopare.processing.Processor(self.cfg, None, True, queue, True)
+        loud = (numpy.ones(self.chunk) * 2000).astype(numpy.int16).tobytes()
+        max_time = self.cfg.getfloatoption('stream', 'MAX_TIME')
+        for x in range(0, self.count_chunks(max_time)):
+            processor.check_silence(loud)
+            self.assertTrue(processor.append, 'stopped after ' + str(x) + ' chunks')
+        for x in range(0, 2):
+            processor.check_silence(loud)
+        self.assertFalse(processor.append)
+        self.assertAlmostEqual(processor.clock(),
+                               (self.count_chunks(max_time) + 2) * self.chunk /
+                               float(self.sample_rate))
+
+    def test_sample_clock_silence(self):
+        queue = ListQueue()
+        processor = sopare.processing.Processor(self.cfg, None, True, queue, True)
+        loud = (numpy.ones(self.chunk) * 2000).astype(numpy.int16).tobytes()
+        silence = numpy.zeros(self.chunk, dtype=numpy.int16).tobytes()
+        processor.check_silence(loud)
+        max_silence = self.cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START')
+        for x in range(0, self.count_chunks(max_silence)):
+            processor.check_silence(silence)
+            self.assertTrue(processor.append)
+        processor.check_silence(silence)
+        self.assertFalse(processor.append)
+        self.assertTrue(any(m['token'] == 'start analysis' for obj in queue.objects
+                            if obj['action'] == 'data' for m in obj['meta']))
+
+    def test_prepare_token_peaks(self):
+        queue = ListQueue()
+        processor = sopare.processing.Processor(self.cfg, None, True, queue, True)
+        loud = (numpy.ones(self.chunk) * -32768).astype(numpy.int16).tobytes()
+        chunks = self.cfg.getintoption('stream', 'CHUNKS') // self.chunk
+        for x in range(0, chunks * 2):
+            processor.check_silence(loud)
+        tokens = [m for obj in queue.objects if obj['action'] == 'data'
+                  for m in obj['meta'] if m['token'] == 'token']
+        self.assertEqual(len(tokens), 2)
+        self.assertSequenceEqual(tokens[1]['token_peaks'], [32768 * self.chunk] * chunks)
+
+    def test_check_block(self):
+        random = numpy.random.RandomState(7)
+        samples = numpy.concatenate([random.normal(0, 50, self.chunk * 5),
+                                     random.normal(0, 3000, self.chunk * 20),
+                                     random.normal(0, 50, self.chunk * 30 + 100)])
+        buf = samples.astype(numpy.int16).tobytes()
+        results = []
+        for block in (False, True):
+            queue = ListQueue()
+            processor = sopare.processing.Processor(self.cfg, None, True, queue, True)
+            if block:
+                processor.check_block(buf)
+            else:
+                for x in range(0, len(buf), self.chunk * 2):
+                    processor.check_silence(buf[x:x + self.chunk * 2])
+            results.append([(m['token'], m.get('token_peaks')) for obj in queue.objects
+                            if obj['action'] == 'data' for m in obj['meta']])
+        self.assertSequenceEqual(results[0], results[1])
+        # the token starts with the three quiet pre-roll chunks
+        self.assertLess(results[0][0][1][0], results[0][0][1][3])
+        self.assertEqual(len(results[0][0][1]), 6)
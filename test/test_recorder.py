@@ -0,0 +1,63 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import importlib.util
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import test.synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@unittest.skipIf(importlib.util.find_spec('pyaudio') is None, 'pyaudio is not installed')
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        cfg = test.synthetic.create_config()
+        synthesizer = test.synthetic.Synthesizer(cfg)
+        models = synthesizer.create_words(3, 3, 6)
+        pause = cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START') * 1.5
+        samples = synthesizer.create_utterance(models, 3, pause)[0]
+        self.directory = tempfile.mkdtemp()
+        self.raw_filename = os.path.join(self.directory, 'utterance.raw')
+        with open(self.raw_filename, 'wb') as raw_file:
+            raw_file.write(samples.tobytes())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, slots):
+        with open(os.path.join(ROOT, 'config', 'default.ini')) as ini_file:
+            ini = ini_file.read()
+        ini = re.sub(r'(?m)^RING_BUFFER_SLOTS = .*$', 'RING_BUFFER_SLOTS = ' + str(slots), ini)
+        ini_filename = os.path.join(self.directory, str(slots) + '.ini')
+        with open(ini_filename, 'w') as ini_file:
+            ini_file.write(ini)
+        # the round ends after the first word, long before the end of the file
+        return subprocess.run([sys.executable, 'sopare.py', '-i', ini_filename,
+                               '-r', self.raw_filename],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              timeout=60).returncode
+
+    def test_read_from_file(self):
+        self.assertEqual(self.read(0), 0)
+        # a full ring buffer must not block the recorder either
+        self.assertEqual(self.read(4), 0)
+        self.assertEqual(self.read(128), 0)
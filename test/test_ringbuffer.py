@@ -0,0 +1,61 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import unittest
+from sopare.ringbuffer import RingBuffer
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_ring_buffer(self):
+        ring_buffer = RingBuffer(4, 8, 0.001)
+        try:
+            chunks = [bytes([x]) * (8 - x) for x in range(0, 6)]
+            results = [ring_buffer.put(chunk) for chunk in chunks]
+            self.assertSequenceEqual(results, [True, True, True, True, False, False])
+            self.assertEqual(ring_buffer.qsize(), 4)
+            self.assertEqual(ring_buffer.get_backpressure(), 2)
+            self.assertEqual(ring_buffer.get_overruns(), 2)
+            self.assertEqual(ring_buffer.get(), chunks[0])
+            self.assertTrue(ring_buffer.put(chunks[4]))
+            ring_buffer.close()
+            self.assertSequenceEqual([ring_buffer.get() for x in range(0, 5)],
+                                     [chunks[1], chunks[2], chunks[3], chunks[4], None])
+            self.assertRaises(ValueError, ring_buffer.put, bytes(9))
+        finally:
+            ring_buffer.unlink()
+
+    def test_retry(self):
+        ring_buffer = RingBuffer(1, 8, 0.001)
+        try:
+            self.assertTrue(ring_buffer.put(b'a', drop=False))
+            self.assertFalse(ring_buffer.put(b'b', drop=False))
+            self.assertEqual(ring_buffer.get_overruns(), 0)
+            self.assertEqual(ring_buffer.get(), b'a')
+            self.assertTrue(ring_buffer.put(b'b', drop=False))
+        finally:
+            ring_buffer.unlink()
+
+    def test_stamps(self):
+        ring_buffer = RingBuffer(2, 8)
+        try:
+            ring_buffer.put(b'a', (1.0, 2.5))
+            ring_buffer.put(b'b')
+            self.assertEqual(ring_buffer.get(), b'a')
+            self.assertEqual(ring_buffer.stamps, (1.0, 2.5))
+            self.assertEqual(ring_buffer.get(), b'b')
+            self.assertIsNone(ring_buffer.stamps)
+        finally:
+            ring_buffer.unlink()
@@ -0,0 +1,104 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sopare.batch
+import sopare.dictmatrix
+import sopare.runtime
+import sopare.util
+import sopare.worker
+import test.synthetic
+
+
+class Collector:
+    def __init__(self):
+        self.results = []
+
+    async def run(self, readable_results, data, rawbuf):
+        self.results.append(readable_results)
+
+
+class SlowPlugin:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, readable_results, data, rawbuf):
+        self.calls += 1
+        time.sleep(1)
+
+
+class FailingPlugin:
+    def run(self, readable_results, data, rawbuf):
+        raise RuntimeError('plugin failure')
+
+
+class RuntimeTest(unittest.TestCase):
+    def test_runtime(self):
+        cfg = test.synthetic.create_config()
+        cfg.setoption('cmdlopt', 'endless_loop', 'False')
+        cfg.setoption('misc', 'PLUGIN_TIMEOUT', '0.1')
+        synthesizer = test.synthetic.Synthesizer(cfg)
+        models = synthesizer.create_words(3, 3, 6)
+        test_dict = synthesizer.create_dict(models, 2)
+        dict_matrix = sopare.dictmatrix.DictionaryMatrix(
+            test_dict, sopare.util.Util.compile_analysis(test_dict))
+        pause = cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START') * 1.5
+        directory = tempfile.mkdtemp()
+        try:
+            filenames = []
+            for x in range(0, 2):
+                samples, ids = synthesizer.create_utterance(models, 2, pause)
+                filenames.append(os.path.join(directory, str(x) + '.raw'))
+                with open(filenames[-1], 'wb') as raw_file:
+                    raw_file.write(samples.tobytes())
+            batch = sopare.batch.Batch(test.synthetic.create_config(), dict_matrix)
+            expected = [result['results'] for result in batch.run(filenames)]
+
+            runtime = sopare.runtime.Runtime(cfg, dict_matrix)
+            chunk = cfg.getintoption('stream', 'CHUNK')
+            collectors = [Collector() for filename in filenames]
+            slow = SlowPlugin()
+
+            async def recognize():
+                await asyncio.gather(*[
+                    runtime.recognize(sopare.runtime.FileSource(filename, chunk),
+                                      [slow, FailingPlugin(), collector])
+                    for filename, collector in zip(filenames, collectors)])
+
+            reloads = []
+            start_reloader = sopare.worker.Worker.start_reloader
+            sopare.worker.Worker.start_reloader = lambda worker: reloads.append(worker)
+            start = time.time()
+            try:
+                asyncio.run(recognize())
+            finally:
+                sopare.worker.Worker.start_reloader = start_reloader
+            # files are not watched for dictionary changes
+            self.assertEqual(reloads, [])
+            self.assertFalse(cfg.getbool('cmdlopt', 'endless_loop'))
+            # the batch leaves out the analyses without any word
+            self.assertEqual([[results for results in collector.results if len(results) > 0]
+                              for collector in collectors], expected)
+            self.assertGreater(slow.calls, 0)
+            # the slow plugin calls were abandoned after PLUGIN_TIMEOUT
+            self.assertLess(time.time() - start, slow.calls)
+        finally:
+            shutil.rmtree(directory)
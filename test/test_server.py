@@ -0,0 +1,95 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import sopare.analyze
+import sopare.batch
+import sopare.dictmatrix
+import sopare.server
+import sopare.util
+import test.synthetic
+
+
+class ServerTest(unittest.TestCase):
+    def test_parse_address(self):
+        self.assertEqual(sopare.server.parse_address('localhost:7777'),
+                         (socket.AF_INET, ('localhost', 7777)))
+        self.assertEqual(sopare.server.parse_address('/tmp/sopare.sock'),
+                         (socket.AF_UNIX, '/tmp/sopare.sock'))
+        self.assertEqual(sopare.server.parse_address('./run/a:1'),
+                         (socket.AF_UNIX, './run/a:1'))
+
+    def test_streams(self):
+        cfg = test.synthetic.create_config()
+        synthesizer = test.synthetic.Synthesizer(cfg)
+        models = synthesizer.create_words(3, 3, 6)
+        test_dict = synthesizer.create_dict(models, 2)
+        dict_matrix = sopare.dictmatrix.DictionaryMatrix(
+            test_dict, sopare.util.Util.compile_analysis(test_dict))
+        pause = cfg.getfloatoption('stream', 'MAX_SILENCE_AFTER_START') * 1.5
+        directory = tempfile.mkdtemp()
+        # the stream workers only forward results, they load no plugins
+        loads = multiprocessing.Value('i', 0)
+        load_plugins = sopare.analyze.Analyze.load_plugins
+
+        def count_loads(analyze):
+            with loads.get_lock():
+                loads.value += 1
+
+        sopare.analyze.Analyze.load_plugins = count_loads
+        try:
+            recognizer = sopare.server.Server(cfg, 2, dict_matrix)
+        finally:
+            sopare.analyze.Analyze.load_plugins = load_plugins
+        try:
+            filenames = []
+            for x in range(0, 3):
+                samples, ids = synthesizer.create_utterance(models, 2, pause)
+                filenames.append(os.path.join(directory, str(x) + '.raw'))
+                with open(filenames[-1], 'wb') as raw_file:
+                    raw_file.write(samples.tobytes())
+            batch = sopare.batch.Batch(test.synthetic.create_config(), dict_matrix)
+            expected = [result['results'] for result in batch.run(filenames)]
+
+            address = os.path.join(directory, 'sopare.sock')
+            recognizer.listen(address)
+            thread = threading.Thread(target=recognizer.serve_forever)
+            thread.start()
+            client = sopare.server.Client(address)
+            results = [None] * len(filenames)
+
+            def recognize(x):
+                results[x] = client.recognize_file(filenames[x])
+
+            threads = [threading.Thread(target=recognize, args=(x, ))
+                       for x in range(0, len(filenames))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(results, expected)
+            self.assertEqual(loads.value, 0)
+            recognizer.server.shutdown()
+            thread.join()
+        finally:
+            recognizer.stop()
+            shutil.rmtree(directory)
@@ -0,0 +1,54 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import sopare.util
+import test.synthetic
+
+SCHEMA = ['df', 'dfm', 'fc', 'norm', 'peaks', 'token_peaks', 'volume', 'weighting']
+
+
+class SyntheticTest(unittest.TestCase):
+    def test_generate(self):
+        directory = tempfile.mkdtemp()
+        try:
+            test.synthetic.generate(directory, 2, 2, 3, 5, 1, 2)
+            test_dict = sopare.util.Util.get_dict(os.path.join(directory, 'dict.json'))
+            self.assertEqual(len(test_dict['dict']), 4)
+            for dict_entries in test_dict['dict']:
+                self.assertIn(dict_entries['id'], ('word0', 'word1'))
+                self.assertGreater(len(dict_entries['characteristic']), 0)
+                for characteristic in dict_entries['characteristic']:
+                    self.assertSequenceEqual(sorted(characteristic), SCHEMA)
+            with open(os.path.join(directory, 'utterances.json')) as json_file:
+                expected = json.load(json_file)
+            self.assertEqual(len(expected['utterance0.raw']), 2)
+            samples = numpy.fromfile(os.path.join(directory, 'utterance0.raw'),
+                                     dtype=numpy.int16)
+            self.assertGreater(numpy.abs(samples).max(), 1000)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_seed(self):
+        cfg = test.synthetic.create_config()
+        first = test.synthetic.Synthesizer(cfg, 1).create_words(3, 2, 4)
+        second = test.synthetic.Synthesizer(cfg, 1).create_words(3, 2, 4)
+        self.assertEqual(first, second)
@@ -0,0 +1,71 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import unittest
+import sopare.config
+import sopare.trace
+from sopare.trace import Histogram, Tracer
+
+
+class TraceTest(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram()
+        for x in range(1, 101):
+            histogram.add(x / 1000.0)
+        summary = histogram.get_summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['avg'], 0.0505)
+        self.assertEqual(summary['max'], 0.1)
+        for percentile in (50, 95, 99):
+            expected = percentile / 1000.0
+            self.assertGreaterEqual(summary['p' + str(percentile)], expected)
+            self.assertLessEqual(summary['p' + str(percentile)], expected * 1.05)
+
+    def test_tracer(self):
+        tracer = Tracer(True)
+        tracer.stop('stage', tracer.start())
+        tracer.span('queue', 1.0, 1.5)
+        spans = tracer.take()
+        self.assertEqual([span[0] for span in spans], ['stage', 'queue'])
+        self.assertSequenceEqual(tracer.take(), [])
+        tracer.add(spans)
+        tracer.record()
+        summary = tracer.get_summary()
+        self.assertSequenceEqual(list(summary), ['queue', 'stage'])
+        self.assertEqual(summary['queue']['max'], 0.5)
+
+    def test_disabled_tracer(self):
+        tracer = Tracer(False)
+        self.assertIsNone(tracer.start())
+        tracer.stop('stage', tracer.start())
+        tracer.span('queue', 1.0, 1.5)
+        self.assertSequenceEqual(tracer.take(), [])
+
+    def test_pending_limit(self):
+        tracer = Tracer(True)
+        for x in range(0, sopare.trace.MAX_PENDING * 2 + 10):
+            tracer.span('silence', 1.0, 1.001)
+        self.assertLessEqual(len(tracer.spans), sopare.trace.MAX_PENDING)
+        tracer.record()
+        self.assertEqual(tracer.get_summary()['silence']['count'],
+                         sopare.trace.MAX_PENDING * 2 + 10)
+
+    def test_get_tracer(self):
+        cfg = sopare.config.Config()
+        cfg.setoption('misc', 'TRACE', 'true')
+        self.assertTrue(sopare.trace.get_tracer(cfg).enabled)
+        self.assertIs(sopare.trace.get_tracer(cfg), sopare.trace.get_tracer(cfg))
+        self.assertFalse(sopare.trace.get_tracer().enabled)
@@ -0,0 +1,42 @@
+"""
+Copyright (C) 2015 - 2018 Martin Kauss (yo@bishoph.org)
+
+Licensed under the Apache License, Version 2.0 (the "License"); you may
+not use this file except in compliance with the License. You may obtain
+a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+License for the specific language governing permissions and limitations
+under the License.
+"""
+
+import unittest
+import numpy
+import sopare.util
+
+
+class UtilTest(unittest.TestCase):
+    def test_similarity_cache(self):
+        util = sopare.util.Util(False, 0.7, cache_size=2)
+        vectors = [[1.0, 2.0, 3.0], [3.0, 2.0], [0.0, 0.0, 1.0]]
+        for x in range(0, 2):
+            for vector in vectors:
+                a = numpy.array([1.0, 1.0, 1.0, 1.0])
+                expected = numpy.dot(a[0:len(vector)], vector) / \
+                    (numpy.linalg.norm(a) * numpy.linalg.norm(vector))
+                self.assertAlmostEqual(util.similarity(a, vector), expected)
+        self.assertEqual(util.get_cache_stats(), {'size': 2, 'hits': 0, 'misses': 6})
+        self.assertAlmostEqual(util.similarity([1.0, 1.0], vectors[2]), 0)
+        self.assertEqual(util.get_cache_stats()['hits'], 1)
+        self.assertEqual(util.similarity([0.0], vectors[2]), 0)
+
+        # an equal but new object never gets the cached vector of another object
+        vector = list(vectors[2])
+        util.similarity([1.0], vector)
+        self.assertEqual(util.get_cache_stats()['misses'], 7)
+        util.clear_cache()
+        self.assertEqual(util.get_cache_stats()['size'], 0)